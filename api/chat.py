@@ -2,6 +2,7 @@ from fastapi import (
     APIRouter,
 )
 from core.logger import logger
+from core.tracing import bind, span
 from services.main.communication.models import MessageRequest, FileChangeRequest
 from services.main.communication.service import CommunicationService
 from services.main.enums import LoraStatus
@@ -38,7 +39,8 @@ async def send_message(request: MessageRequest):
 
 
 
-        message = await handle_message(request, communication_service)
+        with bind(session_id=request.session_id), span("handle_message"):
+            message = await handle_message(request, communication_service)
         await communication_service.publisher(
             request.session_id,
             LoraStatus.COMPLETED.value,
@@ -52,7 +54,7 @@ async def send_message(request: MessageRequest):
             request.session_id,
             LoraStatus.FAILED.value,
         )
-        SessionDataHandler.update_message_state_and_data(
+        await SessionDataHandler.update_message_state_and_data(
             request.session_id,
             request.mid,
             LoraStatus.FAILED.value,
@@ -67,7 +69,7 @@ async def send_message(request: MessageRequest):
 
 @router.get("/get-chat-history/{session_id}")
 async def get_chat_history(session_id: str):
-    chat_history = SessionDataHandler.get_chat_history(session_id)
+    chat_history = await SessionDataHandler.get_chat_history(session_id)
     return chat_history
 
 
@@ -89,12 +91,15 @@ async def update_file(request: FileChangeRequest):
 
 
 @router.post("/get-chat-list/{client_id}")
-async def get_chat_list(client_id: str):
+async def get_chat_list(client_id: str, cursor: str = None, limit: int = None):
     try:
-        chat_list = SessionDataHandler.get_chat_list(client_id)
+        chat_list, next_cursor = await SessionDataHandler.get_chat_list(
+            client_id, cursor=cursor, limit=limit
+        )
         return {
             "status": True,
             "chat_list": chat_list,
+            "next_cursor": next_cursor,
         }
 
     except Exception as e:
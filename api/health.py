@@ -5,6 +5,7 @@ Health check endpoints for the application.
 from fastapi import APIRouter, HTTPException
 from core.database import mongodb, ping_database
 from core.config import settings
+from services.main.utils.caching.redis_service import LLMResponseCache
 import logging
 
 router = APIRouter()
@@ -38,3 +39,9 @@ async def db_health_check():
     except Exception as e:
         logger.error(f"Database health check failed: {str(e)}")
         raise HTTPException(status_code=503, detail="Database connection failed")
+
+
+@router.get("/health/llm-cache")
+async def llm_cache_stats():
+
+    return {"status": "ok", "entries": len(LLMResponseCache._entries), "stats": LLMResponseCache.stats}
@@ -0,0 +1,26 @@
+"""
+Metrics and trace endpoints for the application.
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from core.tracing import get_session_trace, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/traces/{session_id}")
+async def session_trace(session_id: str):
+
+    spans = get_session_trace(session_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this session")
+    return {"session_id": session_id, "spans": spans}
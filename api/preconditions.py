@@ -28,7 +28,7 @@ async def build_status(request: PreConditionRequest):
 async def handle_precondition(request: PreConditionRequest, condition: Preconndition):
     try:
         session_id = request.session_id
-        redis_data = SessionDataHandler.get_preconditions(session_id, condition)
+        redis_data = await SessionDataHandler.get_preconditions(session_id, condition)
 
         if redis_data:
             return {
@@ -38,7 +38,7 @@ async def handle_precondition(request: PreConditionRequest, condition: Preconndi
 
         if condition == Preconndition.TEST_COVERAGE:
             service = TestCoverageService(root_path="D:\\repos")
-            result = service.analyze_repo(
+            result = await service.analyze_repo(
                 "https://github.com/Deplora-Tech/test.git",
                 session_id,
                 language="Python",
@@ -0,0 +1,299 @@
+# tracing.py
+"""
+In-process tracing and metrics.
+
+Spans carry the request and session id of the context they run in (propagated through
+contextvars, so tasks created inside a request inherit them). Every span feeds a
+per-stage latency histogram, LLM calls additionally feed per platform/model histograms,
+and everything is exposed in Prometheus text format by `render_metrics`. Spans of a
+session are kept in memory for `get_session_trace`, and written as JSON to
+TRACE_DUMP_DIR when that is set, from a background thread. No collector is needed.
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from core.logger import logger
+
+TRACE_DUMP_DIR = os.getenv("TRACE_DUMP_DIR")
+TRACE_MAX_SESSIONS = int(os.getenv("TRACE_MAX_SESSIONS", 200))
+TRACE_MAX_SPANS_PER_SESSION = int(os.getenv("TRACE_MAX_SPANS_PER_SESSION", 2000))
+# Session ids come from clients, only ones matching this are used as dump file names
+TRACE_FILE_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+SIZE_BUCKETS = (100, 1000, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+
+class Histogram:
+    """
+    A Prometheus-style histogram with a fixed label set.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...], buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            bucket = bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            bucket_labels = ",".join(labels + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{bucket_labels}}} {values[-1]}")
+            label_text = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{label_text} {values[-2]}")
+            lines.append(f"{self.name}_count{label_text} {values[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_DURATION = Histogram(
+    "deplora_stage_duration_seconds",
+    "Duration of traced pipeline stages.",
+    ("stage", "status"),
+    DURATION_BUCKETS,
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "deplora_http_request_duration_seconds",
+    "Duration of HTTP requests.",
+    ("method", "route", "status"),
+    DURATION_BUCKETS,
+)
+LLM_REQUEST_DURATION = Histogram(
+    "deplora_llm_request_duration_seconds",
+    "Duration of LLM provider calls.",
+    ("platform", "model", "status"),
+    DURATION_BUCKETS,
+)
+LLM_PROMPT_SIZE = Histogram(
+    "deplora_llm_prompt_chars",
+    "Size of prompts sent to LLM providers, in characters.",
+    ("platform", "model"),
+    SIZE_BUCKETS,
+)
+LLM_COMPLETION_SIZE = Histogram(
+    "deplora_llm_completion_chars",
+    "Size of completions received from LLM providers, in characters.",
+    ("platform", "model"),
+    SIZE_BUCKETS,
+)
+METRICS = [
+    STAGE_DURATION,
+    HTTP_REQUEST_DURATION,
+    LLM_REQUEST_DURATION,
+    LLM_PROMPT_SIZE,
+    LLM_COMPLETION_SIZE,
+]
+
+# request_id, session_id and the id of the innermost open span
+_trace_context: ContextVar[dict] = ContextVar("trace_context", default={})
+_session_traces: "OrderedDict[str, List[dict]]" = OrderedDict()
+_session_traces_lock = threading.Lock()
+# A single writer thread keeps trace dumps off the event loop and in order
+_dump_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-dump")
+
+
+@contextmanager
+def bind(**fields):
+    """
+    Attach ids (e.g. request_id, session_id) to the current context and everything
+    called from it.
+    """
+    token = _trace_context.set(
+        {**_trace_context.get(), **{k: v for k, v in fields.items() if v is not None}}
+    )
+    try:
+        yield
+    finally:
+        _trace_context.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a pipeline stage.
+
+    Yields the span's attribute dict, which the block may add to. The duration is
+    recorded in the stage histogram and, when a session is bound, in its trace.
+    """
+    context = _trace_context.get()
+    span_id = uuid4().hex[:16]
+    token = _trace_context.set({**context, "span_id": span_id})
+    status = "ok"
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _trace_context.reset(token)
+        STAGE_DURATION.observe(duration, stage=name, status=status)
+
+        session_id = context.get("session_id")
+        if session_id:
+            _record_span(
+                session_id,
+                {
+                    "name": name,
+                    "span_id": span_id,
+                    "parent_id": context.get("span_id"),
+                    "request_id": context.get("request_id"),
+                    "start": started_at,
+                    "duration": round(duration, 6),
+                    "status": status,
+                    "attributes": attributes,
+                },
+            )
+
+
+def observe_llm_call(
+    platform: str,
+    model: str,
+    duration: float,
+    status: str,
+    prompt_chars: int,
+    completion_chars: int = None,
+):
+    LLM_REQUEST_DURATION.observe(duration, platform=platform, model=model, status=status)
+    LLM_PROMPT_SIZE.observe(prompt_chars, platform=platform, model=model)
+    if completion_chars is not None:
+        LLM_COMPLETION_SIZE.observe(completion_chars, platform=platform, model=model)
+
+
+@contextmanager
+def llm_span(platform: str, model: str, prompt: str):
+    """
+    Span for a single LLM provider call. Set "completion_chars" on the yielded attributes
+    once the completion is known.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    with span("llm_request", platform=platform, model=model, prompt_chars=len(prompt)) as attributes:
+        try:
+            yield attributes
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            observe_llm_call(
+                platform,
+                model,
+                time.perf_counter() - start,
+                status,
+                len(prompt),
+                attributes.get("completion_chars"),
+            )
+
+
+def traced(name: str = None):
+    """
+    Decorator that runs an async function inside a span named after it.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _record_span(session_id: str, record: dict):
+    with _session_traces_lock:
+        spans = _session_traces.pop(session_id, [])
+        _session_traces[session_id] = spans
+        if len(spans) < TRACE_MAX_SPANS_PER_SESSION:
+            spans.append(record)
+        while len(_session_traces) > TRACE_MAX_SESSIONS:
+            _session_traces.popitem(last=False)
+
+    # Top-level spans of a session end its unit of work, so dump the trace then
+    if TRACE_DUMP_DIR and record["parent_id"] is None:
+        _dump_executor.submit(dump_session_trace, session_id)
+
+
+def get_session_trace(session_id: str) -> Optional[List[dict]]:
+    with _session_traces_lock:
+        spans = _session_traces.get(session_id)
+        return list(spans) if spans is not None else None
+
+
+def dump_session_trace(session_id: str, directory: str = None):
+    directory = directory or TRACE_DUMP_DIR
+    spans = get_session_trace(session_id)
+    if not directory or spans is None:
+        return
+    if not TRACE_FILE_SESSION_ID.match(session_id):
+        logger.warning(f"Not writing trace for session id {session_id!r}")
+        return
+    directory = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(directory, f"{session_id}.json"))
+    if os.path.dirname(path) != directory:
+        logger.warning(f"Not writing trace for session {session_id} outside {directory}")
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"session_id": session_id, "spans": spans}, f, indent=2, default=str)
+    except OSError as e:
+        logger.error(f"Error writing trace for session {session_id}: {e}")
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,425 @@
+"""
+Fake Jenkins server, and a smoke test of JenkinsManager against it.
+
+The fake implements the parts of the Jenkins API the executor uses: folders, pipelines,
+config.xml, folder credentials, the build queue, builds with pipeline stages (wfapi),
+stage logs and console output, including the progressive log. Stages are read from the pipeline script and each one
+runs for STAGE_SECONDS. The console ends in a partial line while a stage is writing one,
+and the steps of stages listed in `branch_stages` run in a parallel branch. POSTs require
+the CSRF crumb.
+
+Faults can be injected through the fake's /_fake endpoint, e.g. to return 503 for the
+next requests, to rotate the crumb or to set the branch stages.
+
+Usage:
+    python fake_jenkins.test.py                 # run the smoke test
+    python fake_jenkins.test.py --serve [PORT]  # only serve the fake (default port 8089)
+
+The smoke test also tails a build with LogTailer, storing its logs in fakeredis.
+
+To run the application against the served fake, set JENKINS_URL=http://127.0.0.1:8089.
+"""
+
+import asyncio
+import itertools
+import os
+import re
+import socket
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+STAGE_SECONDS = float(os.getenv("FAKE_JENKINS_STAGE_SECONDS", 0.5))
+QUEUE_SECONDS = float(os.getenv("FAKE_JENKINS_QUEUE_SECONDS", 0.3))
+LOG_LINES_PER_STAGE = 20
+
+STAGE_PATTERN = re.compile(r"stage\s*\(\s*['\"](.+?)['\"]\s*\)")
+BUILD_PATH = re.compile(r"^(?P<job>job/.+?)/(?P<build>\d+|lastBuild)/(?P<rest>.*)$")
+
+
+class FakeJenkins:
+    def __init__(self):
+        self.jobs = {}  # job path -> {"config": str, "builds": [...]}
+        self.queue = {}  # queue id -> queue item
+        self.queue_ids = itertools.count(1)
+        self.crumb = uuid4().hex
+        self.fail_next = 0
+        self.crumb_requests = 0
+        self.connections = set()
+        self.requests = 0
+        self.branch_stages = set()
+        self.partial_reads = 0  # progressive log reads that ended in a partial line
+
+    # Builds
+
+    def start_build(self, job_path: str) -> int:
+        queue_id = next(self.queue_ids)
+        self.queue[queue_id] = {
+            "job": job_path,
+            "ready_at": time.monotonic() + QUEUE_SECONDS,
+            "number": None,
+            "cancelled": False,
+        }
+        return queue_id
+
+    def start_queued_builds(self):
+        now = time.monotonic()
+        for item in self.queue.values():
+            if (
+                item["number"] is None
+                and not item["cancelled"]
+                and now >= item["ready_at"]
+                and item["job"] in self.jobs
+            ):
+                job = self.jobs[item["job"]]
+                item["number"] = len(job["builds"]) + 1
+                job["builds"].append(
+                    {
+                        "number": item["number"],
+                        "started": item["ready_at"],
+                        "timestamp": int(time.time() * 1000),
+                        "stages": STAGE_PATTERN.findall(job["config"]) or ["Build"],
+                        "aborted_at": None,
+                    }
+                )
+
+    def queue_item(self, queue_id: int) -> dict:
+        item = self.queue[queue_id]
+        executable = None
+        if item["number"] is not None:
+            executable = {"number": item["number"], "url": f"/{item['job']}/{item['number']}/"}
+        return {
+            "id": queue_id,
+            "cancelled": item["cancelled"],
+            "executable": executable,
+            "why": None if executable else "Waiting for next available executor",
+        }
+
+    def build_state(self, build: dict) -> dict:
+        elapsed = (build["aborted_at"] or time.monotonic()) - build["started"]
+        stages = []
+        for index, name in enumerate(build["stages"]):
+            stage_elapsed = elapsed - index * STAGE_SECONDS
+            if stage_elapsed < 0:
+                break
+            done = stage_elapsed >= STAGE_SECONDS
+            if done:
+                status = "SUCCESS"
+            elif build["aborted_at"]:
+                status = "ABORTED"
+            else:
+                status = "IN_PROGRESS"
+            stages.append(
+                {
+                    "id": str(10 + index),
+                    "name": name,
+                    "status": status,
+                    "durationMillis": int(min(stage_elapsed, STAGE_SECONDS) * 1000),
+                    "progress": min(stage_elapsed / STAGE_SECONDS, 1),
+                }
+            )
+        building = build["aborted_at"] is None and elapsed < len(build["stages"]) * STAGE_SECONDS
+        return {"elapsed": elapsed, "stages": stages, "building": building}
+
+    def stage_log(self, stage: dict) -> str:
+        lines = int(LOG_LINES_PER_STAGE * stage["progress"])
+        return "".join(f"[{stage['name']}] step {i + 1}\n" for i in range(lines))
+
+    def console(self, build: dict, state: dict) -> str:
+        parts = ["Started by user admin\n[Pipeline] Start of Pipeline\n[Pipeline] node\n[Pipeline] {\n"]
+        for stage in state["stages"]:
+            parts.append(f"[Pipeline] stage\n[Pipeline] {{ ({stage['name']})\n")
+            branch = stage["name"] in self.branch_stages
+            if branch:
+                parts.append(f"[Pipeline] parallel\n[Pipeline] {{ (Branch: {stage['name'].lower()})\n")
+            parts.append(self.stage_log(stage))
+            # The part of the next line written so far
+            written = LOG_LINES_PER_STAGE * stage["progress"] % 1
+            if written:
+                line = f"[{stage['name']}] step {int(LOG_LINES_PER_STAGE * stage['progress']) + 1}"
+                parts.append(line[: max(int(len(line) * written), 1)])
+            if stage["status"] != "IN_PROGRESS":
+                if written:
+                    parts.append("\n")
+                if branch:
+                    parts.append("[Pipeline] }\n[Pipeline] // parallel\n")
+                parts.append("[Pipeline] }\n[Pipeline] // stage\n")
+        if not state["building"]:
+            result = "ABORTED" if build["aborted_at"] else "SUCCESS"
+            parts.append(f"[Pipeline] }}\n[Pipeline] // node\n[Pipeline] End of Pipeline\nFinished: {result}\n")
+        return "".join(parts)
+
+
+def create_app(fake: FakeJenkins) -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def bookkeeping(request: Request, call_next):
+        fake.requests += 1
+        fake.connections.add((request.client.host, request.client.port))
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+        if fake.fail_next > 0:
+            fake.fail_next -= 1
+            return PlainTextResponse("Jenkins is getting ready to work", status_code=503)
+        if request.method == "POST" and request.headers.get("Jenkins-Crumb") != fake.crumb:
+            return PlainTextResponse("No valid crumb was included in the request", status_code=403)
+        fake.start_queued_builds()
+        return await call_next(request)
+
+    @app.post("/_fake")
+    async def configure(request: Request):
+        options = await request.json()
+        fake.fail_next = options.get("fail_next", fake.fail_next)
+        if options.get("rotate_crumb"):
+            fake.crumb = uuid4().hex
+        fake.branch_stages = set(options.get("branch_stages", fake.branch_stages))
+        return {"ok": True}
+
+    @app.get("/crumbIssuer/api/json")
+    async def crumb():
+        fake.crumb_requests += 1
+        return {"crumbRequestField": "Jenkins-Crumb", "crumb": fake.crumb}
+
+    @app.post("/queue/item/{queue_id}/cancelQueue")
+    async def cancel_queue(queue_id: int):
+        if queue_id in fake.queue:
+            fake.queue[queue_id]["cancelled"] = True
+        return Response(status_code=204)
+
+    @app.get("/queue/item/{queue_id}/api/json")
+    async def queue_item(queue_id: int):
+        if queue_id not in fake.queue:
+            return PlainTextResponse("Not found", status_code=404)
+        return fake.queue_item(queue_id)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def jobs(path: str, request: Request):
+        path = path.strip("/")
+        body = (await request.body()).decode("utf-8")
+
+        if path == "createItem" or path.endswith("/createItem"):
+            parent = path[: -len("createItem")].strip("/")
+            name = request.query_params["name"]
+            job_path = f"{parent}/job/{name}" if parent else f"job/{name}"
+            if parent and parent not in fake.jobs:
+                return PlainTextResponse("No such folder", status_code=404)
+            if job_path in fake.jobs:
+                return PlainTextResponse(f"A job already exists with the name '{name}'", status_code=400)
+            fake.jobs[job_path] = {"config": body, "builds": []}
+            return Response(status_code=200)
+
+        build_match = BUILD_PATH.match(path)
+        if build_match and build_match.group("job") in fake.jobs:
+            job = fake.jobs[build_match.group("job")]
+            if not job["builds"]:
+                return PlainTextResponse("Not found", status_code=404)
+            number = build_match.group("build")
+            index = len(job["builds"]) if number == "lastBuild" else int(number)
+            if not 1 <= index <= len(job["builds"]):
+                return PlainTextResponse("Not found", status_code=404)
+            build = job["builds"][index - 1]
+            state = fake.build_state(build)
+            rest = build_match.group("rest").strip("/")
+
+            if rest == "api/json":
+                return {
+                    "id": str(build["number"]),
+                    "number": build["number"],
+                    "building": state["building"],
+                    "duration": 0 if state["building"] else int(state["elapsed"] * 1000),
+                    "estimatedDuration": int(len(build["stages"]) * STAGE_SECONDS * 1000),
+                    "timestamp": build["timestamp"],
+                    "result": None if state["building"] else ("ABORTED" if build["aborted_at"] else "SUCCESS"),
+                }
+            if rest == "wfapi/describe":
+                return {
+                    "id": str(build["number"]),
+                    "status": "IN_PROGRESS" if state["building"] else "SUCCESS",
+                    "stages": [
+                        {k: v for k, v in stage.items() if k != "progress"} for stage in state["stages"]
+                    ],
+                }
+            if rest == "pipeline-overview/log":
+                node_id = request.query_params.get("nodeId")
+                for stage in state["stages"]:
+                    if stage["id"] == node_id:
+                        return PlainTextResponse(fake.stage_log(stage))
+                return PlainTextResponse("Not found", status_code=404)
+            if rest == "consoleText":
+                return PlainTextResponse(fake.console(build, state))
+            if rest == "logText/progressiveText":
+                console = fake.console(build, state).encode("utf-8")
+                start = int(request.query_params.get("start", 0))
+                headers = {"X-Text-Size": str(len(console))}
+                if state["building"]:
+                    headers["X-More-Data"] = "true"
+                    if not console.endswith(b"\n"):
+                        fake.partial_reads += 1
+                return Response(console[start:], media_type="text/plain", headers=headers)
+            if rest == "stop" and request.method == "POST":
+                build["aborted_at"] = build["aborted_at"] or time.monotonic()
+                return Response(status_code=200)
+            return PlainTextResponse("Not found", status_code=404)
+
+        job_path, _, action = path.rpartition("/")
+        if job_path in fake.jobs:
+            job = fake.jobs[job_path]
+            if action == "config.xml":
+                if request.method == "POST":
+                    job["config"] = body
+                    return Response(status_code=200)
+                return Response(job["config"] or "<project><properties/></project>", media_type="application/xml")
+            if action == "build" and request.method == "POST":
+                queue_id = fake.start_build(job_path)
+                base = str(request.base_url).rstrip("/")
+                return Response(status_code=201, headers={"Location": f"{base}/queue/item/{queue_id}/"})
+            if action == "doDelete" and request.method == "POST":
+                del fake.jobs[job_path]
+                return Response(status_code=200)
+        if path.endswith("/api/json") and path[: -len("/api/json")] in fake.jobs:
+            job = fake.jobs[path[: -len("/api/json")]]
+            return {"builds": [{"number": b["number"]} for b in reversed(job["builds"])]}
+        if "/credentials/store/folder/domain/_/createCredentials" in path:
+            return Response(status_code=200)
+        return PlainTextResponse("Not found", status_code=404)
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def serve(fake: FakeJenkins, port: int):
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(fake), host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def tail_build(jenkins, fake: FakeJenkins, folder: str, build_id: str, check):
+    from fakeredis import aioredis
+
+    import services.main.utils.caching.redis_service as redis_service
+    from services.main.excecutor.LogTailer import OUTSIDE_STAGES, LogTailer
+
+    redis_service.redis_session = aioredis.FakeRedis(decode_responses=True)
+    stages = ["Init", "Plan", "Apply"]
+    tailer = LogTailer(jenkins, folder, "session", build_id)
+    resumed = False
+    whole_lines = True
+    partial_reads = fake.partial_reads
+    while not tailer.complete:
+        await tailer.poll()
+        console, _, _ = await jenkins.fetch_progressive_log(folder, "session", build_id, 0)
+        whole_lines = whole_lines and console[: tailer.offset].endswith(b"\n")
+        # Continue with a new tailer in the middle of a stage, as after a restart
+        if not resumed and "Plan" in tailer.blocks:
+            tailer = LogTailer(jenkins, folder, "session", build_id)
+            resumed = True
+        await asyncio.sleep(0.05)
+
+    _, size, more = await jenkins.fetch_progressive_log(folder, "session", build_id, tailer.offset)
+    check("tailer offset ends at X-Text-Size", tailer.offset == size and not more)
+    check("partial lines left for the next poll", fake.partial_reads > partial_reads and whole_lines)
+    logs = await tailer.get_logs(stages + [OUTSIDE_STAGES])
+    expected = {
+        name: [f"[{name}] step {i + 1}" for i in range(LOG_LINES_PER_STAGE)] for name in stages
+    }
+    expected[OUTSIDE_STAGES] = ["Started by user admin", "Finished: SUCCESS"]
+    check("console split into stages through branch blocks", logs == expected)
+
+
+async def smoke_test():
+    fake = FakeJenkins()
+    port = free_port()
+    server, server_task = await serve(fake, port)
+
+    os.environ["JENKINS_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("JENKINS_USERNAME", "admin")
+    os.environ.setdefault("JENKINS_API_TOKEN", "token")
+    from services.main.excecutor.JenkinsManager import JenkinsManager
+
+    jenkins = JenkinsManager()
+    checks = []
+
+    def check(name, ok):
+        checks.append(ok)
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+
+    with tempfile.TemporaryDirectory() as repo:
+        with open(os.path.join(repo, "Jenkinsfile"), "w") as f:
+            f.write("pipeline { stages { stage('Init') {} stage('Plan') {} stage('Apply') {} } }")
+
+        await jenkins.create_org_folder("org")
+        await jenkins.create_project_folder("org", "session", repo)
+        folder = "org/job/session"
+        await jenkins.create_local_pipeline(folder, "session", repo)
+        check("pipeline created", "job/org/job/session/job/session" in fake.jobs)
+        check("crumb fetched once", fake.crumb_requests == 1)
+
+        await jenkins.client.post("/_fake", json={"rotate_crumb": True})
+        await jenkins.create_local_pipeline(folder, "session", repo)
+        check("crumb refreshed after rotation", fake.crumb_requests == 2)
+
+        await jenkins.client.post("/_fake", json={"fail_next": 2})
+        builds = await jenkins.list_jenkins_builds(folder, "session")
+        check("GET retried through 503s", builds == {"builds": []})
+
+        started = time.perf_counter()
+        build_ids = await asyncio.gather(
+            jenkins.trigger_pipeline_build(folder, "session"),
+            jenkins.trigger_pipeline_build(folder, "session"),
+        )
+        print(f"     builds {build_ids} triggered in {time.perf_counter() - started:.2f}s")
+        check("concurrent triggers get their own build", sorted(build_ids) == [1, 2])
+        build_id = build_ids[0]
+
+        while True:
+            stages, building = await jenkins.get_stages_info(folder, "session", build_id)
+            if not building:
+                break
+            await asyncio.sleep(0.2)
+        check("all stages succeeded", [s["status"] for s in stages] == ["SUCCESS"] * 3)
+        logs = await jenkins.get_logs_for_stage(folder, "session", build_id, stages[0]["id"])
+        check("stage logs", logs.count("\n") == LOG_LINES_PER_STAGE)
+        console = await jenkins.fetch_console_output(folder, "session", build_id)
+        check("console output", console.count(" step ") == 3 * LOG_LINES_PER_STAGE)
+
+        offset, more = 0, True
+        while more:
+            data, offset, more = await jenkins.fetch_progressive_log(folder, "session", build_id, offset)
+        check("progressive log read to the end", offset == len(console.encode("utf-8")))
+
+        await jenkins.client.post("/_fake", json={"branch_stages": ["Apply"]})
+        build_id = await jenkins.trigger_pipeline_build(folder, "session")
+        await tail_build(jenkins, fake, folder, build_id, check)
+
+    print(f"     {fake.requests} requests over {len(fake.connections)} connections")
+    check("connections reused", len(fake.connections) < fake.requests / 4)
+
+    await jenkins.close()
+    server.should_exit = True
+    await server_task
+    return all(checks)
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        args = sys.argv[sys.argv.index("--serve") + 1 :]
+        port = int(args[0]) if args else 8089
+        print(f"Fake Jenkins on http://127.0.0.1:{port}")
+        uvicorn.run(create_app(FakeJenkins()), host="127.0.0.1", port=port, log_level="info")
+    else:
+        sys.exit(0 if asyncio.run(smoke_test()) else 1)
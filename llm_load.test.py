@@ -0,0 +1,99 @@
+"""
+Load test for LLMService against a local fake OpenAI-compatible provider.
+
+Starts a fake `/chat/completions` endpoint that answers after a fixed delay,
+points the Deepseek client at it and fires the same number of requests at
+increasing concurrency levels. With non-blocking dispatch the throughput
+scales with concurrency instead of staying flat at 1 / latency.
+
+Usage:
+    python llm_load.test.py
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+FAKE_PROVIDER_PORT = 8765
+FAKE_LATENCY_SECONDS = 0.5
+TOTAL_REQUESTS = 32
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+
+fake_provider = FastAPI()
+
+
+@fake_provider.post("/chat/completions")
+async def chat_completions(body: dict):
+    await asyncio.sleep(FAKE_LATENCY_SECONDS)
+    return {
+        "id": "fake-completion",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "ok"},
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+def start_fake_provider() -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(
+            fake_provider, host="127.0.0.1", port=FAKE_PROVIDER_PORT, log_level="warning"
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_level(llm, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request(i: int):
+        async with semaphore:
+            return await llm.llm_request(f"load test prompt {i}", platform="deepseek")
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[one_request(i) for i in range(TOTAL_REQUESTS)])
+    elapsed = time.perf_counter() - start
+    assert all(response == "ok" for response in responses)
+    return elapsed
+
+
+async def main():
+    from services.main.workers.llm_worker import LLMService
+
+    llm = LLMService()
+    print(f"{'concurrency':>12} {'elapsed (s)':>12} {'req/s':>8}")
+    for concurrency in CONCURRENCY_LEVELS:
+        elapsed = await run_level(llm, concurrency)
+        print(f"{concurrency:>12} {elapsed:>12.2f} {TOTAL_REQUESTS / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    for key in [
+        "GROQ_API_KEY",
+        "ANTHROPIC_API_KEY",
+        "OPENAI_API_KEY",
+        "GEMINI_API_KEY",
+        "DEEPSEEK_API_KEY",
+    ]:
+        os.environ.setdefault(key, "fake-key")
+    os.environ["DEEPSEEK_BASE_URL"] = f"http://127.0.0.1:{FAKE_PROVIDER_PORT}"
+
+    server = start_fake_provider()
+    try:
+        asyncio.run(main())
+    finally:
+        server.should_exit = True
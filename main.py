@@ -1,6 +1,7 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from api.preconditions import router as precon
 from api.analyze import router as analyze
 from api.chat import router as chat
@@ -8,10 +9,14 @@ from api.sockets import router as sockets
 from api.executer import router as executer
 from api.graph import router as graph
 from api.health import router as health
+from api.metrics import router as metrics
 from api.organization import router as organization
 from api.project import router as project
 from core.database import mongodb
 from core.logger import logger
+from core.tracing import HTTP_REQUEST_DURATION, bind
+from uuid import uuid4
+import time
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -21,12 +26,48 @@ async def lifespan(app: FastAPI):
     # Startup: Log application startup
     logger.info("Application starting up")
 
+    # Pending one-off Redis data migrations run in the background, so the app serves
+    # requests right away; sessions not migrated yet are unreadable until they are. Run
+    # `python migrate.py` before deploying to avoid that window. Completed migrations are
+    # skipped, failed ones are logged and retried on the next start.
+    from services.main.utils.caching.redis_service import SessionDataHandler
+
+    migrations = asyncio.create_task(SessionDataHandler.run_migrations())
+
     yield
 
-    # Shutdown: Close database connections and other resources
+    # An interrupted migration is safe to cancel, it runs again on the next start
+    migrations.cancel()
+    try:
+        await migrations
+    except asyncio.CancelledError:
+        pass
+
+    # Shutdown: Stop background work first, then close the connections it uses. Redis
+    # goes last, since pipeline watchers and the scraper still write to it.
+    from services.main.excecutor.PipelineWatcher import PipelineWatcher
+    from services.main.excecutor.service import jenkins
+
+    await PipelineWatcher.close()
+    await jenkins.close()
+
+    from services.main.analyzer.notifier import AnalysisNotifier
+
+    await AnalysisNotifier.close()
+
+    from services.main.management.planGenerator.TerraformDocScraper import (
+        TerraformDocScraper,
+    )
+
+    await TerraformDocScraper().shutdown()
+
     from core.database import mongodb
 
     await mongodb.close()
+
+    from services.main.utils.caching.redis import close_redis
+
+    await close_redis()
     logger.info("Application shutting down, closed all connections")
 
 
@@ -43,6 +84,7 @@ app.include_router(project, prefix="/api/v1/communication", tags=["communication
 app.include_router(analyze, prefix="/api/v1/analyzer", tags=["Analyzer"])
 app.include_router(precon, prefix="/api/v1/preconditions", tags=["Preconditions"])
 app.include_router(health, prefix="/api/v1", tags=["Health"])
+app.include_router(metrics, tags=["Metrics"])
 
 # CORS Middleware
 app.add_middleware(
@@ -56,6 +98,25 @@ app.add_middleware(
 )
 
 
+
+# Tag every request with an id that traces can be correlated by
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid4().hex
+    with bind(request_id=request_id):
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=response.status_code,
+        )
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 # Root endpoint
 @app.get("/")
 async def read_root():
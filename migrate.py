@@ -0,0 +1,27 @@
+"""
+Run the one-off Redis data migrations.
+
+The application also runs pending migrations in the background on startup. Running them
+ahead of a deployment avoids the window in which unmigrated sessions are unreadable.
+Migrations that already completed are skipped unless --force is given.
+
+Usage:
+    python migrate.py [--force]
+"""
+
+import asyncio
+import sys
+
+from services.main.utils.caching.redis import close_redis
+from services.main.utils.caching.redis_service import SessionDataHandler
+
+
+async def main(force: bool):
+    try:
+        await SessionDataHandler.run_migrations(force=force)
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main("--force" in sys.argv))
@@ -1,5 +1,6 @@
 from core.database import analysis_results
 from services.main.analyzer.service import AnalyzerService
+from services.main.analyzer.notifier import AnalysisNotifier
 from core.config import settings
 import logging
 import nest_asyncio
@@ -9,6 +10,9 @@ import os, asyncio
 nest_asyncio.apply()
 logger = logging.getLogger(__name__)
 
+ANALYSIS_WAIT_TIMEOUT = float(os.getenv("ANALYSIS_WAIT_TIMEOUT", 600))
+ANALYSIS_FALLBACK_POLL_SECONDS = float(os.getenv("ANALYSIS_FALLBACK_POLL_SECONDS", 30))
+
 
 async def run_analyzer_task(client_id: str, project_id: str, repo_url: str, branch: str):
     try:
@@ -79,6 +83,7 @@ async def run_analyzer_task(client_id: str, project_id: str, repo_url: str, bran
         logger.info(
             f"Analysis completed and stored for client_id={client_id}, project_id={project_id}"
         )
+        await AnalysisNotifier.notify(project_id)
     
 
     except Exception as e:
@@ -96,40 +101,57 @@ async def run_analyzer_task(client_id: str, project_id: str, repo_url: str, bran
             f"Error during analysis for project_id={project_id}, client_id={client_id}: {e}",
             exc_info=True
         )
+        await AnalysisNotifier.notify(project_id)
 
 
 
-async def get_generated_template(project_id: str) -> dict:
+async def get_generated_template(project_id: str, timeout: float = None) -> dict:
     """
     Retrieve the generated template for a specific project ID.
 
+    While the analysis is pending, waits for its completion notification instead of
+    polling. The stored status is still re-checked every ANALYSIS_FALLBACK_POLL_SECONDS
+    in case a notification is lost.
+
     :param project_id: The project ID to search for in the database.
+    :param timeout: Seconds to wait for a pending analysis (default ANALYSIS_WAIT_TIMEOUT).
     :return: The document containing the generated template.
     :raises ValueError: If no document is found for the given project ID.
+    :raises TimeoutError: If the analysis is still pending after the timeout.
     """
+    timeout = ANALYSIS_WAIT_TIMEOUT if timeout is None else timeout
+    event = AnalysisNotifier.subscribe(project_id)
     try:
         logger.info(f"Fetching generated template for project_id={project_id}")
-        # Query the database for the specific project_id
-        result = await analysis_results.find_one({"_id": project_id})
-
-        if not result:
-            raise ValueError(f"No generated template found for project_id={project_id}")
-        
-        if result.get("status") == "error":
-            raise ValueError(
-                f"Error occurred during analysis for project_id={project_id}: {result.get('error_message')}"
-            )
-        
-        doc = result.get("generated_template", {})
+        deadline = asyncio.get_running_loop().time() + timeout
 
-        while not doc and result.get("status") == "pending":
-            # Wait for a short period before checking again
-            await asyncio.sleep(2)
+        while True:
+            # Query the database for the specific project_id
             result = await analysis_results.find_one({"_id": project_id})
+
+            if not result:
+                raise ValueError(f"No generated template found for project_id={project_id}")
+
+            if result.get("status") == "error":
+                raise ValueError(
+                    f"Error occurred during analysis for project_id={project_id}: {result.get('error_message')}"
+                )
+
             doc = result.get("generated_template", {})
+            if doc or result.get("status") != "pending":
+                break
+
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"Analysis for project_id={project_id} did not complete within {timeout}s"
+                )
             logger.info(
                 f"Waiting for analysis to complete for project_id={project_id}..."
             )
+            await AnalysisNotifier.wait(
+                event, min(remaining, ANALYSIS_FALLBACK_POLL_SECONDS)
+            )
 
         logger.info(
             f"Generated template retrieved for project_id={project_id}: {doc}"
@@ -143,6 +165,9 @@ async def get_generated_template(project_id: str) -> dict:
         )
         raise
 
+    finally:
+        AnalysisNotifier.unsubscribe(project_id, event)
+
 
 async def get_projects_by_user_id(client_id: str) -> list:
     # Step 1: Get project_ids for the user
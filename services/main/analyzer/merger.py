@@ -0,0 +1,215 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Single-valued fields are filled as "value |file_name|"
+PROVENANCE_PATTERN = re.compile(r"^(.*?)\s*\|([^|]+)\|\s*$", re.DOTALL)
+
+# Priority of a source file by type, matched against its lower-cased path. First match wins.
+SOURCE_PRIORITIES = [
+    # Dockerfile, Dockerfile.prod, api.dockerfile
+    (re.compile(r"(^|/)dockerfile[\w.-]*$|\.dockerfile$"), 50),
+    # docker-compose.yml, compose.prod.yaml
+    (re.compile(r"(^|/)(docker-)?compose[\w.-]*\.ya?ml$"), 40),
+    # Dependency manifests
+    (
+        re.compile(
+            r"(^|/)(package\.json|requirements[\w.-]*\.txt|pyproject\.toml|setup\.py|setup\.cfg"
+            r"|pipfile|pom\.xml|build\.gradle(\.kts)?|go\.mod|cargo\.toml|gemfile|composer\.json)$"
+        ),
+        30,
+    ),
+    # CI/CD pipelines and infrastructure definitions
+    (
+        re.compile(
+            r"(^|/)(\.github/workflows/|\.circleci/|(k8s|kubernetes|helm|charts)/)"
+            r"|(^|/)(\.gitlab-ci\.ya?ml|jenkinsfile|azure-pipelines\.ya?ml)$|\.tf$"
+        ),
+        25,
+    ),
+    # Documentation
+    (re.compile(r"(^|/)(readme[\w.-]*|docs?/.*|[\w.-]+\.(md|rst))$"), 10),
+]
+DEFAULT_SOURCE_PRIORITY = 20
+
+
+class TemplateMerger:
+    """
+    Rule-based merge of per-file template contributions.
+
+    Multi-valued fields are unioned. For single-valued fields every file proposes a
+    candidate; a candidate's score is the priority of its source file type, plus a bonus
+    for every other file that proposes the same value. The best candidate wins unless the
+    runner-up is within AMBIGUITY_MARGIN, in which case the field is reported as ambiguous
+    so the caller can settle all such fields at once.
+    """
+
+    AGREEMENT_BONUS = 15
+    AMBIGUITY_MARGIN = 10
+
+    @staticmethod
+    def source_priority(file_name: Optional[str]) -> int:
+        if not file_name:
+            return DEFAULT_SOURCE_PRIORITY - 5
+        path = file_name.strip().lower().replace("\\", "/")
+        for pattern, priority in SOURCE_PRIORITIES:
+            if pattern.search(path):
+                return priority
+        return DEFAULT_SOURCE_PRIORITY
+
+    @staticmethod
+    def split_provenance(value: Any) -> Tuple[Any, Optional[str]]:
+        """
+        Split a "value |file_name|" string into the value and the file name.
+        """
+        if isinstance(value, str):
+            match = PROVENANCE_PATTERN.match(value)
+            if match:
+                return match.group(1).strip(), match.group(2).strip()
+        return value, None
+
+    @staticmethod
+    def merge(
+        contributions: List[Tuple[str, dict]], base_template: dict
+    ) -> Tuple[dict, List[dict]]:
+        """
+        Merge template contributions into the base template.
+
+        Args:
+            contributions (list): (file name, filled template) pairs.
+            base_template (dict): The empty template, giving the structure and defaults.
+
+        Returns:
+            tuple: The merged template, and the ambiguous fields as dicts with "path" (list
+                of keys) and "candidates" (raw values, best first). The merged template
+                holds the best candidate for those fields too.
+        """
+        ordered = sorted(
+            contributions,
+            key=lambda item: (-TemplateMerger.source_priority(item[0]), item[0]),
+        )
+        ambiguous = []
+        merged = TemplateMerger._merge_value(
+            [(file_name, template) for file_name, template in ordered],
+            base_template,
+            [],
+            ambiguous,
+        )
+        return merged, ambiguous
+
+    @staticmethod
+    def apply_choices(template: dict, ambiguous: List[dict], choices: Dict[str, int]):
+        """
+        Set ambiguous fields to the candidates picked for them, keyed by dotted path.
+        """
+        for field in ambiguous:
+            choice = choices.get(".".join(field["path"]))
+            if not isinstance(choice, int) or not 0 <= choice < len(field["candidates"]):
+                continue
+            target = template
+            for key in field["path"][:-1]:
+                target = target[key]
+            target[field["path"][-1]] = field["candidates"][choice]
+
+    @staticmethod
+    def _merge_value(candidates: List[Tuple[str, Any]], base: Any, path: list, ambiguous: list):
+        if isinstance(base, dict) or (
+            base is None and candidates and all(isinstance(v, dict) for _, v in candidates)
+        ):
+            base = base or {}
+            keys = list(base)
+            for _, value in candidates:
+                if isinstance(value, dict):
+                    keys.extend(key for key in value if key not in keys)
+            return {
+                key: TemplateMerger._merge_value(
+                    [
+                        (file_name, value[key])
+                        for file_name, value in candidates
+                        if isinstance(value, dict) and key in value
+                    ],
+                    base.get(key),
+                    path + [key],
+                    ambiguous,
+                )
+                for key in keys
+            }
+
+        if isinstance(base, list) or any(isinstance(v, list) for _, v in candidates):
+            return TemplateMerger._merge_list(candidates, base)
+
+        return TemplateMerger._pick_scalar(candidates, base, path, ambiguous)
+
+    @staticmethod
+    def _merge_list(candidates: List[Tuple[str, Any]], base: Any) -> list:
+        merged = []
+        seen = set()
+        for _, value in candidates:
+            for item in value if isinstance(value, list) else [value]:
+                if TemplateMerger._is_empty(item):
+                    continue
+                key = TemplateMerger._normalize(item)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        if not merged and isinstance(base, list):
+            return base
+        return merged
+
+    @staticmethod
+    def _pick_scalar(candidates: List[Tuple[str, Any]], base: Any, path: list, ambiguous: list):
+        proposals = {}
+        for file_name, raw in candidates:
+            if isinstance(raw, (dict, list)) or TemplateMerger._is_empty(raw):
+                continue
+            value, source = TemplateMerger.split_provenance(raw)
+            key = TemplateMerger._normalize(value)
+            priority = TemplateMerger.source_priority(source or file_name)
+            best = proposals.get(key)
+            if best is None:
+                proposals[key] = {"raw": raw, "priority": priority, "support": 1}
+            else:
+                best["support"] += 1
+                if priority > best["priority"]:
+                    best.update(raw=raw, priority=priority)
+
+        if not proposals:
+            return base
+
+        ranked = sorted(
+            proposals.values(),
+            key=lambda p: p["priority"] + TemplateMerger.AGREEMENT_BONUS * (p["support"] - 1),
+            reverse=True,
+        )
+        scores = [
+            p["priority"] + TemplateMerger.AGREEMENT_BONUS * (p["support"] - 1) for p in ranked
+        ]
+        contenders = [
+            proposal["raw"]
+            for proposal, score in zip(ranked, scores)
+            if scores[0] - score < TemplateMerger.AMBIGUITY_MARGIN
+        ]
+        if len(contenders) > 1:
+            ambiguous.append({"path": path, "candidates": contenders})
+        return ranked[0]["raw"]
+
+    @staticmethod
+    def _is_empty(value: Any) -> bool:
+        if value is None:
+            return True
+        if isinstance(value, str):
+            return not TemplateMerger.split_provenance(value)[0]
+        if isinstance(value, dict):
+            return all(TemplateMerger._is_empty(v) for v in value.values())
+        if isinstance(value, list):
+            return all(TemplateMerger._is_empty(v) for v in value)
+        return False
+
+    @staticmethod
+    def _normalize(value: Any) -> str:
+        if isinstance(value, str):
+            return TemplateMerger.split_provenance(value)[0].strip().lower()
+        if isinstance(value, dict):
+            # Provenance tags inside list items do not make them different
+            value = {k: TemplateMerger._normalize(v) for k, v in value.items()}
+        return json.dumps(value, sort_keys=True)
@@ -0,0 +1,115 @@
+from services.main.utils.caching.redis import redis_session
+from core.logger import logger
+from typing import Dict, Set
+import asyncio
+from uuid import uuid4
+
+
+class AnalysisNotifier:
+    """
+    Wakes coroutines waiting for a project's analysis as soon as it finishes.
+
+    Waiters in this process are woken directly by `notify`. Completions in other workers
+    arrive through Redis pub/sub: each process runs one listener on the
+    `analysis:done:*` pattern that sets the matching local events.
+    """
+
+    CHANNEL_PREFIX = "analysis:done:"
+    LISTENER_RETRY_SECONDS = 5
+    PROCESS_ID = uuid4().hex
+
+    _waiters: Dict[str, Set[asyncio.Event]] = {}
+    _listener: asyncio.Task = None
+
+    @staticmethod
+    def subscribe(project_id: str) -> asyncio.Event:
+        """
+        Register interest in a project's analysis. Subscribe before checking the stored
+        status, so a completion in between is not missed.
+        """
+        AnalysisNotifier._ensure_listener()
+        event = asyncio.Event()
+        AnalysisNotifier._waiters.setdefault(project_id, set()).add(event)
+        return event
+
+    @staticmethod
+    def unsubscribe(project_id: str, event: asyncio.Event):
+        waiters = AnalysisNotifier._waiters.get(project_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del AnalysisNotifier._waiters[project_id]
+
+    @staticmethod
+    async def wait(event: asyncio.Event, timeout: float) -> bool:
+        """
+        Wait until the event is set or the timeout passes. Clears the event so it can be
+        waited on again.
+
+        Returns:
+            bool: True if a notification arrived.
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            event.clear()
+
+    @staticmethod
+    async def notify(project_id: str):
+        """
+        Announce that a project's analysis has finished (successfully or not).
+        """
+        AnalysisNotifier._wake(project_id)
+        try:
+            await redis_session.publish(
+                AnalysisNotifier.CHANNEL_PREFIX + project_id, AnalysisNotifier.PROCESS_ID
+            )
+        except Exception as e:
+            logger.error(f"Error publishing analysis completion for {project_id}: {e}")
+
+    @staticmethod
+    def _wake(project_id: str):
+        for event in AnalysisNotifier._waiters.get(project_id, ()):
+            event.set()
+
+    @staticmethod
+    def _ensure_listener():
+        listener = AnalysisNotifier._listener
+        if listener is None or listener.done():
+            AnalysisNotifier._listener = asyncio.create_task(AnalysisNotifier._listen())
+
+    @staticmethod
+    async def _listen():
+        while True:
+            pubsub = redis_session.pubsub()
+            try:
+                await pubsub.psubscribe(AnalysisNotifier.CHANNEL_PREFIX + "*")
+                async for message in pubsub.listen():
+                    # Waiters in this process were already woken by notify
+                    if (
+                        message.get("type") == "pmessage"
+                        and message.get("data") != AnalysisNotifier.PROCESS_ID
+                    ):
+                        channel = message["channel"]
+                        AnalysisNotifier._wake(channel[len(AnalysisNotifier.CHANNEL_PREFIX) :])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Analysis notification listener failed, retrying: {e}")
+                await asyncio.sleep(AnalysisNotifier.LISTENER_RETRY_SECONDS)
+            finally:
+                await pubsub.aclose()
+
+    @staticmethod
+    async def close():
+        listener = AnalysisNotifier._listener
+        AnalysisNotifier._listener = None
+        if listener and not listener.done():
+            listener.cancel()
+            try:
+                await listener
+            except asyncio.CancelledError:
+                pass
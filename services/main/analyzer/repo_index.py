@@ -0,0 +1,157 @@
+import os
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Directories left out of the tree shown to the LLM and of the environment variable scan
+IGNORED_DIRECTORIES = {
+    ".git", "node_modules", "vendor", "dist", "build", "target", "out", "coverage",
+    "__pycache__", ".venv", "venv", ".next", ".nuxt", ".idea", ".vscode",
+}
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".ico", ".bmp", ".webp", ".svg", ".pdf", ".zip",
+    ".gz", ".tgz", ".tar", ".jar", ".war", ".class", ".so", ".dll", ".exe", ".bin",
+    ".woff", ".woff2", ".ttf", ".eot", ".mp3", ".mp4", ".mov", ".lock", ".min.js", ".map",
+}
+LANGUAGES = {
+    ".py": "Python", ".js": "JavaScript", ".jsx": "JavaScript", ".mjs": "JavaScript",
+    ".cjs": "JavaScript", ".ts": "TypeScript", ".tsx": "TypeScript", ".java": "Java",
+    ".kt": "Kotlin", ".go": "Go", ".rb": "Ruby", ".php": "PHP", ".cs": "C#", ".rs": "Rust",
+    ".c": "C", ".cpp": "C++", ".h": "C", ".swift": "Swift", ".scala": "Scala",
+    ".sh": "Shell", ".tf": "HCL", ".yml": "YAML", ".yaml": "YAML", ".json": "JSON",
+    ".toml": "TOML", ".md": "Markdown", ".html": "HTML", ".css": "CSS", ".sql": "SQL",
+}
+# Bytes sniffed for a NUL byte to detect binary files
+BINARY_SNIFF_BYTES = 8192
+
+
+class RepoFile(NamedTuple):
+    path: str
+    size: int
+    blob: str
+    language: Optional[str]
+
+
+class RepoIndex:
+    """
+    Lazy index of a checked out commit: paths, sizes, languages and git blob hashes.
+
+    Listing comes from `git ls-tree`, so building the index reads no file content.
+    Contents are read on demand, only for the files that are needed.
+    """
+
+    def __init__(self, root: str, name: str, files: List[RepoFile]):
+        self.root = root
+        self.name = name
+        self.files: Dict[str, RepoFile] = {file.path: file for file in files}
+
+    @classmethod
+    async def build(
+        cls, root: str, name: str, git: Callable[..., Awaitable[str]]
+    ) -> "RepoIndex":
+        """
+        Index the commit checked out at `root`.
+
+        Args:
+            root (str): Path of the checkout.
+            name (str): Repository name, shown as the root of the tree.
+            git (callable): Runs git with the given arguments and a `cwd`, e.g. RepoService.git.
+        """
+        output = await git("ls-tree", "-r", "-l", "-z", "HEAD", cwd=root)
+        files = []
+        for record in output.split("\0"):
+            if "\t" not in record:
+                continue
+            meta, path = record.split("\t", 1)
+            mode, object_type, blob, size = meta.split()
+            # Skip submodules and symlinks
+            if object_type != "blob" or mode == "120000":
+                continue
+            files.append(RepoFile(path, int(size), blob, cls.language_of(path)))
+        return cls(root, name, files)
+
+    @staticmethod
+    def language_of(path: str) -> Optional[str]:
+        return LANGUAGES.get(os.path.splitext(path)[1].lower())
+
+    @property
+    def blobs(self) -> Dict[str, str]:
+        return {path: file.blob for path, file in self.files.items()}
+
+    @staticmethod
+    def is_ignored(path: str) -> bool:
+        return any(part in IGNORED_DIRECTORIES for part in path.split("/")[:-1])
+
+    @staticmethod
+    def is_binary_path(path: str) -> bool:
+        name = path.lower()
+        return any(name.endswith(extension) for extension in BINARY_EXTENSIONS)
+
+    def find(self, file_name: str) -> Optional[str]:
+        """
+        Find a file by exact path, or else by path suffix.
+        """
+        normalized = file_name.strip().lstrip("/").replace("\\", "/")
+        if normalized in self.files:
+            return normalized
+        for path in self.files:
+            if path.endswith("/" + normalized):
+                return path
+        lowered = normalized.lower()
+        for path in self.files:
+            if path.lower() == lowered or path.lower().endswith("/" + lowered):
+                return path
+        return None
+
+    def read(self, path: str, max_bytes: int = None) -> Optional[str]:
+        """
+        Read a file's content, or None if it is missing, binary or larger than max_bytes.
+        """
+        file = self.files.get(path)
+        if file is None or (max_bytes is not None and file.size > max_bytes):
+            return None
+        try:
+            with open(os.path.join(self.root, path), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def iter_text_files(self, max_bytes: int) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (path, content) for every text file up to max_bytes, outside ignored directories.
+        """
+        for path, file in self.files.items():
+            if file.size > max_bytes or self.is_ignored(path) or self.is_binary_path(path):
+                continue
+            content = self.read(path)
+            if content is not None:
+                yield path, content
+
+    def tree(self) -> str:
+        """
+        Render the file tree, without ignored directories.
+        """
+        root: dict = {}
+        for path in sorted(self.files):
+            if self.is_ignored(path):
+                continue
+            node = root
+            parts = path.split("/")
+            for part in parts[:-1]:
+                node = node.setdefault(part + "/", {})
+            node[parts[-1]] = None
+
+        lines = ["Directory structure:", f"└── {self.name}/"]
+
+        def render(node: dict, prefix: str):
+            # Files first, then directories
+            entries = sorted(node.items(), key=lambda item: (item[1] is not None, item[0]))
+            for i, (entry, children) in enumerate(entries):
+                last = i == len(entries) - 1
+                lines.append(f"{prefix}{'└── ' if last else '├── '}{entry}")
+                if children is not None:
+                    render(children, prefix + ("    " if last else "│   "))
+
+        render(root, "    ")
+        return "\n".join(lines)
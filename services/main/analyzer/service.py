@@ -4,11 +4,35 @@ from services.main.utils.prompts.service import PromptManagerService
 from services.main.workers.llm_worker import LLMService
 from services.main.management.planGenerator.FileParser import FileParser
 from services.main.management.repoManager.service import RepoService
-from gitingest import ingest
-import asyncio, re
+from services.main.utils.caching.redis_service import AnalysisCache
+from services.main.analyzer.merger import TemplateMerger
+from core.logger import logger
+from services.main.analyzer.repo_index import RepoIndex
+from git import GitCommandError
+import asyncio, hashlib, re
+from uuid import uuid4
 
 
 class AnalyzerService:
+    # Prompts embed the repository tree / file content, so hits mean unchanged inputs.
+    IDENTIFY_FILES_CACHE_TTL = 3600 * 24
+    FILL_TEMPLATE_CACHE_TTL = 3600 * 24 * 7
+    RESOLVE_FIELDS_CACHE_TTL = 3600 * 24 * 7
+    # Bump when the analysis output changes so cached results are recomputed
+    ANALYSIS_CACHE_VERSION = "v2"
+
+    # Identified files larger than this are not sent to the LLM
+    MAX_ANALYZED_FILE_BYTES = int(os.getenv("ANALYSIS_MAX_FILE_BYTES", 256 * 1024))
+    # Files larger than this are not scanned for environment variables
+    ENV_SCAN_MAX_FILE_BYTES = int(os.getenv("ANALYSIS_ENV_SCAN_MAX_FILE_BYTES", 1024 * 1024))
+
+    # Files are filled several per request, up to this many tokens of file content.
+    # Files over FILL_SINGLE_FILE_TOKENS always get a request of their own.
+    FILL_BATCH_TOKENS = int(os.getenv("ANALYSIS_FILL_BATCH_TOKENS", 6000))
+    FILL_SINGLE_FILE_TOKENS = int(os.getenv("ANALYSIS_FILL_SINGLE_FILE_TOKENS", 3000))
+    # Shared by all analyses, to stay within provider rate limits
+    _llm_slots = asyncio.Semaphore(int(os.getenv("ANALYSIS_LLM_CONCURRENCY", 4)))
+
     def __init__(self):
         self.llm_service = LLMService()
         self.prompt_manager = PromptManagerService()
@@ -16,12 +40,12 @@ class AnalyzerService:
         self.repo_service = RepoService(os.getenv("TEMP_REPO_PATH"))
 
     async def identify_deployment_files(
-        self, repo_path: str, branch: str, template_path: str
+        self, repo_index: RepoIndex, template_path: str
     ) -> list:
         """
         Identifies files in the repository that may contain deployment-related information.
 
-        :param repo_path: Path to the Git repository.
+        :param repo_index: Index of the checked out repository.
         :param template_path: Path to the described_template_dict.json file.
         :return: List of files that may contain deployment-related information.
         """
@@ -29,12 +53,10 @@ class AnalyzerService:
         with open(template_path, "r", encoding="utf-8") as file:
             template_content = file.read()
 
-        # Use GitIngest to analyze the repository structure
-        repo_path = await self.repo_service.clone_repo(repo_url=repo_path, branch=branch, session_id="temp")
-        print(f"Repo path: {repo_path}")
-        summary, tree, content = ingest(repo_path, branch=branch)
-
-        print("\n".join(tree.split("\n")[1:]))
+        # Only the file tree is sent, contents are read later for the chosen files
+        print(f"Repo path: {repo_index.root}")
+        tree = "\n".join(repo_index.tree().split("\n")[1:])
+        print(tree)
 
         # Prepare the prompt for the LLM
         prompt = f"""
@@ -45,7 +67,7 @@ class AnalyzerService:
 
         Here is the Git repository structure:
 
-        {"\n".join(tree.split("\n")[1:])}
+        {tree}
 
         Your task:
         - Identify and return a **JSON array** of file paths that may contain deployment-related information.
@@ -65,7 +87,11 @@ class AnalyzerService:
         """
 
         # Send the prompt to the LLM and get the response
-        response = await self.llm_service.llm_request(prompt)
+        response = await self.llm_service.llm_request(
+            prompt,
+            cache_ttl=self.IDENTIFY_FILES_CACHE_TTL,
+            cache_name="identify_deployment_files",
+        )
         identified_files = self.file_parser.parse_json(response)["files"]
         print(f"Identified files: {response} parsed: {identified_files}")  
         try:
@@ -77,7 +103,7 @@ class AnalyzerService:
         except Exception as e:
             raise ValueError(f"Failed to process LLM response: {e}")
 
-        return identified_files, content, tree
+        return identified_files
 
     async def fill_json_template(
         self,
@@ -138,7 +164,11 @@ class AnalyzerService:
         """
 
         # Send the prompt to the LLM and get the response
-        response = await self.llm_service.llm_request(prompt)
+        response = await self.llm_service.llm_request(
+            prompt,
+            cache_ttl=self.FILL_TEMPLATE_CACHE_TTL,
+            cache_name="fill_json_template",
+        )
 
         # Clean the LLM response by removing code block markers and trimming whitespace
         cleaned_response = response.strip().strip("```json").strip("```")
@@ -156,150 +186,284 @@ class AnalyzerService:
 
         return modified_template
 
-    async def compare_single_valued_field(
-        self, field_name: str, value1, value2, field_description: str
-    ) -> str:
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Roughly 4 characters per token
+        return len(text) // 4 + 1
+
+    def pack_files(self, files: dict) -> list:
         """
-        Compares two values for a single-valued field using the field description to decide the most relevant value.
+        Groups files into batches whose combined content fits FILL_BATCH_TOKENS.
 
-        :param field_name: The name of the field being compared.
-        :param value1: The first value to compare.
-        :param value2: The second value to compare.
-        :param field_description: The description of the field to guide the comparison.
-        :return: The most relevant value for the field.
+        :param files: Dictionary of file name -> file content.
+        :return: List of batches, each a list of file names. Large files are alone in theirs.
         """
-        # Ensure values are strings
-        value1 = str(value1) if value1 is not None else ""
-        value2 = str(value2) if value2 is not None else ""
+        batches = []
+        sizes = []
+        # First fit, largest files first, so the packing is stable for the same files
+        for file_name in sorted(files, key=lambda name: (-len(files[name]), name)):
+            tokens = self.estimate_tokens(files[file_name])
+            if tokens > self.FILL_SINGLE_FILE_TOKENS:
+                batches.append([file_name])
+                sizes.append(self.FILL_BATCH_TOKENS)
+                continue
+            for index, size in enumerate(sizes):
+                if size + tokens <= self.FILL_BATCH_TOKENS:
+                    batches[index].append(file_name)
+                    sizes[index] += tokens
+                    break
+            else:
+                batches.append([file_name])
+                sizes.append(tokens)
+        return batches
 
-        # Extract file names from the values if present
-        value1_file = value1.split("|")[-1] if "|" in value1 else "unknown"
-        value2_file = value2.split("|")[-1] if "|" in value2 else "unknown"
+    async def fill_json_templates(
+        self, files: dict, described_template: dict, current_template: dict
+    ) -> dict:
+        """
+        Fills the JSON template for several files, packing small files into shared requests.
 
-        prompt = f"""
-        You are an intelligent assistant tasked with comparing two values for a specific field in a JSON structure.
+        :param files: Dictionary of file name -> file content.
+        :param described_template: The detailed template describing all fields and their descriptions.
+        :param current_template: The current (possibly empty) JSON template to fill.
+        :return: Dictionary of file name -> filled template, for the files that could be filled.
+        """
+
+        async def fill_batch(batch):
+            async with self._llm_slots:
+                if len(batch) == 1:
+                    return {
+                        batch[0]: await self.fill_json_template(
+                            file_name=batch[0],
+                            file_content=files[batch[0]],
+                            described_template=described_template,
+                            current_template=current_template,
+                        )
+                    }
+                return await self.fill_json_template_batch(
+                    {file_name: files[file_name] for file_name in batch},
+                    described_template,
+                    current_template,
+                )
 
-        Field Name: {field_name}
-        Field Description: {field_description}
+        async def fill_alone(file_name):
+            async with self._llm_slots:
+                return await self.fill_json_template(
+                    file_name=file_name,
+                    file_content=files[file_name],
+                    described_template=described_template,
+                    current_template=current_template,
+                )
 
-        - Value 1: {value1} (from file `{value1_file}`)
-        - Value 2: {value2} (from file `{value2_file}`)
+        batches = self.pack_files(files)
+        logger.info(f"Filling the template for {len(files)} files in {len(batches)} requests.")
+        results = {}
+        for batch, outcome in zip(
+            batches,
+            await asyncio.gather(*(fill_batch(batch) for batch in batches), return_exceptions=True),
+        ):
+            # A cancelled fill is a BaseException, not an Exception, and stops the analysis
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                logger.error(f"Error filling the template for {batch}: {outcome}")
+                outcome = {}
+            results.update(outcome)
+
+        # Files a batched response left out are retried on their own
+        missing = [file_name for file_name in files if file_name not in results]
+        retried = await asyncio.gather(
+            *(fill_alone(file_name) for file_name in missing), return_exceptions=True
+        )
+        for file_name, outcome in zip(missing, retried):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                logger.error(f"Error filling the template for {file_name}: {outcome}")
+            else:
+                results[file_name] = outcome
+        return results
 
-        Your task:
-        - Compare the two values based on the field description.
-        - Decide which value is more relevant and explain your reasoning.
-        - STRICTLY return the most relevant value as plain text without any additional comments or formatting.
+    async def fill_json_template_batch(
+        self, files: dict, described_template: dict, current_template: dict
+    ) -> dict:
         """
-        response = await self.llm_service.llm_request(prompt)
-        return response.strip()
+        Fills a copy of the current JSON template for each of several files in a single request.
 
-    def parse_repo_contents(self, repo_contents: str) -> dict:
+        :param files: Dictionary of file name -> file content.
+        :param described_template: The detailed template describing all fields and their descriptions.
+        :param current_template: The current (possibly empty) JSON template to fill.
+        :return: Dictionary of file name -> filled template, for the files present in the response.
         """
-        Parses the repository content into a dictionary of file paths and their contents.
+        described_template_json = json.dumps(described_template, indent=4)
+        current_template_json = json.dumps(current_template, indent=4)
+        file_sections = "\n\n".join(
+            f"--- File: `{file_name}` ---\n{file_content}"
+            for file_name, file_content in files.items()
+        )
+        file_names_json = json.dumps(list(files))
+
+        prompt = f"""
+        You are an intelligent assistant tasked with analyzing the content of several files and filling in the provided JSON template
+        separately for each file. Use the detailed field descriptions from the described template to understand the purpose and format of each field.
 
-        :param repo_contents: The raw string content of the repository.
-        :return: A dictionary with normalized file paths as keys and file contents as values.
+        **Important Context**:
+        - The files being analyzed are: {file_names_json}.
+        - Fill each file's template only from that file's content.
+        - Consider whether it is appropriate to fill certain fields based on the file's purpose and typical content:
+          - Configuration files typically define runtime environments, environment variables, and networking configurations.
+          - Build files describe the build process and runtime dependencies.
+          - Dependency files list application dependencies, versions, and metadata like application name and description.
+          - Source code files reveal application frameworks, ports, and logging configurations but rarely contain deployment-specific details.
+          - CI/CD pipeline files define automated workflows for building, testing, and deploying the application.
+          - Documentation files provide metadata or instructions and may describe the application or its deployment process.
+
+        **Additional Requirement**:
+        - For single-valued fields (e.g., "name", "description"), append the name of the file the value was taken from in this format: `|file_name|` after the value.
+          - Example: `"name": "awesome-app |readme.md|`.
+
+        **Described Template (Field Descriptions)**:
+        {described_template_json}
+
+        **File Contents**:
+        {file_sections}
+
+        **Current Template (To Be Filled)**:
+        {current_template_json}
+
+        **Your Task**:
+        - For each file, fill as many fields in a copy of the JSON template as possible from that file's content.
+        - Ensure all filled fields adhere to the descriptions provided in the Described Template.
+        - If a field cannot be filled or is irrelevant based on the file type, leave it unchanged in that file's template.
+        - STRICTLY return a single JSON object mapping each file name to its filled template, without any additional explanations or comments:
+          {{"<file name>": {{...filled template...}}}}
         """
-        files = {}
-        sections = repo_contents.split(
-            "================================================\n"
+
+        response = await self.llm_service.llm_request(
+            prompt,
+            cache_ttl=self.FILL_TEMPLATE_CACHE_TTL,
+            cache_name="fill_json_template_batch",
         )
 
-        for i in range(1, len(sections), 2):
-            file_header = sections[i].strip()
-            if file_header.startswith("File:"):
-                # Normalize the file path (remove leading slashes and backslashes)
-                file_path = (
-                    file_header.split("File:")[-1]
-                    .strip()
-                    .lstrip("/")
-                    .replace("\\", "/")
-                )
-                print(f"File path: {file_path}")
-                file_content = sections[i + 1].strip()
-                files[file_path] = file_content
+        cleaned_response = response.strip().strip("```json").strip("```")
+        if not cleaned_response:
+            raise ValueError("LLM response is empty after cleaning.")
+
+        try:
+            filled_templates = json.loads(cleaned_response)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse LLM response as JSON: {e}")
+        if not isinstance(filled_templates, dict):
+            raise ValueError("The LLM response is not a valid dictionary.")
+
+        return {
+            file_name: template
+            for file_name, template in filled_templates.items()
+            if file_name in files and isinstance(template, dict)
+        }
 
-        return files
+    async def resolve_ambiguous_fields(
+        self, ambiguous: list, described_template: dict
+    ) -> dict:
+        """
+        Asks the LLM to settle every ambiguous single-valued field in one request.
 
-    def find_matching_file(self, file_name: str, parsed_contents: dict) -> str:
+        :param ambiguous: Ambiguous fields as returned by TemplateMerger.merge.
+        :param described_template: The detailed template describing all fields and their descriptions.
+        :return: A dictionary of dotted field path -> index of the chosen candidate.
         """
-        Finds a matching file in the parsed contents using exact or approximate matching.
+        fields = []
+        for field in ambiguous:
+            description = described_template
+            for key in field["path"]:
+                if isinstance(description, list):
+                    description = description[0] if description else {}
+                description = description.get(key, {}) if isinstance(description, dict) else {}
+            if not isinstance(description, str):
+                description = "No description available."
+
+            candidates = []
+            for index, raw in enumerate(field["candidates"]):
+                value, source = TemplateMerger.split_provenance(raw)
+                candidates.append(f"  {index}: {json.dumps(value)} (from file `{source or 'unknown'}`)")
+            fields.append(
+                f"- Field: {'.'.join(field['path'])}\n"
+                f"  Description: {description}\n" + "\n".join(candidates)
+            )
+
+        fields_text = "\n\n".join(fields)
+        prompt = f"""
+        You are an intelligent assistant tasked with choosing the most relevant value for fields in a JSON structure
+        describing an application's deployment. Each field below has conflicting values extracted from different files.
 
-        :param file_name: The file name to search for.
-        :param parsed_contents: Dictionary of parsed repository contents.
-        :return: The matched file content or None if no match is found.
+        {fields_text}
+
+        Your task:
+        - For each field, choose the value that best matches the field description.
+        - STRICTLY return a JSON object mapping each field to the number of the chosen value, without any additional comments.
+
+        <output>
+        {{
+            "application.name": 0
+        }}
+        </output>
         """
-        # Normalize the file name
-        normalized_file_name = file_name.lstrip("/").replace("\\", "/")
+        try:
+            response = await self.llm_service.llm_request(
+                prompt,
+                cache_ttl=self.RESOLVE_FIELDS_CACHE_TTL,
+                cache_name="resolve_ambiguous_fields",
+            )
+            choices = self.file_parser.parse_json(response)
+        except Exception as e:
+            logger.warning(f"Could not resolve ambiguous fields, keeping rule-based values: {e}")
+            return {}
+        return choices if isinstance(choices, dict) else {}
 
-        # Exact match
-        if normalized_file_name in parsed_contents:
-            return parsed_contents[normalized_file_name]
+    async def resolve_remote_commit(self, repo_url: str, branch: str) -> str:
+        """
+        Resolves the commit a remote branch points to, without cloning.
 
-        # Fallback: Approximate match by file name
-        for key in parsed_contents.keys():
-            if key.endswith(normalized_file_name):
-                return parsed_contents[key]
+        :param repo_url: URL of the repository.
+        :param branch: Branch to resolve.
+        :return: The commit SHA, or None if it could not be resolved.
+        """
+        try:
+            output = await self.repo_service.git("ls-remote", repo_url, f"refs/heads/{branch}")
+        except GitCommandError as e:
+            logger.warning(f"Could not resolve {branch} of {repo_url}: {e}")
+            return None
+        return output.split()[0] if output else None
 
-        return None
+    def analysis_cache_version(self, *template_paths: str) -> str:
+        """
+        Identifies the templates an analysis is produced with, for keying cached results.
+        """
+        digest = hashlib.sha256(self.ANALYSIS_CACHE_VERSION.encode("utf-8"))
+        for path in template_paths:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
 
     async def merge_templates(
-        self, base_template: dict, updated_template: dict, described_template: dict
+        self, contributions: list, base_template: dict, described_template: dict
     ) -> dict:
         """
-        Merges an updated template into a base template, preserving existing details and appending to multi-valued fields.
+        Merges per-file templates into the base template, appending to multi-valued fields.
+        Single-valued fields are decided by TemplateMerger from the `|file_name|` tags; fields
+        it cannot decide are settled together in a single LLM request.
 
-        :param base_template: The original template with existing data.
-        :param updated_template: The new template with updates from the latest file.
+        :param contributions: List of (file name, filled template) pairs.
+        :param base_template: The empty template.
         :param described_template: The detailed template describing all fields and their descriptions.
         :return: The merged template.
         """
-        for key, value in updated_template.items():
-            if isinstance(value, dict):
-                # Recursively merge dictionaries
-                base_template[key] = await self.merge_templates(
-                    base_template.get(key, {}), value, described_template.get(key, {})
-                )
-            elif isinstance(value, list):
-                # Merge lists of dictionaries or primitive values
-                if isinstance(base_template.get(key), list):
-                    if all(isinstance(item, dict) for item in value):
-                        # Handle lists of dictionaries (e.g., dependencies)
-                        existing_items = base_template.get(key, [])
-                        for new_item in value:
-                            if new_item not in existing_items:
-                                existing_items.append(new_item)
-                        base_template[key] = existing_items
-                    else:
-                        # Handle lists of primitive values
-                        base_template[key] = list(
-                            set(base_template.get(key, []) + value)
-                        )
-                else:
-                    # If base is not a list, replace it with the new value
-                    base_template[key] = value
-            elif isinstance(base_template.get(key), list):
-                # If base is a list but value is not, replace the list with the new value
-                base_template[key] = value
-            else:
-                # Handle single-valued fields
-                existing_value = base_template.get(key)
-                if existing_value:
-                    # Compare existing value with the new value using LLM
-                    field_description = described_template.get(
-                        key, "No description available."
-                    )
-                    best_value = await self.compare_single_valued_field(
-                        field_name=key,
-                        value1=existing_value,
-                        value2=value,
-                        field_description=field_description,
-                    )
-                    base_template[key] = best_value
-                else:
-                    # If no existing value, use the new value
-                    base_template[key] = value
-        return base_template
+        merged, ambiguous = TemplateMerger.merge(contributions, base_template)
+        if ambiguous:
+            logger.info(f"Resolving {len(ambiguous)} ambiguous template fields.")
+            choices = await self.resolve_ambiguous_fields(ambiguous, described_template)
+            TemplateMerger.apply_choices(merged, ambiguous, choices)
+        return merged
 
     async def optimize_template(
         self, current_template: dict, described_template: dict
@@ -388,13 +552,31 @@ class AnalyzerService:
     ) -> dict:
         """
         Processes files identified from the repository and updates the JSON template file by file.
-        Resolves conflicts for single-valued fields using the LLM.
+        Conflicting single-valued fields are resolved by file type priority, and the LLM only
+        settles the ones that stay ambiguous.
+
+        Results are cached per commit, and each file's contribution per blob hash, so
+        re-analysing an unchanged commit costs nothing and a new commit only refills the
+        files that changed.
 
-        :param repo_path: Path to the Git repository.
+        :param repo_path: URL of the Git repository.
+        :param branch: Branch to analyse.
         :param described_template_path: Path to the described template JSON file.
         :param empty_template_path: Path to the initial empty JSON template.
         :return: The final filled JSON template.
         """
+        cache_version = self.analysis_cache_version(
+            described_template_path, empty_template_path
+        )
+
+        # An unchanged branch head needs neither a clone nor any LLM call
+        remote_commit = await self.resolve_remote_commit(repo_path, branch)
+        if remote_commit:
+            cached = await AnalysisCache.get_result(cache_version, repo_path, remote_commit)
+            if cached is not None:
+                logger.info(f"Reusing analysis of {repo_path} at {remote_commit}.")
+                return cached
+
         # Load the described template and empty template
         with open(described_template_path, "r", encoding="utf-8") as f:
             described_template = json.load(f)
@@ -402,10 +584,62 @@ class AnalyzerService:
         with open(empty_template_path, "r", encoding="utf-8") as f:
             current_template = json.load(f)
 
+        # Resolve the branch head through the local mirror, which the checkout uses anyway
+        commit_sha = await self.repo_service.update_mirror(repo_path, branch)
+        if commit_sha != remote_commit:
+            cached = await AnalysisCache.get_result(cache_version, repo_path, commit_sha)
+            if cached is not None:
+                logger.info(f"Reusing analysis of {repo_path} at {commit_sha}.")
+                return cached
+
+        local_path = os.path.join(self.repo_service.root_path, "analysis", uuid4().hex)
+        commit_sha = await self.repo_service.checkout_from_mirror(repo_path, branch, local_path)
+        try:
+            return await self.analyze_checkout(
+                repo_path,
+                branch,
+                local_path,
+                commit_sha,
+                cache_version,
+                described_template_path,
+                described_template,
+                current_template,
+            )
+        finally:
+            await self.repo_service.remove_checkout(repo_path, local_path)
+
+    async def analyze_checkout(
+        self,
+        repo_path: str,
+        branch: str,
+        local_path: str,
+        commit_sha: str,
+        cache_version: str,
+        described_template_path: str,
+        described_template: dict,
+        current_template: dict,
+    ) -> dict:
+        """
+        Analyses a checked out commit, reusing cached contributions of unchanged files.
+
+        :param repo_path: URL of the Git repository.
+        :param branch: Branch being analysed.
+        :param local_path: Path of the checkout.
+        :param commit_sha: The checked out commit.
+        :param cache_version: Identifies the templates, see analysis_cache_version.
+        :param described_template_path: Path to the described template JSON file.
+        :param described_template: The described template.
+        :param current_template: The empty template to fill.
+        :return: The final filled JSON template.
+        """
+        repo_name = repo_path.rstrip("/").split("/")[-1].replace(".git", "")
+        repo_index = await RepoIndex.build(local_path, repo_name, self.repo_service.git)
+        blobs = repo_index.blobs
+
         # Identify deployment-related files
-        files, repo_contents, tree = await self.identify_deployment_files(
-            repo_path=repo_path, branch=branch, template_path=described_template_path
-  )
+        files = await self.identify_deployment_files(
+            repo_index=repo_index, template_path=described_template_path
+        )
 
         if not files:
             print("No deployment-related files found.")
@@ -413,37 +647,53 @@ class AnalyzerService:
 
         print(f"Files identified: {files}")
 
-        # Parse the repository contents into a dictionary
-        parsed_contents = self.parse_repo_contents(repo_contents)
-        dockerfile = parsed_contents.get("Dockerfile", None)
+        dockerfile = await self.repo_service.run_fs(repo_index.read, "Dockerfile")
         print(f"Dockerfile contents: {dockerfile}")
 
-        async def process_file(file_name):
-            print(f"Processing file: {file_name}")
-            file_content = self.find_matching_file(file_name, parsed_contents)
-            if not file_content:
+        matched_paths = {}
+        for file_name in files:
+            path = repo_index.find(file_name)
+            if path is None:
                 print(f"File {file_name} not found in repository contents. Skipping.")
-                return None
-            updated_template = await self.fill_json_template(
-            file_name=file_name,
-            file_content=file_content,
-            described_template=described_template,
-            current_template=current_template,
-            )
-            return (file_name, updated_template)
+            elif path not in matched_paths.values():
+                matched_paths[file_name] = path
 
-        # Run fill_json_template for all files concurrently
-        tasks = [process_file(file_name) for file_name in files]
-        results = await asyncio.gather(*tasks)
-
-        # Filter out None results (files not found)
-        updated_templates = [tpl for _, tpl in results if _ is not None and tpl is not None]
+        # Contributions of files whose blob is unchanged since an earlier analysis
+        cached_contributions = await AnalysisCache.get_contributions(
+            cache_version,
+            {path: blobs[path] for path in matched_paths.values() if path in blobs},
+        )
+        logger.info(
+            f"Analysing {repo_path} at {commit_sha}: reusing {len(cached_contributions)} "
+            f"of {len(matched_paths)} file contributions."
+        )
 
-        # Merge all updated templates into current_template sequentially
-        for updated_template in updated_templates:
-            current_template = await self.merge_templates(
-            current_template, updated_template, described_template
+        # Read the files that changed, and fill the template for them several files per request
+        changed = {}
+        for path in matched_paths.values():
+            if path in cached_contributions:
+                continue
+            content = await self.repo_service.run_fs(
+                repo_index.read, path, self.MAX_ANALYZED_FILE_BYTES
             )
+            if content is None:
+                print(f"File {path} is binary or too large. Skipping.")
+            else:
+                changed[path] = content
+        filled = await self.fill_json_templates(changed, described_template, current_template)
+        for path, template in filled.items():
+            if path in blobs:
+                await AnalysisCache.store_contribution(cache_version, path, blobs[path], template)
+
+        contributions = []
+        for path in matched_paths.values():
+            template = cached_contributions.get(path, filled.get(path))
+            if template is not None:
+                contributions.append((path, template))
+
+        current_template = await self.merge_templates(
+            contributions, current_template, described_template
+        )
 
         current_template = await self.optimize_template(
             current_template, described_template
@@ -452,17 +702,30 @@ class AnalyzerService:
         if dockerfile:
             current_template["dockerfile"] = dockerfile
         
-        if tree:
-            current_template["repo_tree"] = f"\n{tree}\n"
+        current_template["repo_tree"] = f"\n{repo_index.tree()}\n"
 
         # Find and add environment variables used in the codebase
-        env_vars = self.find_environment_variables(repo_contents)
+        env_vars = await self.repo_service.run_fs(self.scan_environment_variables, repo_index)
         if env_vars:
             current_template["environment"]["environment_variables"] = env_vars
 
+        await AnalysisCache.store_result(cache_version, repo_path, commit_sha, current_template)
         return current_template
     
 
+    def scan_environment_variables(self, repo_index: RepoIndex) -> list:
+        """
+        Scans the repository's text files one at a time for environment variables, skipping
+        binary files, ignored directories and files over ENV_SCAN_MAX_FILE_BYTES.
+
+        :param repo_index: Index of the checked out repository.
+        :return: A sorted list of unique environment variable names.
+        """
+        env_vars = set()
+        for _, content in repo_index.iter_text_files(self.ENV_SCAN_MAX_FILE_BYTES):
+            env_vars.update(self.find_environment_variables(content))
+        return sorted(env_vars)
+
     def find_environment_variables(self, code_text):
         """
         Identifies environment variables used in a codebase (supports Python and Node.js).
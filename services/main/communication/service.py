@@ -31,6 +31,10 @@ class CommunicationService:
         else:
             logger.info(f"Client {client_id} not found to disconnect in {self.name}.")
 
+    def is_connected(self, client_id: str) -> bool:
+        """Whether the client currently has an open connection."""
+        return client_id in self.active_connections
+
     async def publisher(self, client_id: str, status: str, data: dict = {}):
         """Publisher for use anywhere in the application."""
         websocket = self.active_connections.get(client_id)
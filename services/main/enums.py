@@ -15,10 +15,13 @@ class DeploymentOptions(Enum):
 class LoraStatus(Enum):
     STARTING = "LORASTATUS_STARTING"
     INTENT_DETECTED = "LORASTATUS_INTENT_DETECTED"
+    CLONING_REPOSITORY = "LORASTATUS_CLONING_REPOSITORY"
     RETRIEVING_USER_PREFERENCES = "LORASTATUS_RETRIEVING_USER_PREFERENCES"
     RETRIEVING_PROJECT_DETAILS = "LORASTATUS_RETRIEVING_PROJECT_DETAILS"
     GENERATING_PLAN = "LORASTATUS_GENERATING_PLAN"
     GENERATED_PLAN = "LORASTATUS_GENERATED_PLAN"
+    PLAN_CHUNK = "LORASTATUS_PLAN_CHUNK"
+    PLAN_FILE_GENERATED = "LORASTATUS_PLAN_FILE_GENERATED"
     FAILED = "LORASTATUS_FAILED"
     COMPLETED = "LORASTATUS_COMPLETED"
     GATHERING_DATA = "LORASTATUS_GATHERING_DATA"
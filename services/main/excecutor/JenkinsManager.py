@@ -1,20 +1,139 @@
-import requests
-import os, time, re, json
+import httpx
+import asyncio
+import os, random, re, json
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
+from core.logger import logger
 import xml.etree.ElementTree as ET
 
+JENKINS_TIMEOUT = float(os.getenv("JENKINS_TIMEOUT", 30))
+JENKINS_CONNECT_TIMEOUT = float(os.getenv("JENKINS_CONNECT_TIMEOUT", 5))
+JENKINS_MAX_CONNECTIONS = int(os.getenv("JENKINS_MAX_CONNECTIONS", 20))
+JENKINS_MAX_RETRIES = int(os.getenv("JENKINS_MAX_RETRIES", 3))
+JENKINS_RETRY_BACKOFF = float(os.getenv("JENKINS_RETRY_BACKOFF", 0.5))
+# How long a triggered build may wait in the queue for an executor
+JENKINS_QUEUE_TIMEOUT = float(os.getenv("JENKINS_QUEUE_TIMEOUT", 600))
+JENKINS_QUEUE_POLL_INTERVAL = float(os.getenv("JENKINS_QUEUE_POLL_INTERVAL", 0.5))
+JENKINS_QUEUE_MAX_POLL_INTERVAL = 3
+# Stage logs fetched at once per client, and how long each fetch may take in total
+JENKINS_STAGE_LOG_CONCURRENCY = int(os.getenv("JENKINS_STAGE_LOG_CONCURRENCY", 4))
+JENKINS_STAGE_LOG_TIMEOUT = float(os.getenv("JENKINS_STAGE_LOG_TIMEOUT", 15))
+
+QUEUE_ITEM_PATTERN = re.compile(r"/queue/item/(\d+)")
+
+# Statuses worth retrying. Only 503 (Jenkins starting up or quieting down) is retried for
+# POSTs, other errors may come after the request was acted on.
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_POST_STATUSES = {503}
+
+
 class JenkinsManager:
+    """
+    Async Jenkins client.
+
+    Requests share one pooled keep-alive connection set. POSTs carry a cached CSRF crumb,
+    which is refreshed once if Jenkins rejects it. Requests are retried with exponential
+    backoff when Jenkins was unreachable, and GETs also on timeouts and gateway errors.
+    """
+
     def __init__(self):
         load_dotenv(override=True)
-        self.jenkins_url = os.getenv("JENKINS_URL").strip().strip('"').strip("'")
+        self.jenkins_url = os.getenv("JENKINS_URL").strip().strip('"').strip("'").rstrip("/")
 
         self.username = os.getenv("JENKINS_USERNAME")
         self.api_token = os.getenv("JENKINS_API_TOKEN")
     
         print("Jenkins URL:", self.jenkins_url)
 
-    def set_folder_env_variable( self, folder_name, var_name, var_value):
+        self.client = httpx.AsyncClient(
+            base_url=self.jenkins_url,
+            auth=(self.username or "", self.api_token or ""),
+            timeout=httpx.Timeout(JENKINS_TIMEOUT, connect=JENKINS_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=JENKINS_MAX_CONNECTIONS,
+                max_keepalive_connections=JENKINS_MAX_CONNECTIONS,
+            ),
+        )
+        self._crumb = None
+        self._crumb_lock = asyncio.Lock()
+        self._stage_log_slots = asyncio.Semaphore(JENKINS_STAGE_LOG_CONCURRENCY)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _crumb_header(self) -> dict:
+        """
+        The CSRF crumb header for POSTs, fetched once. Empty when CSRF protection is off.
+        """
+        if self._crumb is None:
+            async with self._crumb_lock:
+                if self._crumb is None:
+                    response = await self._request("GET", "/crumbIssuer/api/json")
+                    if response.status_code == 200:
+                        data = response.json()
+                        self._crumb = {data["crumbRequestField"]: data["crumb"]}
+                    else:
+                        self._crumb = {}
+        return self._crumb
+
+    async def _request(self, method: str, path: str, headers: dict = None, **kwargs) -> httpx.Response:
+        """
+        Send a request to Jenkins, with the crumb for POSTs and bounded retries.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path relative to the Jenkins URL.
+            headers (dict): Extra request headers.
+            **kwargs: Passed on to httpx (content, params, ...).
+
+        Returns:
+            httpx.Response: The final response, whatever its status.
+        """
+        is_get = method == "GET"
+        retry_statuses = RETRY_STATUSES if is_get else RETRY_POST_STATUSES
+        crumb_refreshed = False
+        attempt = 0
+        while True:
+            request_headers = dict(headers or {})
+            if not is_get:
+                request_headers.update(await self._crumb_header())
+            try:
+                response = await self.client.request(method, path, headers=request_headers, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # The request never reached Jenkins, so it is safe to send again
+                error = e
+            except httpx.TransportError as e:
+                if not is_get:
+                    raise
+                error = e
+            else:
+                if (
+                    response.status_code == 403
+                    and not is_get
+                    and not crumb_refreshed
+                    and "crumb" in response.text.lower()
+                ):
+                    # The crumb expired with the Jenkins session, fetch a new one
+                    self._crumb = None
+                    crumb_refreshed = True
+                    continue
+                if response.status_code not in retry_statuses:
+                    return response
+                error = None
+
+            if attempt >= JENKINS_MAX_RETRIES:
+                if error is not None:
+                    raise error
+                return response
+            delay = JENKINS_RETRY_BACKOFF * 2 ** attempt * (1 + random.random() / 2)
+            attempt += 1
+            logger.warning(
+                f"Jenkins {method} {path} failed ({error or response.status_code}), "
+                f"retrying in {delay:.1f}s ({attempt}/{JENKINS_MAX_RETRIES})."
+            )
+            await asyncio.sleep(delay)
+
+    async def set_folder_env_variable( self, folder_name, var_name, var_value):
         """
         Sets an environment variable for a specific folder in Jenkins using REST API.
 
@@ -30,10 +149,10 @@ class JenkinsManager:
             bool: True if successfully updated, False otherwise.
         """
 
-        config_url = f"{self.jenkins_url}/job/{folder_name}/config.xml"
+        config_url = f"/job/{folder_name}/config.xml"
 
         # Get current configuration
-        response = requests.get(config_url, auth=(self.username, self.api_token))
+        response = await self._request("GET", config_url)
 
         if response.status_code != 200:
             print("Failed to retrieve config.xml", response.status_code, response.text)
@@ -71,7 +190,7 @@ class JenkinsManager:
 
         # POST updated configuration back to Jenkins
         headers = {'Content-Type': 'application/xml'}
-        update_response = requests.post(config_url, data=updated_config_xml, auth=(self.username, self.api_token), headers=headers)
+        update_response = await self._request("POST", config_url, content=updated_config_xml, headers=headers)
 
         if update_response.status_code == 200:
             print("Folder environment variable updated successfully!")
@@ -80,9 +199,9 @@ class JenkinsManager:
             print("Failed to update config.xml", update_response.status_code, update_response.text)
             return False
     
-    def create_jenkins_secret_text(self, folder_name, credential_id, secret_text, description=""):
+    async def create_jenkins_secret_text(self, folder_name, credential_id, secret_text, description=""):
 
-        url = f"{self.jenkins_url}/job/{folder_name}/credentials/store/folder/domain/_/createCredentials"
+        url = f"/job/{folder_name}/credentials/store/folder/domain/_/createCredentials"
 
         xml_payload = f"""
         <org.jenkinsci.plugins.plaincredentials.impl.StringCredentialsImpl>
@@ -97,7 +216,7 @@ class JenkinsManager:
             "Content-Type": "application/xml"
         }
 
-        response = requests.post(url, auth=(self.username, self.api_token), headers=headers, data=xml_payload)
+        response = await self._request("POST", url, headers=headers, content=xml_payload)
 
         if response.status_code == 200:
             return {"status": "success", "message": "Secret text credential created successfully"}
@@ -106,23 +225,18 @@ class JenkinsManager:
 
 
 
-    def create_project_folder(self, organization, folder_name, clone_path):
-        url = f"{self.jenkins_url}/job/{organization}/createItem?name={folder_name}"
+    async def create_project_folder(self, organization, folder_name, clone_path):
+        url = f"/job/{organization}/createItem?name={folder_name}"
         headers = {"Content-Type": "application/xml"}
         folder_config = f"""
         <com.cloudbees.hudson.plugins.folder.Folder plugin="cloudbees-folder@6.15">
             <description>Folder for {folder_name}</description>
         </com.cloudbees.hudson.plugins.folder.Folder>
         """
-        response = requests.post(
-            url,
-            auth=(self.username, self.api_token),
-            headers=headers,
-            data=folder_config,
-        )
+        response = await self._request("POST", url, headers=headers, content=folder_config)
 
         if response.status_code == 200:
-            self.set_folder_env_variable(f"{organization}/job/{folder_name}", "CLONE_PATH", clone_path)
+            await self.set_folder_env_variable(f"{organization}/job/{folder_name}", "CLONE_PATH", clone_path)
             print(f"Folder '{folder_name}' created successfully.")
         elif response.status_code == 400 and "already exists" in response.text:
             print(f"Folder '{folder_name}' already exists.")
@@ -130,27 +244,23 @@ class JenkinsManager:
             print(f"Failed to create folder '{folder_name}': {self._parse_error_text(response)}")
     
 
-    def create_org_folder(self, folder_name):
-        url = f"{self.jenkins_url}/createItem?name={folder_name}"
+    async def create_org_folder(self, folder_name):
+        url = f"/createItem?name={folder_name}"
         headers = {"Content-Type": "application/xml"}
         folder_config = f"""
         <com.cloudbees.hudson.plugins.folder.Folder plugin="cloudbees-folder@6.15">
             <description>Folder for {folder_name}</description>
         </com.cloudbees.hudson.plugins.folder.Folder>
         """
-        response = requests.post(
-            url,
-            auth=(self.username, self.api_token),
-            headers=headers,
-            data=folder_config,
-        )
+        response = await self._request("POST", url, headers=headers, content=folder_config)
 
         if response.status_code == 200:
-            self.create_jenkins_secret_text(folder_name, "aws-access-key-id", "", "AWS Access Key ID")
-            self.create_jenkins_secret_text(folder_name, "aws-secret-access-key", "", "AWS Secret Access Key")
+            await self.create_jenkins_secret_text(folder_name, "aws-access-key-id", "", "AWS Access Key ID")
+            await self.create_jenkins_secret_text(folder_name, "aws-secret-access-key", "", "AWS Secret Access Key")
             
-            self.set_folder_env_variable(folder_name, "AWS_REGION", "us-east-1")
-            self.set_folder_env_variable(folder_name, "AWS_ACCOUNT_ID", "123")
+            # Both edit the folder's config.xml, so they cannot run concurrently
+            await self.set_folder_env_variable(folder_name, "AWS_REGION", "us-east-1")
+            await self.set_folder_env_variable(folder_name, "AWS_ACCOUNT_ID", "123")
             print(f"Folder '{folder_name}' created successfully.")
         elif response.status_code == 400 and "already exists" in response.text:
             print(f"Folder '{folder_name}' already exists.")
@@ -163,11 +273,11 @@ class JenkinsManager:
         with open(jenkinsfile_path, "r") as file:
             return file.read()
 
-    def create_local_pipeline(self, folder_name, pipeline_name, local_directory_path):
+    async def create_local_pipeline(self, folder_name, pipeline_name, local_directory_path):
         # local_directory_path = "/home/sahiru/deplora/repo-clones/d114e906-957a-428f-b1af-6c47bb6577c4/po-server"
         jenkinsfile_content = self._read_jenkinsfile(local_directory_path)
 
-        url = f"{self.jenkins_url}/job/{folder_name}/createItem?name={pipeline_name}"
+        url = f"/job/{folder_name}/createItem?name={pipeline_name}"
         headers = {"Content-Type": "application/xml"}
         pipeline_config = f"""
         <flow-definition plugin="workflow-job@2.42">
@@ -186,12 +296,7 @@ class JenkinsManager:
         """
         # Escape special characters in the XML
         pipeline_config = pipeline_config.replace("&", "&amp;")
-        response = requests.post(
-            url,
-            auth=(self.username, self.api_token),
-            headers=headers,
-            data=pipeline_config,
-        )
+        response = await self._request("POST", url, headers=headers, content=pipeline_config)
 
         if response.status_code == 200:
             print(
@@ -199,12 +304,9 @@ class JenkinsManager:
             )
         elif response.status_code == 400 and "already exists" in response.text:
             print(f"Pipeline '{pipeline_name}' already exists inside '{folder_name}'. Updating the pipeline script.")
-            update_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/config.xml"
-            update_response = requests.post(
-                update_url,
-                auth=(self.username, self.api_token),
-                headers=headers,
-                data=pipeline_config,
+            update_url = f"/job/{folder_name}/job/{pipeline_name}/config.xml"
+            update_response = await self._request(
+                "POST", update_url, headers=headers, content=pipeline_config
             )
             if update_response.status_code == 200:
                 print(f"Pipeline '{pipeline_name}' updated successfully inside '{folder_name}'.")
@@ -213,9 +315,9 @@ class JenkinsManager:
         else:
             print(f"Failed to create pipeline '{pipeline_name}': {self._parse_error_text(response)}")
 
-    def delete_pipeline(self, folder_name, pipeline_name):
-        url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/doDelete"
-        response = requests.post(url, auth=(self.username, self.api_token))
+    async def delete_pipeline(self, folder_name, pipeline_name):
+        url = f"/job/{folder_name}/job/{pipeline_name}/doDelete"
+        response = await self._request("POST", url)
 
         if response.status_code == 200:
             print(
@@ -228,42 +330,75 @@ class JenkinsManager:
                 f"Failed to delete pipeline '{pipeline_name}': {response.status_code} - {self._parse_error_text(response)}"
             )
 
-    def trigger_pipeline_build(self, folder_name, pipeline_name):
-        last_build_id = "0"
-
-        try:
-            last_build_id = self.monitor_build_status(folder_name, pipeline_name, "lastBuild")["id"]
-        except Exception:
-            pass
-
-        new_build_id = int(last_build_id) + 1
+    async def trigger_pipeline_build(self, folder_name, pipeline_name):
+        """
+        Queue a build and wait until Jenkins assigns it a build number.
 
-        build_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/build"
-        response = requests.post(build_url, auth=(self.username, self.api_token))
+        Returns:
+            int: The number of the triggered build, or None if it could not be triggered
+                or was cancelled while queued.
+        """
+        build_url = f"/job/{folder_name}/job/{pipeline_name}/build"
+        response = await self._request("POST", build_url)
 
-        if response.status_code == 201:
-            print(f"Build triggered successfully for pipeline '{pipeline_name}'.")
-            time.sleep(10)
-            return new_build_id
-        else:
+        if response.status_code != 201:
             print(
                 f"Failed to trigger build for pipeline '{pipeline_name}': {self._parse_error_text(response)}"
             )
             return None
-    
-    def stop_pipeline_build(self, folder_name, pipeline_name, build_id):
-        stop_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/{build_id}/stop"
-        response = requests.post(stop_url, auth=(self.username, self.api_token))
+
+        match = QUEUE_ITEM_PATTERN.search(response.headers.get("Location", ""))
+        if match is None:
+            logger.error(f"Jenkins did not return a queue item for pipeline '{pipeline_name}'.")
+            return None
+
+        print(f"Build triggered successfully for pipeline '{pipeline_name}'.")
+        return await self.wait_for_queued_build(match.group(1))
+
+    async def wait_for_queued_build(self, queue_id):
+        """
+        Poll a queue item until it leaves the queue, backing off while it waits.
+
+        Returns:
+            int: The build number, or None if the item was cancelled or timed out.
+        """
+        queue_url = f"/queue/item/{queue_id}/api/json"
+        deadline = asyncio.get_running_loop().time() + JENKINS_QUEUE_TIMEOUT
+        interval = JENKINS_QUEUE_POLL_INTERVAL
+        while True:
+            response = await self._request("GET", queue_url)
+            if response.status_code == 200:
+                item = response.json()
+                if item.get("cancelled"):
+                    logger.warning(f"Queued build {queue_id} was cancelled.")
+                    return None
+                executable = item.get("executable")
+                if executable:
+                    return executable["number"]
+            elif response.status_code == 404:
+                # Queue items are forgotten a few minutes after they leave the queue
+                logger.error(f"Queue item {queue_id} no longer exists.")
+                return None
+
+            if asyncio.get_running_loop().time() + interval > deadline:
+                logger.error(f"Build {queue_id} still queued after {JENKINS_QUEUE_TIMEOUT}s.")
+                return None
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, JENKINS_QUEUE_MAX_POLL_INTERVAL)
+
+    async def stop_pipeline_build(self, folder_name, pipeline_name, build_id):
+        stop_url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/stop"
+        response = await self._request("POST", stop_url)
 
         if response.status_code == 200:
             print(f"Build {build_id} stopped successfully for pipeline '{pipeline_name}'.")
         else:
             print(f"Failed to stop build {build_id} for pipeline '{pipeline_name}': {self._parse_error_text(response)}")
 
-    def monitor_build_status(self, folder_name, pipeline_name, build_id):
-        queue_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/{build_id}/api/json"
+    async def monitor_build_status(self, folder_name, pipeline_name, build_id):
+        queue_url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/api/json"
 
-        response = requests.get(queue_url, auth=(self.username, self.api_token))
+        response = await self._request("GET", queue_url)
         if response.status_code == 200:
             build_info = response.json()
             
@@ -274,6 +409,7 @@ class JenkinsManager:
                 # "url": build_info.get("url"),
                 "duration": build_info.get("duration"),
                 "building": build_info.get("building"),
+                "result": build_info.get("result"),
             }
 
             return result
@@ -281,9 +417,12 @@ class JenkinsManager:
             
             raise Exception(f"Failed to monitor build status: Received response {self._parse_error_text(response)}")
 
-    def get_stages_info(self, folder_name, pipeline_name, build_id):
-        stages_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/{build_id}/wfapi/describe"
-        response = requests.get(stages_url, auth=(self.username, self.api_token))
+    async def get_stages_info(self, folder_name, pipeline_name, build_id):
+        stages_url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/wfapi/describe"
+        response, build_status = await asyncio.gather(
+            self._request("GET", stages_url),
+            self.monitor_build_status(folder_name, pipeline_name, build_id),
+        )
         if response.status_code == 200:
             stages_info = response.json()["stages"]
             stages_info = [
@@ -296,15 +435,15 @@ class JenkinsManager:
                 for stage in stages_info
             ]
 
-            is_building = self.monitor_build_status(folder_name, pipeline_name, build_id)["building"]
+            is_building = build_status["building"]
 
             return stages_info, is_building
 
-    def fetch_console_output(self, folder_name, pipeline_name, build_id):
-        console_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/{build_id}/consoleText"
+    async def fetch_console_output(self, folder_name, pipeline_name, build_id):
+        console_url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/consoleText"
 
         try:
-            response = requests.get(console_url, auth=(self.username, self.api_token))
+            response = await self._request("GET", console_url)
             if response.status_code == 200:
                 return response.text
             else:
@@ -312,9 +451,25 @@ class JenkinsManager:
         except KeyboardInterrupt:
             print("Console output fetching stopped.")
 
-    def list_jenkins_builds(self, folder_name, pipeline_name,):
-        url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/api/json"
-        response = requests.get(url, auth=(self.username, self.api_token))
+    async def fetch_progressive_log(self, folder_name, pipeline_name, build_id, start=0):
+        """
+        Fetch the build's console output from a byte offset on.
+
+        Returns:
+            tuple: The new bytes, the offset to continue from, and whether more output
+                may still come.
+        """
+        log_url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/logText/progressiveText"
+        response = await self._request("GET", log_url, params={"start": start})
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch console output: {self._parse_error_text(response)}")
+        next_start = int(response.headers.get("X-Text-Size", start + len(response.content)))
+        more = response.headers.get("X-More-Data", "").lower() == "true"
+        return response.content, next_start, more
+
+    async def list_jenkins_builds(self, folder_name, pipeline_name,):
+        url = f"/job/{folder_name}/job/{pipeline_name}/api/json"
+        response = await self._request("GET", url)
         if response.status_code == 200:
             builds = response.json()
             return builds
@@ -343,14 +498,41 @@ class JenkinsManager:
         stage_pattern = r'stage\s*\(\s*[\'"](.+?)[\'"]\s*\)'
         return re.findall(stage_pattern, jenkinsfile_text)
 
-    def get_logs_for_stage(self, folder_name, pipeline_name, build_id, stage_id):
-        stages_url = f"{self.jenkins_url}/job/{folder_name}/job/{pipeline_name}/{build_id}/pipeline-overview/log?nodeId={stage_id}"
-        response = requests.get(stages_url, auth=(self.username, self.api_token))
+    async def get_logs_for_stage(self, folder_name, pipeline_name, build_id, stage_id):
+        stages_url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/pipeline-overview/log?nodeId={stage_id}"
+        response = await self._request("GET", stages_url)
 
         if response.status_code == 200:
             return response.text
         else:
             return f"Failed to fetch logs for stage {stage_id}: {self._parse_error_text(response)}"
 
-        
- 
\ No newline at end of file
+    async def get_logs_for_stages(self, folder_name, pipeline_name, build_id, stage_ids):
+        """
+        Fetch the logs of several stages concurrently, at most JENKINS_STAGE_LOG_CONCURRENCY
+        at a time and each within JENKINS_STAGE_LOG_TIMEOUT.
+
+        Returns:
+            dict: Stage id -> log text, or None if it could not be fetched.
+        """
+
+        async def fetch(stage_id):
+            url = f"/job/{folder_name}/job/{pipeline_name}/{build_id}/pipeline-overview/log"
+            async with self._stage_log_slots:
+                try:
+                    response = await asyncio.wait_for(
+                        self._request("GET", url, params={"nodeId": stage_id}),
+                        JENKINS_STAGE_LOG_TIMEOUT,
+                    )
+                except (asyncio.TimeoutError, httpx.HTTPError) as e:
+                    logger.warning(f"Failed to fetch logs for stage {stage_id}: {e!r}")
+                    return None
+            if response.status_code != 200:
+                logger.warning(
+                    f"Failed to fetch logs for stage {stage_id}: {self._parse_error_text(response)}"
+                )
+                return None
+            return response.text
+
+        logs = await asyncio.gather(*(fetch(stage_id) for stage_id in stage_ids))
+        return dict(zip(stage_ids, logs))
@@ -0,0 +1,158 @@
+import re
+from typing import Dict, List, Optional
+
+from services.main.excecutor.JenkinsManager import JenkinsManager
+from services.main.utils.caching.redis_service import PipelineLogStore
+
+# "[Pipeline] { (Plan)" opens the body of stage Plan. Parallel branches open a
+# "(Branch: name)" block around their stage.
+BLOCK_START = "[Pipeline] {"
+BLOCK_END = "[Pipeline] }"
+STAGE_START = re.compile(r"^\[Pipeline\] \{ \((.+)\)$")
+PIPELINE_STEP_PREFIX = "[Pipeline] "
+# Hidden console annotations, in case they are not stripped
+CONSOLE_NOTE = re.compile(r"\x1b\[8mha:.*?\x1b\[0m")
+
+# Output outside of any stage, e.g. Jenkinsfile compilation errors
+OUTSIDE_STAGES = "(pipeline)"
+
+# Stage statuses after which a stage's log no longer changes
+FINAL_STAGE_STATUSES = {"SUCCESS", "FAILED", "ABORTED", "UNSTABLE", "NOT_EXECUTED"}
+
+
+class LogTailer:
+    """
+    Tails a build's console through Jenkins' progressive log endpoint, fetching only the
+    bytes added since the previous call, and splits them into stages by the pipeline's
+    stage markers. New lines are appended to the build's PipelineLogStore.
+
+    Only complete lines are consumed; a trailing partial line is fetched again with the
+    rest of it. The position (byte offset and open blocks) is saved with every append,
+    so a new tailer for the same build resumes where the previous one stopped.
+
+    Output of parallel branches is interleaved in the console, so it may be attributed to
+    the wrong stage. Once a stage is final, `finalize` therefore replaces its lines with
+    the stage's own log from Jenkins. That is fetched once per stage; later console
+    output of final stages is ignored.
+    """
+
+    def __init__(self, jenkins: JenkinsManager, folder_name: str, pipeline_name: str, build_id: str):
+        self.jenkins = jenkins
+        self.folder_name = folder_name
+        self.pipeline_name = pipeline_name
+        self.build_id = str(build_id)
+        self.build_key = f"{folder_name}/job/{pipeline_name}/{build_id}"
+        self.offset = 0
+        self.blocks: List[Optional[str]] = []  # open blocks, innermost last; None if unnamed
+        self.complete = False
+        self.final_stages: List[str] = []
+        self._loaded = False
+
+    async def _load(self):
+        state = await PipelineLogStore.get_state(self.build_key)
+        self.offset = state.get("offset", 0)
+        self.blocks = state.get("blocks", [])
+        self.complete = state.get("complete", False)
+        self.final_stages = state.get("final_stages", [])
+        self._loaded = True
+
+    def _state(self) -> dict:
+        return {
+            "offset": self.offset,
+            "blocks": self.blocks,
+            "complete": self.complete,
+            "final_stages": self.final_stages,
+        }
+
+    async def poll(self) -> Dict[str, List[str]]:
+        """
+        Fetch and store the console output added since the last poll.
+
+        Returns:
+            dict: Stage name -> new log lines, for the stages that got any.
+        """
+        if not self._loaded:
+            await self._load()
+        if self.complete:
+            return {}
+
+        data, _, more = await self.jenkins.fetch_progressive_log(
+            self.folder_name, self.pipeline_name, self.build_id, self.offset
+        )
+        if more:
+            consumed = data.rfind(b"\n") + 1
+        else:
+            consumed = len(data)
+            self.complete = True
+
+        lines = self._split(data[:consumed].decode("utf-8", errors="replace"))
+        self.offset += consumed
+        await PipelineLogStore.append(self.build_key, lines, self._state())
+        return lines
+
+    async def finalize(self, stages: List[dict]) -> Dict[str, List[str]]:
+        """
+        Replace the tailed lines of stages that reached a final status with their own
+        logs from Jenkins, fetched concurrently. Stages already finalized are skipped.
+
+        Args:
+            stages (list): Stage dicts with "name", "id" and "status".
+
+        Returns:
+            dict: Stage name -> all log lines, for the stages whose stored log changed.
+        """
+        if not self._loaded:
+            await self._load()
+        stages = [
+            stage
+            for stage in stages
+            if stage["status"] in FINAL_STAGE_STATUSES and stage["name"] not in self.final_stages
+        ]
+        if not stages:
+            return {}
+
+        fetched = await self.jenkins.get_logs_for_stages(
+            self.folder_name, self.pipeline_name, self.build_id, [stage["id"] for stage in stages]
+        )
+        names = [stage["name"] for stage in stages if fetched[stage["id"]] is not None]
+        if not names:
+            return {}
+        stored = await self.get_logs(names)
+
+        replaced = {}
+        for stage in stages:
+            text = fetched[stage["id"]]
+            # Failed fetches are retried on the next call
+            if text is None:
+                continue
+            self.final_stages.append(stage["name"])
+            lines = CONSOLE_NOTE.sub("", text).splitlines()
+            if lines[-PipelineLogStore.MAX_LINES :] != stored[stage["name"]]:
+                replaced[stage["name"]] = lines
+        await PipelineLogStore.replace(self.build_key, replaced, self._state())
+        return replaced
+
+    def _split(self, text: str) -> Dict[str, List[str]]:
+        lines: Dict[str, List[str]] = {}
+        for line in text.splitlines():
+            line = CONSOLE_NOTE.sub("", line)
+            stage_start = STAGE_START.match(line)
+            if stage_start:
+                name = stage_start.group(1)
+                self.blocks.append(None if name.startswith("Branch: ") else name)
+            elif line == BLOCK_START:
+                self.blocks.append(None)
+            elif line == BLOCK_END:
+                if self.blocks:
+                    self.blocks.pop()
+            elif not line.startswith(PIPELINE_STEP_PREFIX):
+                stage = next((block for block in reversed(self.blocks) if block), OUTSIDE_STAGES)
+                if stage not in self.final_stages:
+                    lines.setdefault(stage, []).append(line)
+        return lines
+
+    async def get_logs(self, stages: List[str]) -> Dict[str, List[str]]:
+        """
+        The stored logs of the given stages.
+        """
+        return await PipelineLogStore.get_logs(self.build_key, stages)
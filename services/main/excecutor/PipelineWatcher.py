@@ -0,0 +1,243 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.logger import logger
+from services.main.communication.service import CommunicationService
+from services.main.enums import ExcecutionStatus
+from services.main.excecutor.JenkinsManager import JenkinsManager
+from services.main.excecutor.LogTailer import OUTSIDE_STAGES, LogTailer
+from services.main.utils.caching.redis_service import SessionDataHandler
+
+# Polling starts at the minimum interval, backs off while nothing changes and drops back
+# to the minimum as soon as something does
+WATCH_MIN_INTERVAL = float(os.getenv("PIPELINE_WATCH_MIN_INTERVAL", 1))
+WATCH_MAX_INTERVAL = float(os.getenv("PIPELINE_WATCH_MAX_INTERVAL", 10))
+WATCH_BACKOFF = 1.5
+# Consecutive failed polls after which a watcher gives up
+WATCH_MAX_ERRORS = int(os.getenv("PIPELINE_WATCH_MAX_ERRORS", 5))
+
+communication_service = CommunicationService("PipelineService")
+
+
+class PipelineWatcher:
+    """
+    Follows one Jenkins build in a background task and pushes stage changes to the
+    sessions subscribed to it, until the build finishes.
+
+    There is one watcher per build, shared by all its subscribers. Each poll fetches the
+    stage descriptions and the console output added since the previous poll. Only stages
+    whose status changed or that logged new lines are published, as a delta whose "logs"
+    hold just the new lines, or all of them when "logs_replaced" is set. Full logs are
+    kept in the PipelineLogStore and returned by `current_state`. The watcher ends once
+    the build and its log are complete, or with a FAILED message after
+    WATCH_MAX_ERRORS failed polls in a row.
+    """
+
+    _watchers: Dict[Tuple[str, str], "PipelineWatcher"] = {}
+
+    def __init__(
+        self,
+        jenkins: JenkinsManager,
+        folder_name: str,
+        pipeline_name: str,
+        build_id: str,
+        all_stages: List[str],
+    ):
+        self.jenkins = jenkins
+        self.folder_name = folder_name
+        self.pipeline_name = pipeline_name
+        self.build_id = str(build_id)
+        self.all_stages = all_stages
+        self.subscribers: Set[str] = set()
+        self.stages: Dict[str, dict] = {}  # stage name -> stage state, in Jenkins order
+        # Stages whose logs are stored under another name
+        self.log_sources: Dict[str, str] = {}
+        # New lines not published yet, e.g. of stages Jenkins does not describe yet
+        self.unsent_lines: Dict[str, List[str]] = {}
+        self.tailer = LogTailer(jenkins, folder_name, pipeline_name, build_id)
+        self.building = True
+        self.result: Optional[str] = None
+        # Why the watcher stopped before the build finished
+        self.error: Optional[str] = None
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def watch(
+        cls,
+        session_id: str,
+        jenkins: JenkinsManager,
+        folder_name: str,
+        pipeline_name: str,
+        build_id: str,
+        repo_path: str,
+    ) -> "PipelineWatcher":
+        """
+        Subscribe a session to a build, starting the build's watcher if none is running.
+        """
+        key = (f"{folder_name}/job/{pipeline_name}", str(build_id))
+        watcher = cls._watchers.get(key)
+        if watcher is None:
+            watcher = cls(
+                jenkins, folder_name, pipeline_name, build_id, jenkins.list_stages(repo_path)
+            )
+            cls._watchers[key] = watcher
+            watcher.task = asyncio.create_task(watcher._run(key))
+        watcher.subscribers.add(session_id)
+        return watcher
+
+    async def current_state(self) -> dict:
+        """
+        The full build state with the stored logs, once the first poll has completed.
+        """
+        await self.ready.wait()
+        build_info = self.snapshot()
+        sources = {
+            stage["name"]: self.log_sources.get(stage["name"], stage["name"])
+            for stage in build_info["stages"]
+            if stage["status"] != "PENDING"
+        }
+        logs = await self.tailer.get_logs(list(set(sources.values())))
+        for stage in build_info["stages"]:
+            if stage["name"] in sources:
+                stage["logs"] = logs.get(sources[stage["name"]], [])
+        return build_info
+
+    def snapshot(self) -> dict:
+        """
+        The build state without logs.
+        """
+        stages = [dict(stage) for stage in self.stages.values()]
+        stages.extend(
+            {"name": name, "status": "PENDING"} for name in self.all_stages if name not in self.stages
+        )
+        build_info = {"id": self.build_id, "stages": stages, "building": self.building}
+        if self.result is not None:
+            build_info["result"] = self.result
+        if self.error is not None:
+            build_info["error"] = self.error
+        return build_info
+
+    async def _run(self, key: Tuple[str, str]):
+        interval = WATCH_MIN_INTERVAL
+        errors = 0
+        try:
+            while True:
+                try:
+                    changed = await self._poll()
+                    errors = 0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    errors += 1
+                    logger.error(
+                        f"Error watching build {self.build_id} of {self.pipeline_name} "
+                        f"({errors}/{WATCH_MAX_ERRORS}): {e}"
+                    )
+                    if errors >= WATCH_MAX_ERRORS:
+                        # Subscribers only hear from the watcher, so tell them it stopped
+                        self.error = f"Lost track of the build: {e}"
+                        await self._publish(
+                            {"id": self.build_id, "error": self.error}, ExcecutionStatus.FAILED
+                        )
+                        await self._store()
+                        break
+                    changed = []
+                self.ready.set()
+
+                if not self.building:
+                    build_info = {"id": self.build_id, "stages": changed, "building": False}
+                    build_info.update(result=self.result, delta=True)
+                    await self._publish(build_info)
+                    await self._store()
+                    break
+                if changed:
+                    await self._publish(
+                        {"id": self.build_id, "stages": changed, "building": True, "delta": True}
+                    )
+                    await self._store()
+                    interval = WATCH_MIN_INTERVAL
+                else:
+                    interval = min(interval * WATCH_BACKOFF, WATCH_MAX_INTERVAL)
+                await asyncio.sleep(interval)
+        finally:
+            self.ready.set()
+            if self._watchers.get(key) is self:
+                del self._watchers[key]
+
+    async def _poll(self) -> List[dict]:
+        """
+        Refresh the build state and logs from Jenkins.
+
+        Returns:
+            list: The stages that changed since the previous poll, with their new log lines.
+        """
+        stages_info, new_lines = await asyncio.gather(
+            self.jenkins.get_stages_info(self.folder_name, self.pipeline_name, self.build_id),
+            self.tailer.poll(),
+            return_exceptions=True,
+        )
+        # Tailed lines are already stored, so keep them to publish even if describing fails
+        if not isinstance(new_lines, BaseException):
+            for stage, lines in new_lines.items():
+                if stage != OUTSIDE_STAGES:
+                    self.unsent_lines.setdefault(stage, []).extend(lines)
+        for result in (stages_info, new_lines):
+            if isinstance(result, BaseException):
+                raise result
+        if stages_info is None:
+            raise Exception("Failed to describe the build")
+        stages_info, is_building = stages_info
+
+        changed = []
+        for stage in stages_info:
+            previous = self.stages.get(stage["name"])
+            self.stages[stage["name"]] = stage
+            logs = self.unsent_lines.pop(stage["name"], [])
+            if previous is None or previous["status"] != stage["status"] or logs:
+                changed.append({**stage, "logs": logs})
+
+        # Stages that just ended get their exact logs, which replace the streamed lines
+        replaced = await self.tailer.finalize(stages_info)
+        for stage in changed:
+            if stage["name"] in replaced:
+                stage.update(logs=replaced.pop(stage["name"]), logs_replaced=True)
+        changed.extend(
+            {**self.stages[name], "logs": logs, "logs_replaced": True}
+            for name, logs in replaced.items()
+        )
+
+        # Keep polling until the rest of the log has been read too
+        if not is_building and self.tailer.complete:
+            build_status = await self.jenkins.monitor_build_status(
+                self.folder_name, self.pipeline_name, self.build_id
+            )
+            self.result = build_status.get("result")
+            # No stage ran, the pipeline probably crashed on errors in the Jenkinsfile
+            if not self.stages:
+                name = self.all_stages[0] if self.all_stages else "Pipeline"
+                self.stages[name] = {"name": name, "status": "FAILED"}
+                self.log_sources[name] = OUTSIDE_STAGES
+                logs = await self.tailer.get_logs([OUTSIDE_STAGES])
+                changed.append({**self.stages[name], "logs": logs[OUTSIDE_STAGES]})
+            self.building = False
+        return changed
+
+    async def _publish(self, build_info: dict, status: ExcecutionStatus = ExcecutionStatus.PROCESSING):
+        for session_id in list(self.subscribers):
+            await communication_service.publisher(session_id, status.value, build_info)
+
+    async def _store(self):
+        build_info = self.snapshot()
+        for session_id in self.subscribers:
+            await SessionDataHandler.store_pipeline_data(
+                session_id=session_id, build_id=self.build_id, data=build_info
+            )
+
+    @classmethod
+    async def close(cls):
+        watchers = list(cls._watchers.values())
+        for watcher in watchers:
+            watcher.task.cancel()
+        await asyncio.gather(*(watcher.task for watcher in watchers), return_exceptions=True)
@@ -1,4 +1,5 @@
 from core.logger import logger
+from core.tracing import traced
 from services.main.communication.service import CommunicationService
 from services.main.enums import LoraStatus
 from services.main.management.classifier import classify_intent
@@ -16,19 +17,19 @@ async def handle_message(
     request: MessageRequest, communcationService: CommunicationService
 ):
     # Step 1: Use the classifier to detect the intent
-    chat_history = SessionDataHandler.get_chat_history(request.session_id)
+    chat_history = await SessionDataHandler.get_chat_history(request.session_id)
 
-    SessionDataHandler.store_message_user(
+    await SessionDataHandler.store_message_user(
         request.session_id, request.client_id, "user", request.message
     )
-    SessionDataHandler.update_session_data(request.session_id, request.to_dict())
+    await SessionDataHandler.update_session_data(request.session_id, request.to_dict())
 
     intent = await classify_intent(request.message, chat_history)
 
     await communcationService.publisher(
         request.session_id, LoraStatus.INTENT_DETECTED.value
     )
-    mid = SessionDataHandler.initialize_message_state_and_return(
+    mid = await SessionDataHandler.initialize_message_state_and_return(
         request.session_id,
         request.client_id,
         "You",
@@ -51,10 +52,10 @@ async def handle_message(
         )
         logger.info("Generated deployment plan")
 
-        SessionDataHandler.store_current_plan(
+        await SessionDataHandler.store_current_plan(
             request.session_id, dep_plan["file_contents"]
         )
-        SessionDataHandler.update_message_state_and_data(
+        await SessionDataHandler.update_message_state_and_data(
             request.session_id,
             request.mid,
             LoraStatus.COMPLETED.value,
@@ -79,7 +80,7 @@ async def handle_message(
             prompt=request.message,
         )
 
-        SessionDataHandler.update_message_state_and_data(
+        await SessionDataHandler.update_message_state_and_data(
             request.session_id,
             request.mid,
             LoraStatus.COMPLETED.value,
@@ -91,7 +92,7 @@ async def handle_message(
     elif "greeting" in intent or "insult" in intent:
         logger.info("Detected other intent")
         res = await managementService.process_conversation(request, chat_history)
-        SessionDataHandler.update_message_state_and_data(
+        await SessionDataHandler.update_message_state_and_data(
             request.session_id,
             request.mid,
             LoraStatus.COMPLETED.value,
@@ -101,7 +102,7 @@ async def handle_message(
 
     else:  # Handle unknown intent
         logger.info("Detected unknown intent")
-        SessionDataHandler.update_message_state_and_data(
+        await SessionDataHandler.update_message_state_and_data(
             request.session_id,
             request.mid,
             LoraStatus.COMPLETED.value,
@@ -118,6 +119,7 @@ async def handle_file_change(request: FileChangeRequest):
     return await managementService.update_file(request=request)
 
 
+@traced("handle_graph_generation")
 async def handle_graph_generation(session_id: str):
     """
     Handle the graph generation request by retrieving the files from the session data
@@ -127,7 +129,7 @@ async def handle_graph_generation(session_id: str):
         logger.info(f"Handling graph generation for session_id: {session_id}")
         
         # Retrieve files from session data
-        files = SessionDataHandler.get_session_data(session_id).get("current_plan", {})
+        files = await SessionDataHandler.get_current_plan(session_id)
         
         if not files:
             logger.error(f"No files found for session_id: {session_id}")
@@ -1,10 +1,15 @@
 import requests
 from fastapi import HTTPException
 from core.logger import logger
+from core.tracing import traced
 from services.main.workers.llm_worker import LLMService
 
 llm_service = LLMService()
 
+# Identical (history, query) pairs classify the same way; keep them briefly.
+INTENT_CACHE_TTL = 60 * 10
+
+@traced("classify_intent")
 async def classify_intent(user_query, chat_history=None):
 
     # Combine chat history with user query if context is available
@@ -36,7 +41,9 @@ async def classify_intent(user_query, chat_history=None):
 
 
     try:
-        intent = await llm_service.llm_request(prompt)
+        intent = await llm_service.llm_request(
+            prompt, cache_ttl=INTENT_CACHE_TTL, cache_name="classify_intent"
+        )
         intent = intent.strip().lower()
         # print(f"Intent classification response: {ans}")
         # intent = ans.split(":")[1].strip()
@@ -1,8 +1,14 @@
 import os, re, ast
 import json
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from core.logger import logger
 
+# Start and end markers for the <deploraFile> tag
+FILE_START_TAG = "<deploraFile"
+FILE_END_TAG = "</deploraFile>"
+ATTRIBUTE_PATTERN = re.compile(r'([A-Za-z_][\w-]*)\s*=\s*"([^"]*)"')
+RESOURCE_NAME_PATTERN = re.compile(r'"([a-z][a-z0-9]*_[a-z0-9_]+)"')
+
 
 class FileParser:
     """
@@ -15,73 +21,76 @@ class FileParser:
         """
         pass
 
-    def parse(self, text: str) -> List[Dict[str, str]]:
+    def parse(self, text: str) -> Tuple[List[Dict[str, str]], List[str]]:
         """
         Parse the input text and extract file details.
 
+        The text is scanned once using offsets: a file block runs from one <deploraFile
+        tag to the next (or the end of the text), and its content ends at </deploraFile>.
+
         Args:
             text (str): The input text containing <deploraFile> tags.
 
         Returns:
-            List[Dict[str, str]]: A list of file objects containing file details.
+            Tuple[List[Dict[str, str]], List[str]]: The file objects and the raw file blocks.
         """
         files = []
         files_content = []
 
-        # Start and end markers for the <deploraFile> tag
-        file_start_tag = "<deploraFile"
-        file_end_tag = "</deploraFile>"
-
-        # Iterate over the text to find file blocks
-        while file_start_tag in text:
-            text = file_start_tag.join(text.split(file_start_tag)[1:])
- 
-            # Extract the file block and process it
-            file_block = text.split(file_start_tag)[0]
-
-            # Extract file type, filePath and action from the <deploraFile> tag
-            file_type_start = file_block.find('type="') + len('type="')
-            file_type_end = file_block.find('"', file_type_start)
-            file_type = file_block[file_type_start:file_type_end]
-
-            file_path_start = file_block.find('filePath="') + len('filePath="')
-            file_path_end = file_block.find('"', file_path_start)
-            file_path = file_block[file_path_start:file_path_end]
-
-            file_action_start = file_block.find('action="') + len('action="')
-            if file_action_start != -1:
-                file_action_end = file_block.find('"', file_action_start)
-                file_action = file_block[file_action_start:file_action_end]
-            else:
-                file_action = "create"
+        start = text.find(FILE_START_TAG)
+        while start != -1:
+            body_start = start + len(FILE_START_TAG)
+            next_start = text.find(FILE_START_TAG, body_start)
+            block_end = next_start if next_start != -1 else len(text)
 
-            # Extract content from between the tags
-            file_content = ">".join(file_block.split(">")[1:]).split(file_end_tag)[0]
+            files.append(self.parse_block(text, body_start, block_end))
+            files_content.append(text[body_start:block_end])
 
-            # Clean up content (removing Markdown code blocks and CDATA)
-            # Remove Markdown code blocks (```)
-            file_content = self.remove_markdown_code_blocks(file_content)
+            start = next_start
 
+        if len(files) == 0:
+            raise ValueError("No files found in the input text.")
 
-            # Prepare the file object and append it to the result
-            file_name = os.path.basename(file_path)
-            file_object = {
-                "file_name": file_name,
-                "type": file_type,
-                "path": file_path,
-                "content": file_content,
-                "action": file_action,
-            }
+        return files, files_content
 
-            files.append(file_object)
-            files_content.append(file_block)
+    def parse_block(self, text: str, body_start: int, block_end: int) -> Dict[str, str]:
+        """
+        Build the file object for the block text[body_start:block_end].
 
+        Args:
+            text (str): The text containing the block.
+            body_start (int): Offset just after the <deploraFile tag.
+            block_end (int): Offset where the block ends.
 
-        if len(files) == 0:
-            raise ValueError("No files found in the input text.")
+        Returns:
+            Dict[str, str]: The file object.
+        """
+        header_end = text.find(">", body_start, block_end)
+        if header_end == -1:
+            header = text[body_start:block_end]
+            file_content = ""
+        else:
+            header = text[body_start:header_end]
+            content_end = text.find(FILE_END_TAG, header_end + 1, block_end)
+            if content_end == -1:
+                content_end = block_end
+            file_content = text[header_end + 1 : content_end]
+
+        # Attributes may appear in any order
+        attributes = dict(ATTRIBUTE_PATTERN.findall(header))
+        file_path = attributes.get("filePath", "")
+
+        # Clean up content (removing Markdown code blocks)
+        file_content = self.remove_markdown_code_blocks(file_content)
+
+        return {
+            "file_name": os.path.basename(file_path),
+            "type": attributes.get("type", ""),
+            "path": file_path,
+            "content": file_content,
+            "action": attributes.get("action", "create"),
+        }
 
-        return files, files_content
-    
     @staticmethod
     def parse_json( text: str) -> Dict:
         """
@@ -202,6 +211,100 @@ class FileParser:
 
 
 
+class StreamingFileParser:
+    """
+    Incrementally extracts <deploraFile> blocks from a streamed LLM response.
+
+    Chunks are passed to `feed`, which returns every file whose block completed in that
+    chunk (closing tag received, or the next <deploraFile> started). Call `close` once the
+    stream ends to flush a trailing unterminated block.
+
+    Chunks are only joined when a tag boundary arrives, so each character is scanned a
+    constant number of times regardless of how finely the response is chunked.
+    """
+
+    TAG_OVERLAP = max(len(FILE_START_TAG), len(FILE_END_TAG)) - 1
+
+    def __init__(self):
+        self.file_parser = FileParser()
+        self.files = []
+        self._chunks = []
+        self._tail = ""
+        self._in_block = False
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        if not chunk:
+            return []
+
+        window = self._tail + chunk
+        self._tail = window[-self.TAG_OVERLAP :]
+        self._chunks.append(chunk)
+
+        if FILE_START_TAG not in window and FILE_END_TAG not in window:
+            if not self._in_block:
+                # Nothing to keep before the first tag except a possible partial start tag
+                self._chunks = [self._tail]
+            return []
+
+        return self._drain(final=False)
+
+    def close(self) -> List[Dict[str, str]]:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Dict[str, str]]:
+        text = "".join(self._chunks)
+        completed = []
+        leftover = "" if final else text[-(len(FILE_START_TAG) - 1) :]
+
+        start = text.find(FILE_START_TAG)
+        while start != -1:
+            body_start = start + len(FILE_START_TAG)
+            next_start = text.find(FILE_START_TAG, body_start)
+            search_end = next_start if next_start != -1 else len(text)
+            end = text.find(FILE_END_TAG, body_start, search_end)
+
+            if end != -1:
+                block_end = end + len(FILE_END_TAG)
+            elif next_start != -1 or final:
+                block_end = search_end
+            else:
+                leftover = text[start:]
+                break
+
+            completed.append(self.file_parser.parse_block(text, body_start, block_end))
+            start = next_start
+
+        self._chunks = [leftover] if leftover else []
+        self._in_block = leftover.startswith(FILE_START_TAG)
+        self.files.extend(completed)
+        return completed
+
+
+class StreamingResourceParser:
+    """
+    Picks Terraform resource names (quoted strings such as "aws_s3_bucket") out of a
+    streamed resource-identification response as soon as each one is complete.
+    """
+
+    def __init__(self):
+        self.resources = []
+        self._text = ""
+        self._position = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Add a chunk and return the resource names that completed in it.
+        """
+        self._text += chunk
+        found = []
+        for match in RESOURCE_NAME_PATTERN.finditer(self._text, self._position):
+            self._position = match.end()
+            if match.group(1) not in self.resources:
+                self.resources.append(match.group(1))
+                found.append(match.group(1))
+        return found
+
+
 if __name__ == "__main__":
     txtx = '''I will also include Terraform files for IaC and a Jenkinsfile for CI/CD.
 
@@ -557,4 +660,53 @@ Customize the deployment by modifying the `terraform.tfvars` file.  Here are som
 
     file_parser = FileParser()
     files, files_content = file_parser.parse(txtx)
-    print([f["file_name"] for f in files])
\ No newline at end of file
+    print([f["file_name"] for f in files])
+    # Benchmark against the previous split/join based parser on a 50 file, ~1 MB response
+    import time
+
+    def legacy_parse(text):
+        files = []
+        while FILE_START_TAG in text:
+            text = FILE_START_TAG.join(text.split(FILE_START_TAG)[1:])
+            file_block = text.split(FILE_START_TAG)[0]
+            file_path_start = file_block.find('filePath="') + len('filePath="')
+            file_path = file_block[file_path_start : file_block.find('"', file_path_start)]
+            file_content = ">".join(file_block.split(">")[1:]).split(FILE_END_TAG)[0]
+            files.append(
+                {"path": file_path, "content": file_parser.remove_markdown_code_blocks(file_content)}
+            )
+        return files
+
+    line = 'resource "aws_s3_bucket" "b" { bucket = "${var.name}-${count.index}" } # <note>\n'
+    body = line * (1024 * 1024 // 50 // len(line))
+    response = "".join(
+        f'Intro for file {i}\n```\n<deploraFile action="create" filePath="terraform/f{i}.tf" type="terraform">\n{body}</deploraFile>\n```\n'
+        for i in range(50)
+    )
+
+    def timed(fn, runs=5):
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = fn()
+        return (time.perf_counter() - start) / runs, result
+
+    def streamed():
+        stream_parser = StreamingFileParser()
+        for i in range(0, len(response), 64):
+            stream_parser.feed(response[i : i + 64])
+        stream_parser.close()
+        return stream_parser.files
+
+    legacy_time, legacy_files = timed(lambda: legacy_parse(response))
+    parse_time, (parsed_files, _) = timed(lambda: file_parser.parse(response))
+    stream_time, streamed_files = timed(streamed)
+
+    assert [(f["path"], f["content"]) for f in parsed_files] == [
+        (f["path"], f["content"]) for f in legacy_files
+    ]
+    assert streamed_files == parsed_files
+
+    print(f"response: {len(response) / 1024 / 1024:.2f} MB, {len(parsed_files)} files")
+    print(f"legacy parse:      {legacy_time * 1000:8.1f} ms")
+    print(f"offset parse:      {parse_time * 1000:8.1f} ms")
+    print(f"streaming (64 B):  {stream_time * 1000:8.1f} ms")
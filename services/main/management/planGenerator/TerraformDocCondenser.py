@@ -0,0 +1,101 @@
+import os
+import re
+from typing import List, Optional
+
+from services.main.management.planGenerator.TerraformDocIndex import extract_sections
+
+# Bump when the condensed format changes so cached condensed docs are rebuilt
+CONDENSED_DOCS_VERSION = "v1"
+TF_DOCS_TOKEN_BUDGET = int(os.getenv("TF_DOCS_TOKEN_BUDGET", 8000))
+
+CODE_BLOCK_PATTERN = re.compile(r"```[\w-]*\n.*?```", re.DOTALL)
+ARGUMENT_PATTERN = re.compile(r"^\s{0,1}[*-]\s+`[\w.-]+`.*\(Required\b", re.MULTILINE)
+TRUNCATION_MARKER = "\n..."
+
+
+class TerraformDocCondenser:
+    """
+    Reduces Terraform resource docs to what plan generation needs: one usage example and
+    the required arguments. Docs are then fitted into a shared token budget.
+    """
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Roughly 4 characters per token for English text and HCL
+        return len(text) // 4 + 1
+
+    @staticmethod
+    def condense(resource_name: str, doc: str) -> Optional[str]:
+        """
+        Condense a resource doc to its first example and its required arguments.
+
+        Args:
+            resource_name (str): The resource the doc describes.
+            doc (str): The doc in markdown, with "## Example Usage" and
+                "## Argument Reference" sections.
+
+        Returns:
+            str: The condensed doc, or None if neither section was found.
+        """
+        sections = extract_sections(doc)
+        parts = []
+
+        example = sections.get("example")
+        if example:
+            code_block = CODE_BLOCK_PATTERN.search(example)
+            parts.append(
+                f"Example:\n{code_block.group(0) if code_block else example.strip()}"
+            )
+
+        arguments = sections.get("arguments")
+        if arguments:
+            required = [
+                line.strip()
+                for line in arguments.splitlines()
+                if ARGUMENT_PATTERN.match(line)
+            ]
+            if required:
+                parts.append("Required arguments:\n" + "\n".join(required))
+
+        if not parts:
+            return None
+        return f"### {resource_name}\n" + "\n".join(parts)
+
+    @staticmethod
+    def fit_to_budget(docs: List[dict], budget: int = TF_DOCS_TOKEN_BUDGET) -> List[dict]:
+        """
+        Truncate docs so that together they stay within a token budget.
+
+        Small docs are kept whole; the budget they leave unused is shared among the
+        larger ones, which are cut at a line boundary.
+
+        Args:
+            docs (list): Dicts with "resourceName" and "doc" keys.
+            budget (int): Total token budget across all docs.
+
+        Returns:
+            list: The docs in their original order, truncated where needed.
+        """
+        fitted = {}
+        remaining = budget
+        by_size = sorted(
+            enumerate(docs),
+            key=lambda item: TerraformDocCondenser.estimate_tokens(item[1]["doc"]),
+        )
+        for position, (index, doc) in enumerate(by_size):
+            share = remaining // (len(docs) - position)
+            tokens = TerraformDocCondenser.estimate_tokens(doc["doc"])
+            if tokens <= share:
+                fitted[index] = doc
+                remaining -= tokens
+                continue
+
+            text = doc["doc"][: max(share * 4 - len(TRUNCATION_MARKER), 0)]
+            text = text[: text.rfind("\n")] if "\n" in text else text
+            fitted[index] = {**doc, "doc": text + TRUNCATION_MARKER}
+            remaining -= share
+        return [fitted[index] for index in range(len(docs))]
+
+    @staticmethod
+    def render(docs: List[dict]) -> str:
+        return "\n\n".join(doc["doc"] for doc in docs)
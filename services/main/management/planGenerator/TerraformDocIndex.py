@@ -0,0 +1,238 @@
+"""
+Offline index of Terraform provider resource docs.
+
+The index is a small sqlite file built from the markdown docs of provider repositories
+(e.g. a checkout or release tarball of terraform-provider-aws). Only the sections the
+plan generator uses are kept, so lookups need neither the network nor a browser.
+
+Build it with:
+    python -m services.main.management.planGenerator.TerraformDocIndex <source>... [--output PATH]
+
+where each source is a provider repo directory or a .tar.gz/.tgz/.tar of one.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import tarfile
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from core.logger import logger
+
+TF_DOC_INDEX_PATH = os.getenv("TF_DOC_INDEX_PATH", "resources/terraform_docs.sqlite")
+
+# Sections kept per resource, in the order they are rendered
+INDEXED_SECTIONS = {
+    "example usage": "example",
+    "argument reference": "arguments",
+}
+
+# Resource docs live in website/docs/r/*.html.markdown (legacy layout) or
+# docs/resources/*.md (terraform-plugin-docs layout)
+RESOURCE_DOC_PATTERN = re.compile(
+    r"(?:^|/)(?:website/docs/r|docs/resources)/([\w-]+)\.(?:html\.markdown|html\.md|markdown|md)$"
+)
+PROVIDER_REPO_PATTERN = re.compile(r"terraform-provider-([a-z0-9]+)")
+PAGE_TITLE_PATTERN = re.compile(r"^page_title:\s*\"?[^\"]*?\b([a-z0-9]+_[\w]+)", re.MULTILINE)
+SECTION_PATTERN = re.compile(r"^##\s+(.+?)\s*$", re.MULTILINE)
+
+
+def split_front_matter(text: str) -> Tuple[str, str]:
+    """
+    Split a docs file into its YAML front matter and markdown body.
+    """
+    if text.startswith("---"):
+        end = text.find("\n---", 3)
+        if end != -1:
+            return text[3:end], text[end + 4 :].lstrip("\n")
+    return "", text
+
+
+def extract_sections(body: str) -> Dict[str, str]:
+    """
+    Extract the indexed "##" sections from a docs body, keyed by column name.
+    """
+    sections = {}
+    headings = list(SECTION_PATTERN.finditer(body))
+    for i, heading in enumerate(headings):
+        column = INDEXED_SECTIONS.get(heading.group(1).lower())
+        if column is None or column in sections:
+            continue
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(body)
+        sections[column] = body[heading.end() : end].strip()
+    return sections
+
+
+def render_doc(resource_name: str, sections: Dict[str, str]) -> str:
+    """
+    Render indexed sections back into a markdown doc.
+    """
+    parts = [f"# {resource_name}"]
+    for title, column in INDEXED_SECTIONS.items():
+        if sections.get(column):
+            parts.append(f"## {title.title()}\n\n{sections[column]}")
+    return "\n\n".join(parts)
+
+
+def iter_resource_docs(root: str, provider: str = None) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Walk a provider repository and yield (resource name, sections) for every resource doc.
+    """
+    if provider is None:
+        match = PROVIDER_REPO_PATTERN.search(os.path.abspath(root))
+        provider = match.group(1) if match else None
+
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            relative_path = os.path.relpath(path, root).replace(os.sep, "/")
+            match = RESOURCE_DOC_PATTERN.search(relative_path)
+            if not match:
+                continue
+
+            # Tarballs usually unpack into a terraform-provider-<name>-<version> folder
+            file_provider = provider
+            if file_provider is None:
+                repo = PROVIDER_REPO_PATTERN.search(relative_path)
+                file_provider = repo.group(1) if repo else None
+
+            with open(path, encoding="utf-8", errors="replace") as f:
+                front_matter, body = split_front_matter(f.read())
+
+            title = PAGE_TITLE_PATTERN.search(front_matter)
+            if title:
+                resource_name = title.group(1)
+            elif file_provider:
+                resource_name = f"{file_provider}_{match.group(1)}"
+            else:
+                logger.debug(f"Skipping {relative_path}: unknown provider.")
+                continue
+
+            sections = extract_sections(body)
+            if sections:
+                yield resource_name, sections
+
+
+def build_index(sources: list, output: str = TF_DOC_INDEX_PATH, provider: str = None) -> int:
+    """
+    Build the doc index from provider repositories or tarballs of them.
+
+    Args:
+        sources (list): Directories or .tar/.tar.gz/.tgz archives.
+        output (str): Path of the sqlite file to write. It is replaced atomically.
+        provider (str): Provider name, if it cannot be inferred from the source paths.
+
+    Returns:
+        int: The number of resources indexed.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".sqlite", dir=output_dir)
+    os.close(fd)
+
+    count = 0
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute(
+            "CREATE TABLE resources ("
+            "name TEXT PRIMARY KEY, example TEXT, arguments TEXT"
+            ") WITHOUT ROWID"
+        )
+        for source in sources:
+            with _unpacked(source) as root:
+                rows = [
+                    (name, sections.get("example"), sections.get("arguments"))
+                    for name, sections in iter_resource_docs(root, provider)
+                ]
+            connection.executemany(
+                "INSERT OR REPLACE INTO resources VALUES (?, ?, ?)", rows
+            )
+            count += len(rows)
+            logger.info(f"Indexed {len(rows)} resource docs from {source}.")
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, output)
+    return count
+
+
+@contextmanager
+def _unpacked(source: str) -> Iterator[str]:
+    """
+    Yield a directory for a source, extracting archives to a temporary directory.
+    """
+    if os.path.isdir(source):
+        yield source
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        with tarfile.open(source) as archive:
+            archive.extractall(tmp, filter="data")
+        yield tmp
+
+
+class TerraformDocIndex:
+    """
+    Read-only access to the offline doc index. A missing index simply yields no docs.
+    """
+
+    _connection: Optional[sqlite3.Connection] = None
+    _opened = False
+
+    @staticmethod
+    def _connect() -> Optional[sqlite3.Connection]:
+        if not TerraformDocIndex._opened:
+            TerraformDocIndex._opened = True
+            if os.path.exists(TF_DOC_INDEX_PATH):
+                TerraformDocIndex._connection = sqlite3.connect(
+                    f"file:{TF_DOC_INDEX_PATH}?mode=ro&immutable=1",
+                    uri=True,
+                    check_same_thread=False,
+                )
+                logger.info(f"Using Terraform doc index at {TF_DOC_INDEX_PATH}.")
+            else:
+                logger.info(f"No Terraform doc index at {TF_DOC_INDEX_PATH}.")
+        return TerraformDocIndex._connection
+
+    @staticmethod
+    def get_sections(resource_name: str) -> Optional[Dict[str, str]]:
+        """
+        Get the indexed sections of a resource, or None if it is not indexed.
+        """
+        connection = TerraformDocIndex._connect()
+        if connection is None:
+            return None
+        try:
+            row = connection.execute(
+                "SELECT example, arguments FROM resources WHERE name = ?",
+                (resource_name,),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading Terraform doc index: {e}")
+            return None
+        if row is None:
+            return None
+        return {column: value for column, value in zip(("example", "arguments"), row) if value}
+
+    @staticmethod
+    def get_doc(resource_name: str) -> Optional[str]:
+        """
+        Get the indexed doc of a resource as markdown, or None if it is not indexed.
+        """
+        sections = TerraformDocIndex.get_sections(resource_name)
+        return render_doc(resource_name, sections) if sections else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline Terraform doc index.")
+    parser.add_argument("sources", nargs="+", help="Provider repo directories or tarballs")
+    parser.add_argument("--output", default=TF_DOC_INDEX_PATH)
+    parser.add_argument("--provider", help="Provider name, e.g. aws")
+    args = parser.parse_args()
+
+    total = build_index(args.sources, args.output, args.provider)
+    print(f"Indexed {total} resources into {args.output}")
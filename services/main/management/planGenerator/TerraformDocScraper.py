@@ -1,46 +1,159 @@
 from playwright.async_api import async_playwright
 from markdownify import markdownify
 from core.logger import logger
+from core.tracing import span
 from services.main.utils.caching.redis_service import TFDocsCache
+from services.main.management.planGenerator.TerraformDocIndex import (
+    TerraformDocIndex,
+    extract_sections,
+    render_doc,
+)
 from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from contextlib import asynccontextmanager
+import asyncio
+import os
 import traceback
-from bs4 import BeautifulSoup
+
+# Resource types the docs pages never need; skipping them makes page loads much cheaper.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
 
 class TerraformDocScraper:
     """
     Singleton class that manages a Playwright browser instance and scrapes content.
+
+    Definitions come from the offline TerraformDocIndex when it has them, then from the
+    Redis cache, and only then from the registry through the browser.
+
+    The browser is launched once and kept alive. Pages are reused across fetches from a
+    pool of at most MAX_PAGES (each in its own context), which also bounds how many
+    fetches run at the same time.
     """
+
     _instance = None
 
+    MAX_PAGES = int(os.getenv("TF_DOCS_MAX_PAGES", 6))
+    PAGE_TIMEOUT = int(os.getenv("TF_DOCS_PAGE_TIMEOUT_MS", 10000))
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(TerraformDocScraper, cls).__new__(cls)
+            cls._instance._initialized = False
         return cls._instance
 
     def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.playwright = None
         self.browser = None
+        self._browser_lock = asyncio.Lock()
+        self._page_slots = asyncio.Semaphore(self.MAX_PAGES)
+        self._idle_pages = []
+        self._in_flight = {}
 
     async def initialize_browser(self):
         """
-        Initialize the Playwright browser instance.
+        Initialize the Playwright browser instance, or relaunch it if it has crashed.
         """
-        if not self.browser:
+        async with self._browser_lock:
+            if self.browser and self.browser.is_connected():
+                return
+
             logger.info("Initializing Playwright browser...")
-            self.playwright = await async_playwright().start()
+            self._idle_pages.clear()
+            if not self.playwright:
+                self.playwright = await async_playwright().start()
             self.browser = await self.playwright.chromium.launch(headless=True)
             logger.info("Playwright browser initialized.")
 
+    async def shutdown(self):
+        """
+        Close pooled pages, the browser and Playwright.
+        """
+        async with self._browser_lock:
+            while self._idle_pages:
+                await self._discard_page(self._idle_pages.pop())
+            if self.browser:
+                await self.browser.close()
+                self.browser = None
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
+            logger.info("Playwright browser closed.")
+
+    async def _new_page(self):
+        context = await self.browser.new_context()
+        await context.route(
+            "**/*",
+            lambda route: (
+                route.abort()
+                if route.request.resource_type in BLOCKED_RESOURCE_TYPES
+                else route.continue_()
+            ),
+        )
+        page = await context.new_page()
+        page.set_default_timeout(self.PAGE_TIMEOUT)
+        return page
+
+    async def _discard_page(self, page):
+        try:
+            await page.context.close()
+        except Exception:
+            logger.debug("Playwright context was already closed.")
+
+    @asynccontextmanager
+    async def _page(self):
+        """
+        Borrow a page from the pool, creating one if none is idle. Pages that fail while
+        borrowed are closed instead of being returned.
+        """
+        async with self._page_slots:
+            await self.initialize_browser()
+            page = None
+            while self._idle_pages and page is None:
+                page = self._idle_pages.pop()
+                if page.is_closed():
+                    page = None
+            if page is None:
+                page = await self._new_page()
+
+            try:
+                yield page
+            except BaseException:
+                await self._discard_page(page)
+                raise
+            else:
+                if not page.is_closed() and self.browser and self.browser.is_connected():
+                    self._idle_pages.append(page)
+
     async def fetch_definition(self, resource_name: str) -> str:
         """
         Fetch the Terraform resource definition from the Terraform Registry.
+
+        Concurrent requests for the same resource share a single fetch.
         """
+        task = self._in_flight.get(resource_name)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_definition(resource_name))
+            self._in_flight[resource_name] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(resource_name, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_definition(self, resource_name: str) -> str:
         content = None
 
         try:
             logger.info(f"Fetching definition for {resource_name}.")
 
+            # Prefer the offline doc index, which needs no browser at all
+            indexed_definition = TerraformDocIndex.get_doc(resource_name)
+            if indexed_definition:
+                logger.info(f"Definition found in doc index for {resource_name}.")
+                return indexed_definition
+
             # Check if the definition is already cached
-            cached_definition = TFDocsCache.get_docs(resource_name)
+            cached_definition = await TFDocsCache.get_docs(resource_name)
             if cached_definition:
                 logger.info(f"Definition found in cache for {resource_name}.")
                 return cached_definition
@@ -52,50 +165,12 @@ class TerraformDocScraper:
             provider, resource = resource_name.split('_', 1)
             resource_url = f"{base_url}{provider}/latest/docs/resources/{resource}"
 
-            if self.browser:
-                await self.browser.close()
-                self.browser = None
-            
-            if not self.browser:
-                await self.initialize_browser()
-            else:
-                logger.info("Reusing existing Playwright browser instance.")
-
-            context = await self.browser.new_context()
-            logger.info(f"New Playwright context created for {resource_name}.")
-            page = await context.new_page()
-            logger.info(f"Loading page for {resource_name}...")
-            await page.goto(resource_url, timeout=10000)
-            logger.info(f"Page loaded for {resource_name}.")
-            try:
-                # Wait for the element containing the content to be visible
-                element = await page.wait_for_selector("#provider-docs-content", timeout=10000)
-                html = await element.inner_html()
-
-                soup = BeautifulSoup(html, "html.parser")
-
-                example_header = soup.find("h2", string="Example Usage")
-                
-                if not example_header:
-                    print("No 'Example Usage' section found.")
-                    content = None
-
-                else:
-                    for tag in example_header.find_next_siblings():
-                        if tag.name == "h2":  # Stop when we reach the next h2
-                            break
-                        if tag.name == "div":
-                            content = f"{content}\n\n{tag.prettify()}"
-
-                    content = markdownify(html, heading_style="ATX")
-
-                if content and "This documentation page doesn't exist" in content:
-                    content = None
-
-            except PlaywrightTimeoutError:
-                logger.error(f"Timeout while waiting for content on {resource_url}.")
-
-            await page.close()
+            with span("tf_docs_scrape", resource=resource_name):
+                async with self._page() as page:
+                    logger.info(f"Loading page for {resource_name}...")
+                    await page.goto(resource_url, wait_until="domcontentloaded")
+                    logger.info(f"Page loaded for {resource_name}.")
+                    content = await self._extract_content(page, resource_name, resource_url)
 
         except Exception as e:
             logger.error(f"An error occurred while fetching the definition for {resource_name}.")
@@ -106,6 +181,30 @@ class TerraformDocScraper:
         else:
             logger.info(f"Definition found for {resource_name}.")
             # Cache the definition
-            TFDocsCache.store_docs(resource_name, content)
+            await TFDocsCache.store_docs(resource_name, content)
+
+        return content
+
+    async def _extract_content(self, page, resource_name: str, resource_url: str) -> str:
+        content = None
+        try:
+            # Wait for the element containing the content to be visible
+            element = await page.wait_for_selector("#provider-docs-content")
+            html = await element.inner_html()
+
+            markdown = markdownify(html, heading_style="ATX")
+            sections = extract_sections(markdown)
+
+            if not sections:
+                logger.info(f"No 'Example Usage' or 'Argument Reference' section on {resource_url}.")
+                content = None
+            else:
+                content = render_doc(resource_name, sections)
+
+            if content and "This documentation page doesn't exist" in content:
+                content = None
+
+        except PlaywrightTimeoutError:
+            logger.error(f"Timeout while waiting for content on {resource_url}.")
 
         return content
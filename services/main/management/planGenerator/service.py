@@ -2,17 +2,30 @@ import json
 
 from services.main.workers.llm_worker import LLMService
 from services.main.utils.prompts.service import PromptManagerService
-from services.main.enums import DeploymentOptions
-from services.main.management.planGenerator.FileParser import FileParser
+from services.main.enums import DeploymentOptions, LoraStatus
+from services.main.management.planGenerator.FileParser import (
+    FileParser,
+    StreamingFileParser,
+    StreamingResourceParser,
+)
+from services.main.communication.service import CommunicationService
 
 from services.main.management.planGenerator.TerraformDocScraper import (
     TerraformDocScraper,
 )
+from services.main.management.planGenerator.TerraformDocCondenser import (
+    CONDENSED_DOCS_VERSION,
+    TerraformDocCondenser,
+)
+from services.main.utils.caching.redis_service import TFDocsCache
 from services.main.management.validationManager.service import ValidatorService
 from core.logger import logger
+from core.tracing import span
 import asyncio
 import concurrent.futures
+import time
 import traceback
+from contextlib import contextmanager
 
 
 class PlanGeneratorService:
@@ -27,6 +40,10 @@ class PlanGeneratorService:
         self.MAX_VALIDATION_ITERATIONS = 0
         self.PLAN_GENERATION_PLATFORM = "deepseek"
         self.PLAN_GENERATION_MODEL = ""  # "gemini-2.0-flash-thinking-exp-01-21"
+        self.IDENTIFY_RESOURCES_CACHE_TTL = 3600 * 24
+        # Only the Dockerized workflow is implemented, so the classification result is
+        # ignored until the other workflows exist
+        self.FORCED_DEPLOYMENT_STRATEGY = DeploymentOptions.DOCKERIZED_DEPLOYMENT.value
 
     async def generate_deployment_plan(
         self,
@@ -34,40 +51,41 @@ class PlanGeneratorService:
         user_preferences: dict,
         project_details: dict,
         chat_history: dict,
+        session_id: str = None,
+        communication_service: CommunicationService = None,
     ) -> dict:
         """
         Generate a deployment plan based on the request
-        1. Prepare the prompt
-        2. Call Prompt Manager Service
-        """
+        1. Classify the deployment strategy and identify the required resources
+        2. Fetch the docs of each resource
+        3. Generate the plan
 
-        try:
-            # Initialize the browser asynchronously
-            initialize_browser_task = asyncio.create_task(
-                self.terraform_doc_scraper.initialize_browser()
-            )
+        Classification is skipped while FORCED_DEPLOYMENT_STRATEGY is set, since it cannot
+        change the prompt. Each resource's docs are fetched as soon as its name appears in
+        the streamed identification response.
 
-            # Get deployment recommendation in the form of a JSON
-            # { "Deployment Plan": "",  "Reasoning": ""}
-            classification_prompt = (
-                await self.prompt_manager_service.prepare_classification_prompt(
-                    user_preferences, project_details, prompt
-                )
-            )
-            deployment_recommendation = await self.llm_service.llm_request(
-                prompt=classification_prompt
-            )
+        When a communication service is given, the plan is streamed: raw chunks and each
+        completed file are published to the session as they arrive.
+        """
+        timings = StageTimings()
 
-            deployment_recommendation = self.file_parser.parse_json(
-                deployment_recommendation
-            )
+        try:
+            if self.FORCED_DEPLOYMENT_STRATEGY:
+                deployment_recommendation = {
+                    "Deployment Plan": self.FORCED_DEPLOYMENT_STRATEGY,
+                    "Reasoning": "Only this deployment strategy is supported at the moment.",
+                }
+            else:
+                # Get deployment recommendation in the form of a JSON
+                # { "Deployment Plan": "",  "Reasoning": ""}
+                with timings.stage("classification"):
+                    deployment_recommendation = await self._classify_deployment(
+                        user_preferences, project_details, prompt
+                    )
 
             deployment_strategy = deployment_recommendation["Deployment Plan"]
             logger.info(f"Deployment strategy: {deployment_strategy}")
 
-            # Wait for the browser to initialize
-            await initialize_browser_task
-
             # Identify resources
             identified_resources, terraform_docs = await self._identify_resources(
                 deployment_strategy,
@@ -75,13 +93,11 @@ class PlanGeneratorService:
                 project_details,
                 chat_history,
                 prompt,
+                timings,
             )
             logger.info(f"Identified resources: {identified_resources}")
 
-            # logger.info(f"Terraform docs: {terraform_docs}")
-
             # Generate initial deployment solution
-            # terraform_docs = ""
             generation_prompt = self._get_strategy_prompt(
                 deployment_strategy,
                 user_preferences,
@@ -90,11 +106,17 @@ class PlanGeneratorService:
                 prompt,
                 terraform_docs,
             )
-            deployment_solution = await self.llm_service.llm_request(
-                prompt=generation_prompt,
-                platform=self.PLAN_GENERATION_PLATFORM,
-                model=self.PLAN_GENERATION_MODEL,
-            )
+            with timings.stage("generation"):
+                if communication_service:
+                    deployment_solution = await self._stream_deployment_solution(
+                        generation_prompt, session_id, communication_service
+                    )
+                else:
+                    deployment_solution = await self.llm_service.llm_request(
+                        prompt=generation_prompt,
+                        platform=self.PLAN_GENERATION_PLATFORM,
+                        model=self.PLAN_GENERATION_MODEL,
+                    )
             logger.info(f"Deployment recommendation: {deployment_recommendation}")
             logger.info(f"Deployment solution: {deployment_solution}")
 
@@ -107,17 +129,65 @@ class PlanGeneratorService:
             #     parsed_files, parsed_file_content
             # )
 
+            logger.info(f"Plan generation timings: {timings.summary()}")
             return (deployment_recommendation, deployment_solution, parsed_files)
 
         except Exception as e:
             logger.error(f"Error occurred: {traceback.print_exc()}")
             raise e
 
+    async def _classify_deployment(self, user_preferences, project_details, prompt) -> dict:
+        classification_prompt = (
+            await self.prompt_manager_service.prepare_classification_prompt(
+                user_preferences, project_details, prompt
+            )
+        )
+        deployment_recommendation = await self.llm_service.llm_request(
+            prompt=classification_prompt
+        )
+        return self.file_parser.parse_json(deployment_recommendation)
+
+    async def _stream_deployment_solution(
+        self,
+        generation_prompt: str,
+        session_id: str,
+        communication_service: CommunicationService,
+    ) -> str:
+        """
+        Stream the plan generation, forwarding chunks and completed files to the session.
+        """
+        stream_parser = StreamingFileParser()
+        chunks = []
+
+        async def publish_files(files):
+            for file in files:
+                logger.info(f"Streamed file generated: {file['path']}")
+                await communication_service.publisher(
+                    session_id, LoraStatus.PLAN_FILE_GENERATED.value, file
+                )
+
+        async for chunk in self.llm_service.llm_stream(
+            prompt=generation_prompt,
+            platform=self.PLAN_GENERATION_PLATFORM,
+            model=self.PLAN_GENERATION_MODEL,
+        ):
+            chunks.append(chunk)
+            # Chunks are only useful live; without a connection each would just log a miss
+            if communication_service.is_connected(session_id):
+                await communication_service.publisher(
+                    session_id, LoraStatus.PLAN_CHUNK.value, {"chunk": chunk}
+                )
+            await publish_files(stream_parser.feed(chunk))
+
+        await publish_files(stream_parser.close())
+
+        return "".join(chunks)
+
     def _get_strategy_prompt(
         self, strategy, preferences, details, history, prompt, terraform_docs
     ):
         # this should be removed once the other workflows are implemented
-        strategy = DeploymentOptions.DOCKERIZED_DEPLOYMENT.value
+        strategy = self.FORCED_DEPLOYMENT_STRATEGY or strategy
 
         if DeploymentOptions.DOCKERIZED_DEPLOYMENT.value in strategy:
             return self.prompt_manager_service.prepare_docker_prompt(
@@ -156,11 +226,19 @@ class PlanGeneratorService:
 
     async def _fetch_resource_with_doc(self, resource):
         """
-        Fetch the Terraform resource documentation using TerraformDocScraper.
+        Fetch the condensed Terraform resource documentation, condensing and caching the
+        doc from TerraformDocScraper on a miss.
         """
         try:
-            # Await the async fetch_definition method directly
-            content = await self.terraform_doc_scraper.fetch_definition(resource)
+            content = await TFDocsCache.get_condensed_docs(
+                resource, CONDENSED_DOCS_VERSION
+            )
+            if not content:
+                doc = await self.terraform_doc_scraper.fetch_definition(resource)
+                content = TerraformDocCondenser.condense(resource, doc) if doc else None
+                await TFDocsCache.store_condensed_docs(
+                    resource, CONDENSED_DOCS_VERSION, content
+                )
             return {"resourceName": resource, "doc": content}
         except Exception as e:
             logger.error(
@@ -175,38 +253,116 @@ class PlanGeneratorService:
         project_details,
         chat_history,
         prompt,
+        timings: "StageTimings" = None,
     ):
         """
         Identify resources and fetch their Terraform documentation.
+
+        The identification response is streamed, and each resource's doc fetch starts as
+        soon as its name has been received.
         """
+        timings = timings or StageTimings()
+        doc_tasks = {}
+
+        def fetch_doc(resource):
+            if resource not in doc_tasks:
+                doc_tasks[resource] = asyncio.create_task(
+                    timings.track("docs", self._fetch_resource_with_doc(resource))
+                )
+
         try:
-            resourcing_prompt = (
-                self.prompt_manager_service.prepare_identify_resources_prompt(
-                    deployment_strategy,
-                    user_preferences,
-                    project_details,
-                    chat_history,
-                    prompt,
+            try:
+                resourcing_prompt = (
+                    self.prompt_manager_service.prepare_identify_resources_prompt(
+                        deployment_strategy,
+                        user_preferences,
+                        project_details,
+                        chat_history,
+                        prompt,
+                    )
                 )
-            )
-            # Send prompt to LLM service to identify resources
-            response = await self.llm_service.llm_request(prompt=resourcing_prompt)
-            logger.info(f"Identified resources response: {response}")
-            identified_resources = self.file_parser.parse_json(response)["resources"]
-            logger.info(f"Identified resources: {identified_resources}")
+                # Stream the prompt to the LLM service to identify resources
+                resource_parser = StreamingResourceParser()
+                chunks = []
+                with timings.stage("identification"):
+                    async for chunk in self.llm_service.llm_stream(
+                        prompt=resourcing_prompt,
+                        cache_ttl=self.IDENTIFY_RESOURCES_CACHE_TTL,
+                        cache_name="identify_resources",
+                    ):
+                        chunks.append(chunk)
+                        for resource in resource_parser.feed(chunk):
+                            fetch_doc(resource)
+                response = "".join(chunks)
+                logger.info(f"Identified resources response: {response}")
+                identified_resources = self.file_parser.parse_json(response)["resources"]
+                logger.info(f"Identified resources: {identified_resources}")
 
-        except Exception as e:
-            logger.error(f"Error identifying resources: {traceback.format_exc()}")
-            identified_resources = []
+            except Exception as e:
+                logger.error(f"Error identifying resources: {traceback.format_exc()}")
+                identified_resources = []
 
-        # Create a list of tasks to fetch documentation for each resource
-        tasks = [
-            self._fetch_resource_with_doc(resource) for resource in identified_resources
-        ]
-        # Wait for all tasks to complete
-        terraform_docs = await asyncio.gather(*tasks)
+            # Fetch documentation for any resource the stream did not surface
+            for resource in identified_resources:
+                fetch_doc(resource)
+            # Wait for all tasks to complete
+            terraform_docs = await asyncio.gather(
+                *[doc_tasks[resource] for resource in identified_resources]
+            )
+
+        finally:
+            # Drop fetches for names that turned out not to be identified resources
+            for task in doc_tasks.values():
+                if not task.done():
+                    task.cancel()
 
         # Filter out resources without documentation
         terraform_docs = [doc for doc in terraform_docs if doc["doc"] is not None]
 
-        return identified_resources, json.dumps(terraform_docs, indent=4)
+        # Keep the docs within the prompt's token budget
+        terraform_docs = TerraformDocCondenser.fit_to_budget(terraform_docs)
+        rendered_docs = TerraformDocCondenser.render(terraform_docs)
+        logger.info(
+            f"Terraform docs for {len(terraform_docs)} resources: "
+            f"~{TerraformDocCondenser.estimate_tokens(rendered_docs)} tokens"
+        )
+
+        return identified_resources, rendered_docs
+
+
+class StageTimings:
+    """
+    Records when each plan generation stage ran, relative to the start of the request.
+
+    A stage entered several times (e.g. one doc fetch per resource) spans from its first
+    start to its last end, so overlapping stages and the critical path show up directly.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    def _record(self, name: str, start: float, end: float):
+        first, last = self.stages.get(name, (start, end))
+        self.stages[name] = (min(first, start), max(last, end))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            with span(f"plan_{name}"):
+                yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    async def track(self, name: str, awaitable):
+        with self.stage(name):
+            return await awaitable
+
+    def summary(self) -> str:
+        total = time.perf_counter() - self.started_at
+        parts = [
+            f"{name} {first - self.started_at:.2f}s-{last - self.started_at:.2f}s"
+            for name, (first, last) in sorted(self.stages.items(), key=lambda item: item[1])
+        ]
+        return ", ".join(parts + [f"total {total:.2f}s"])
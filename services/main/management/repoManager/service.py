@@ -1,11 +1,43 @@
 import os
+import re
 import shutil
+import hashlib
+import time
+import asyncio
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from git import Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional
 from core.logger import logger
+from core.tracing import traced
 from services.main.utils.caching.redis_service import SessionDataHandler
 
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+
 class RepoService:
+    """
+    Clones are served from a local mirror per repository URL: a bare repository holding a
+    depth-1 fetch of each branch used. Session checkouts are worktrees of the mirror, so
+    they share its objects and only cost the checked out files.
+
+    Git runs as a subprocess and filesystem work on a small thread pool, so neither blocks
+    the event loop. Work on a mirror or checkout directory is serialized by a lock per path.
+    """
+
+    MIRROR_ROOT = os.getenv("REPO_MIRROR_PATH", "repo_mirrors")
+    # Branches fetched more recently than this are checked out without fetching again
+    MIRROR_REFRESH_SECONDS = int(os.getenv("REPO_MIRROR_REFRESH_SECONDS", 30))
+    # Minimum interval between progress updates passed to callers
+    PROGRESS_INTERVAL = 0.5
+    _last_fetch: Dict[tuple, float] = {}
+    _fs_executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("REPO_FS_WORKERS", 4)), thread_name_prefix="repo-fs"
+    )
+    _path_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
     def __init__(self, root_path: str):
         self.root_path = root_path
     
@@ -20,41 +52,117 @@ class RepoService:
         else:
             raise
 
-    async def clone_repo(self, repo_url: str, branch: str, session_id: str):
+    @staticmethod
+    def path_lock(path: str) -> asyncio.Lock:
+        """
+        The lock for a directory. Hold a reference while using it, it is dropped once unused.
+        """
+        path = os.path.abspath(path)
+        lock = RepoService._path_locks.get(path)
+        if lock is None:
+            lock = RepoService._path_locks[path] = asyncio.Lock()
+        return lock
+
+    async def run_fs(self, func, *args, **kwargs):
+        """
+        Run blocking filesystem work on the repository thread pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._fs_executor, partial(func, *args, **kwargs)
+        )
+
+    async def git(self, *args: str, cwd: str = None, on_progress: ProgressCallback = None) -> str:
+        """
+        Run a git command without blocking the event loop.
+
+        Args:
+            *args (str): Arguments to git.
+            cwd (str): Directory to run in.
+            on_progress (callable): Awaited with progress lines from git's stderr, at most
+                every PROGRESS_INTERVAL seconds. Pass --progress for commands that need it.
+
+        Returns:
+            str: The command's stdout.
+        """
+        process = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        )
+        stderr_tail = deque(maxlen=20)
+
+        async def read_stderr():
+            buffer = b""
+            last_progress = 0.0
+            while chunk := await process.stderr.read(4096):
+                # Progress lines are terminated by \r while they update in place
+                *lines, buffer = re.split(rb"[\r\n]", buffer + chunk)
+                for line in lines:
+                    text = line.decode("utf-8", errors="replace").strip()
+                    if not text:
+                        continue
+                    stderr_tail.append(text)
+                    if on_progress and time.monotonic() - last_progress >= self.PROGRESS_INTERVAL:
+                        last_progress = time.monotonic()
+                        try:
+                            await on_progress(text)
+                        except Exception as e:
+                            logger.debug(f"Error reporting git progress: {e}")
+            if buffer.strip():
+                stderr_tail.append(buffer.decode("utf-8", errors="replace").strip())
+
+        try:
+            stdout, _ = await asyncio.gather(process.stdout.read(), read_stderr())
+            await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+        if process.returncode != 0:
+            raise GitCommandError(["git", *args], process.returncode, "\n".join(stderr_tail))
+        return stdout.decode("utf-8", errors="replace").strip()
+
+    @traced("clone_repo")
+    async def clone_repo(
+        self,
+        repo_url: str,
+        branch: str,
+        session_id: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ):
         """
-        Clone the repository to the root path using git. If the repository already exists, it pulls the latest changes. 
+        Check out the repository to the root path from its local mirror. If the repository already exists, it is returned as is.
         If the repository is bare, it deletes the directory and clones again.
         
         Args:
             repo_url (str): URL of the repository to clone.
             branch (str): Branch to clone or pull.
             session_id (str): Unique session ID for organizing the repo's path.
+            on_progress (callable): Awaited with git progress lines while fetching.
 
         Returns:
-            Repo: The GitPython Repo object for the cloned or updated repository.
+            str: The path of the checked out repository.
         """
         repo_path = f"{self.root_path}/{session_id}/{repo_url.split('/')[-1].replace('.git', '')}"
         
-        SessionDataHandler.update_session_data(session_id, {"repo_path": repo_path})
+        await SessionDataHandler.update_session_data(session_id, {"repo_path": repo_path})
         try:
-            if os.path.exists(repo_path):
-                try:
-                    repo = Repo(repo_path)
-                    if repo.bare:
-                        logger.warning(f"The repository at {repo_path} is bare. Deleting and re-cloning...")
-                        shutil.rmtree(repo_path, onerror=self.handle_remove_readonly)
-                    else:
-                        logger.info(f"Repository already exists at {repo_path}. Returning existing repository.")
-                        return repo_path
-                except InvalidGitRepositoryError:
-                    logger.warning(f"The directory at {repo_path} is not a valid Git repository. Deleting and re-cloning...")
-                    shutil.rmtree(repo_path, onerror=self.handle_remove_readonly)
-
-            # Clone the repository if it doesn't exist or was deleted
-            logger.info(f"Cloning repository from {repo_url} to {repo_path}...")
-            repo = Repo.clone_from(repo_url, repo_path, branch=branch)
-            logger.info(f"Repository cloned successfully to {repo_path}.")
-            return repo_path
+            lock = self.path_lock(repo_path)
+            async with lock:
+                if await self.run_fs(self._is_usable_checkout, repo_path):
+                    logger.info(f"Repository already exists at {repo_path}. Returning existing repository.")
+                    return repo_path
+
+                # Clone the repository if it doesn't exist or was deleted
+                logger.info(f"Cloning repository from {repo_url} to {repo_path}...")
+                await self.checkout_from_mirror(repo_url, branch, repo_path, on_progress)
+                logger.info(f"Repository cloned successfully to {repo_path}.")
+                return repo_path
 
         except (InvalidGitRepositoryError, NoSuchPathError) as e:
             logger.error(f"Error: {e}")
@@ -68,6 +176,124 @@ class RepoService:
             logger.error(f"An unexpected error occurred: {e}")
             raise
 
+    def _is_usable_checkout(self, repo_path: str) -> bool:
+        """
+        Whether a checkout exists at the path. Bare or invalid repositories there are deleted.
+        """
+        if not os.path.exists(repo_path):
+            return False
+        try:
+            if not Repo(repo_path).bare:
+                return True
+            logger.warning(f"The repository at {repo_path} is bare. Deleting and re-cloning...")
+        except InvalidGitRepositoryError:
+            logger.warning(f"The directory at {repo_path} is not a valid Git repository. Deleting and re-cloning...")
+        shutil.rmtree(repo_path, onerror=self.handle_remove_readonly)
+        return False
+
+    def mirror_path(self, repo_url: str) -> str:
+        key = repo_url.rstrip("/").removesuffix(".git").lower()
+        name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
+        return os.path.abspath(
+            os.path.join(
+                self.MIRROR_ROOT, f"{name}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}.git"
+            )
+        )
+
+    async def update_mirror(
+        self, repo_url: str, branch: str, on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Create or refresh the local mirror of a repository branch.
+
+        Args:
+            repo_url (str): URL of the repository.
+            branch (str): Branch to fetch. Defaults to the repository's default branch.
+            on_progress (callable): Awaited with git progress lines while fetching.
+
+        Returns:
+            str: The commit SHA the branch points to.
+        """
+        mirror_path = self.mirror_path(repo_url)
+        lock = self.path_lock(mirror_path)
+        async with lock:
+            return await self._update_mirror(mirror_path, repo_url, branch, on_progress)
+
+    async def _update_mirror(
+        self, mirror_path: str, repo_url: str, branch: str, on_progress: Optional[ProgressCallback]
+    ) -> str:
+        if os.path.isdir(mirror_path):
+            await self.git("remote", "set-url", "origin", repo_url, cwd=mirror_path)
+        else:
+            logger.info(f"Creating mirror of {repo_url} at {mirror_path}...")
+            await self.git("init", "--quiet", "--bare", mirror_path)
+            await self.git("remote", "add", "origin", repo_url, cwd=mirror_path)
+
+        if branch is None:
+            # "ref: refs/heads/<default>\tHEAD" comes first
+            head = await self.git("ls-remote", "--symref", "origin", "HEAD", cwd=mirror_path)
+            branch = head.split("\t")[0].removeprefix("ref: refs/heads/")
+
+        key = (mirror_path, branch)
+        if time.monotonic() - self._last_fetch.get(key, float("-inf")) > self.MIRROR_REFRESH_SECONDS:
+            await self.git(
+                "fetch",
+                "--progress",
+                "--depth=1",
+                "--prune",
+                "origin",
+                f"+refs/heads/{branch}:refs/heads/{branch}",
+                cwd=mirror_path,
+                on_progress=on_progress,
+            )
+            RepoService._last_fetch[key] = time.monotonic()
+        return await self.git("rev-parse", f"refs/heads/{branch}", cwd=mirror_path)
+
+    async def checkout_from_mirror(
+        self,
+        repo_url: str,
+        branch: str,
+        dest: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        """
+        Check out a repository branch at `dest` as a worktree of the local mirror.
+
+        Args:
+            repo_url (str): URL of the repository.
+            branch (str): Branch to check out. Defaults to the repository's default branch.
+            dest (str): Directory of the checkout. It must not exist yet.
+            on_progress (callable): Awaited with git progress lines while fetching.
+
+        Returns:
+            str: The commit SHA that was checked out.
+        """
+        mirror_path = self.mirror_path(repo_url)
+        dest = os.path.abspath(dest)
+        lock = self.path_lock(mirror_path)
+        async with lock:
+            commit = await self._update_mirror(mirror_path, repo_url, branch, on_progress)
+            # Forget worktrees whose directories were deleted, so their paths can be reused
+            await self.git("worktree", "prune", cwd=mirror_path)
+            await self.run_fs(os.makedirs, os.path.dirname(dest), exist_ok=True)
+            await self.git("worktree", "add", "--quiet", "--detach", dest, commit, cwd=mirror_path)
+        return commit
+
+    async def remove_checkout(self, repo_url: str, path: str):
+        """
+        Delete a checkout made by `checkout_from_mirror`.
+        """
+        if os.path.exists(path):
+            await self.run_fs(shutil.rmtree, path, onerror=self.handle_remove_readonly)
+        mirror_path = self.mirror_path(repo_url)
+        lock = self.path_lock(mirror_path)
+        try:
+            async with lock:
+                await self.git("worktree", "prune", cwd=mirror_path)
+        except (GitCommandError, OSError) as e:
+            logger.warning(f"Could not prune worktrees of {repo_url}: {e}")
+
+    @traced("create_files_in_repo")
     async def create_files_in_repo(self, repo_path: str, file_objects: List[Dict[str, str]]):
         """
         Create the parsed files in the given repository.
@@ -76,6 +302,11 @@ class RepoService:
             repo (Repo): The GitPython Repo object for the repository.
             file_objects (List[Dict[str, str]]): A list of file objects containing file details.
         """
+        lock = self.path_lock(repo_path)
+        async with lock:
+            await self.run_fs(self._write_files, repo_path, file_objects)
+
+    def _write_files(self, repo_path: str, file_objects: List[Dict[str, str]]):
         for file_object in file_objects:
             file_path = os.path.join(repo_path, file_object["path"])
             os.makedirs(os.path.dirname(file_path), exist_ok=True)  # Ensure the directory exists
@@ -1,4 +1,5 @@
 from core.logger import logger
+from core.tracing import traced
 from services.main.analyzer.api import get_generated_template
 from services.main.communication.models import MessageRequest, FileChangeRequest
 from services.main.communication.service import CommunicationService
@@ -30,20 +31,21 @@ class ManagementService:
         self.llm_service = LLMService()
         self.prompt_manager_service = PromptManagerService()
 
+    @traced("refine_deployment_plan")
     async def refine_deployment_plan(
         self,
         session_id: str,
         prompt: str,
     ) -> dict:
         try:
-            session = SessionDataHandler.get_session_data(session_id)
-            current_files = session["current_plan"]
+            session = await SessionDataHandler.get_session_fields(session_id, "repo_path")
+            current_files = await SessionDataHandler.get_current_plan(session_id)
             new_files, changed_files_objs = (
                 await self.plan_refiner_service.run_change_agent(
                     prompt=prompt, current_files=current_files
                 )
             )
-            SessionDataHandler.store_current_plan(session_id, new_files)
+            await SessionDataHandler.store_current_plan(session_id, new_files)
 
             await self.repo_service.create_files_in_repo(
                 session["repo_path"], changed_files_objs
@@ -54,6 +56,7 @@ class ManagementService:
 
             # raise e
 
+    @traced("generate_deployment_plan")
     async def generate_deployment_plan(
         self,
         request: MessageRequest,
@@ -68,14 +71,22 @@ class ManagementService:
 
         try:
             project_id = project.id
+            async def publish_clone_progress(progress: str):
+                await communication_service.publisher(
+                    session_id, LoraStatus.CLONING_REPOSITORY.value, {"progress": progress}
+                )
+
             repo_task = self.repo_service.clone_repo(
-                repo_url=project.repo_url, branch=project.branch, session_id=session_id
+                repo_url=project.repo_url,
+                branch=project.branch,
+                session_id=session_id,
+                on_progress=publish_clone_progress,
             )
             await communication_service.publisher(
                 session_id, LoraStatus.RETRIEVING_USER_PREFERENCES.value
             )
 
-            SessionDataHandler.update_message_state_and_data(
+            await SessionDataHandler.update_message_state_and_data(
                 session_id,
                 request.mid,
                 LoraStatus.RETRIEVING_USER_PREFERENCES.value,
@@ -94,7 +105,7 @@ class ManagementService:
                 session_id, LoraStatus.RETRIEVING_PROJECT_DETAILS.value
             )
 
-            SessionDataHandler.update_message_state_and_data(
+            await SessionDataHandler.update_message_state_and_data(
                 session_id,
                 request.mid,
                 LoraStatus.RETRIEVING_PROJECT_DETAILS.value,
@@ -110,7 +121,7 @@ class ManagementService:
                 session_id, LoraStatus.GENERATING_PLAN.value
             )
 
-            SessionDataHandler.update_message_state_and_data(
+            await SessionDataHandler.update_message_state_and_data(
                 session_id,
                 request.mid,
                 LoraStatus.GENERATING_PLAN.value,
@@ -123,6 +134,8 @@ class ManagementService:
                     user_preferences=user_preferences,
                     project_details=project_details,
                     chat_history=chat_history,
+                    session_id=session_id,
+                    communication_service=communication_service,
                 )
             )
 
@@ -131,7 +144,7 @@ class ManagementService:
                 session_id, LoraStatus.GATHERING_DATA.value
             )
 
-            SessionDataHandler.update_message_state_and_data(
+            await SessionDataHandler.update_message_state_and_data(
                 session_id,
                 request.mid,
                 LoraStatus.GATHERING_DATA.value,
@@ -154,7 +167,7 @@ class ManagementService:
             logger.error(f"Error occurred: {traceback.print_exc()}")
             await communication_service.publisher(session_id, LoraStatus.FAILED.value)
 
-            SessionDataHandler.update_message_state_and_data(
+            await SessionDataHandler.update_message_state_and_data(
                 session_id,
                 request.mid,
                 LoraStatus.FAILED.value,
@@ -171,6 +184,7 @@ class ManagementService:
         res = await self.llm_service.llm_request(prompt)
         return {"status": "success", "response": res}
 
+    @traced("retrieve_preferences")
     async def retrieve_preferences(
         self,
         prompt: str,
@@ -209,6 +223,7 @@ class ManagementService:
             logger.error(f"Request error while retrieving preferences: {e}")
             # raise e
 
+    @traced("retrieve_project_details")
     async def retrieve_project_details(self, project_id: str) -> dict:
         logger.info("Retrieving project details... for project_id: %s", project_id)
 
@@ -224,7 +239,9 @@ class ManagementService:
         request: FileChangeRequest,
     ) -> dict:
         try:
-            session = SessionDataHandler.get_session_data(request.session_id)
+            session = await SessionDataHandler.get_session_fields(
+                request.session_id, "repo_path"
+            )
             repo_path = session["repo_path"]
             await self.repo_service.create_files_in_repo(
                 repo_path=repo_path,
@@ -237,9 +254,9 @@ class ManagementService:
             )
 
             # update session memory
-            current_files = session["current_plan"]
-            current_files[request.file_path] = request.file_content
-            SessionDataHandler.store_current_plan(request.session_id, current_files)
+            await SessionDataHandler.store_plan_file(
+                request.session_id, request.file_path, request.file_content
+            )
 
             return {
                 "status": "success",
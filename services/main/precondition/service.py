@@ -1,9 +1,10 @@
 import os
+import asyncio
 import subprocess
 import shutil
 from typing import Optional, Dict
-from git import Repo
 from core.logger import logger
+from services.main.management.repoManager.service import RepoService
 from logging.handlers import RotatingFileHandler
 import stat
 import re
@@ -18,6 +19,7 @@ def remove_readonly(func, path, excinfo):
 class TestCoverageService:
     def __init__(self, root_path: str):
         self.root_path = root_path
+        self.repo_service = RepoService(root_path)
         self.test_commands = {
             "Python": {
                 "pytest": "pytest --cov=.",
@@ -127,24 +129,30 @@ class TestCoverageService:
         except Exception as e:
             return {"error": str(e)}
 
-    def analyze_repo(self, repo_url: str, session_id: str, language: str = "Python"):
+    async def analyze_repo(
+        self, repo_url: str, session_id: str, language: str = "Python", branch: str = None
+    ):
         """
-        Clones the repo and runs test coverage analysis.
+        Checks out the repo from its local mirror and runs test coverage analysis.
         """
         repo_path = os.path.join(
             self.root_path, session_id, repo_url.split("/")[-1].replace(".git", "")
         )
         try:
 
-            # Remove the repo path if it exists
-            if os.path.exists(repo_path):
-                shutil.rmtree(repo_path, onerror=remove_readonly)
+            lock = self.repo_service.path_lock(repo_path)
+            async with lock:
+                # Start from a clean checkout, earlier test runs leave build artifacts behind
+                if os.path.exists(repo_path):
+                    await self.repo_service.run_fs(
+                        shutil.rmtree, repo_path, onerror=remove_readonly
+                    )
 
-            logger.info(f"Cloning repository from {repo_url} to {repo_path}...")
-            Repo.clone_from(repo_url, repo_path)
-            logger.info("Repository cloned successfully.")
+                logger.info(f"Checking out {repo_url} to {repo_path}...")
+                await self.repo_service.checkout_from_mirror(repo_url, branch, repo_path)
+                logger.info("Repository checked out successfully.")
 
-            return self.run_test_coverage(repo_path, language)
+                return await asyncio.to_thread(self.run_test_coverage, repo_path, language)
 
         except Exception as e:
             logger.error(f"Error analyzing repo: {e}")
@@ -1,16 +1,50 @@
-import redis
+import os
+import redis.asyncio as redis
 from dotenv import load_dotenv
 load_dotenv()
 
-redis_session = redis.Redis(host='localhost', port=6379, decode_responses=True,db=0 )
-redis_tfcache = redis.Redis(host='localhost', port=6379, decode_responses=True,db=1 )
+# Connection settings. REDIS_URL takes precedence over the individual host/port settings.
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_USERNAME = os.getenv("REDIS_USERNAME")
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 10))
 
-# redis = redis.Redis(
-#     host=os.environ.get("REDIS_HOST"),
-#     port=12326,
-#     decode_responses=True,
-#     username="default",
-#     password=os.environ.get("REDIS_PASSWORD"),
-# )
 
+def create_pool(db: int) -> redis.BlockingConnectionPool:
+    """
+    Create a connection pool for one logical database. Clients built on the same pool
+    share its connections; when all of them are busy, callers wait up to
+    REDIS_POOL_TIMEOUT seconds for one to be released instead of failing.
+    """
+    options = {
+        "db": db,
+        "decode_responses": True,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "health_check_interval": 30,
+        "timeout": REDIS_POOL_TIMEOUT,
+    }
+    if REDIS_URL:
+        return redis.BlockingConnectionPool.from_url(REDIS_URL, **options)
+    return redis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        username=REDIS_USERNAME,
+        password=REDIS_PASSWORD,
+        **options,
+    )
 
+
+redis_session = redis.Redis(connection_pool=create_pool(0))
+redis_tfcache = redis.Redis(connection_pool=create_pool(1))
+redis_llmcache = redis.Redis(connection_pool=create_pool(2))
+
+
+async def close_redis():
+    for client in (redis_session, redis_tfcache, redis_llmcache):
+        await client.aclose()
+        await client.connection_pool.disconnect()
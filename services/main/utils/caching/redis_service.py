@@ -1,17 +1,119 @@
-from services.main.utils.caching.redis import redis_session, redis_tfcache
+from services.main.utils.caching.redis import redis_session, redis_tfcache, redis_llmcache
 from core.logger import logger
+from collections import OrderedDict
+from redis.exceptions import WatchError
 import os
 import json
+import time
+import hashlib
 from services.main.enums import Preconndition
 from uuid import uuid4
 from datetime import datetime
 
 
+# KEYS: chat list, chat index hash. ARGV: message id, state, message, ttl.
+_update_message_state_script = redis_session.register_script(
+    """
+    local index = redis.call('HGET', KEYS[2], ARGV[1])
+    if not index then
+        return 0
+    end
+    local stored = redis.call('LINDEX', KEYS[1], tonumber(index))
+    if not stored then
+        return 0
+    end
+    local chat_message = cjson.decode(stored)
+    if type(chat_message['state']) ~= 'table' then
+        chat_message['state'] = {}
+    end
+    table.insert(chat_message['state'], ARGV[2])
+    chat_message['message'] = ARGV[3]
+    redis.call('LSET', KEYS[1], tonumber(index), cjson.encode(chat_message))
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+    return 1
+    """
+)
+
+
 class SessionDataHandler:
+    """
+    Session storage in Redis, split across several keys per session so that updates only
+    touch the data they change:
+
+    - session:{id}             hash of scalar fields (JSON encoded values)
+    - session:{id}:chat        list of chat messages (JSON)
+    - session:{id}:chat_index  hash of message id -> position in the chat list
+    - session:{id}:plan        hash of file path -> file content
+    - session:{id}:pipeline    hash of build id -> pipeline data (JSON)
+    - client:{id}:sessions     sorted set of a client's sessions, scored by creation time
+    """
+
     SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", 3600 * 24 * 365))
+    CHAT_LIST_PAGE_SIZE = int(os.getenv("CHAT_LIST_PAGE_SIZE", 20))
+    MIGRATION_MARKER_PREFIX = "migrations:"
+
+    @staticmethod
+    def _key(session_id: str, part: str = None) -> str:
+        return f"session:{session_id}:{part}" if part else f"session:{session_id}"
+
+    @staticmethod
+    def _session_keys(session_id: str) -> list:
+        return [
+            SessionDataHandler._key(session_id, part)
+            for part in (None, "chat", "chat_index", "plan", "pipeline")
+        ]
+
+    @staticmethod
+    def _client_index_key(client_id: str) -> str:
+        return f"client:{client_id}:sessions"
+
+    @staticmethod
+    async def _index_session(session_id: str, created_at: float = None):
+        """
+        Add the session to its client's chat list index. Sessions already listed keep
+        their original position.
+        """
+        client_id = (
+            await SessionDataHandler.get_session_fields(session_id, "client_id")
+        ).get("client_id")
+        if not client_id:
+            return
+
+        index_key = SessionDataHandler._client_index_key(client_id)
+        pipe = redis_session.pipeline()
+        pipe.zadd(index_key, {session_id: created_at or time.time()}, nx=True)
+        pipe.expire(index_key, SessionDataHandler.SESSION_TIMEOUT)
+        await pipe.execute()
 
     @staticmethod
-    def store_message_user(
+    def _expire(pipe, session_id: str):
+        for key in SessionDataHandler._session_keys(session_id):
+            pipe.expire(key, SessionDataHandler.SESSION_TIMEOUT)
+
+    @staticmethod
+    async def _append_message(session_id: str, client_id: str, message: dict):
+        chat_key = SessionDataHandler._key(session_id, "chat")
+        length = await redis_session.rpush(chat_key, json.dumps(message))
+
+        pipe = redis_session.pipeline()
+        pipe.hsetnx(SessionDataHandler._key(session_id), "client_id", json.dumps(client_id))
+        if message.get("role") == "user":
+            # The first user message titles the session in the chat list
+            pipe.hsetnx(
+                SessionDataHandler._key(session_id), "title", json.dumps(message["message"])
+            )
+        if message.get("id"):
+            pipe.hset(
+                SessionDataHandler._key(session_id, "chat_index"),
+                message["id"],
+                length - 1,
+            )
+        SessionDataHandler._expire(pipe, session_id)
+        await pipe.execute()
+
+    @staticmethod
+    async def store_message_user(
         session_id: str,
         client_id: str,
         role: str,
@@ -19,127 +121,153 @@ class SessionDataHandler:
         variation: str = "chat",
     ):
         try:
-            redis_key = session_id
-            # Fetch the existing session or initialize a new one
-            session_data = redis_session.get(redis_key)
-            session_object = (
-                json.loads(session_data) if session_data else {"client_id": client_id}
-            )
-
-            # Update chat history
-            chat_history = session_object.get("chat_history", [])
-            chat_history.append(
+            await SessionDataHandler._append_message(
+                session_id,
+                client_id,
                 {
                     "role": role,
                     "message": message,
                     "state": None,
                     variation: variation,
                     "created_At": str(datetime.now()),
-                }
+                },
             )
-
-            session_object["chat_history"] = chat_history
-
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
-            logger.debug(f"Message stored in session: {redis_key} - {role}: {message}")
+            logger.debug(f"Message stored in session: {session_id} - {role}: {message}")
         except Exception as e:
             logger.error(f"Error storing message: {e}")
 
-    def initialize_message_state_and_return(
+    @staticmethod
+    async def initialize_message_state_and_return(
         session_id: str, client_id: str, role: str, state: list
     ):
         try:
-            redis_key = session_id
-            # Fetch the existing session or initialize a new one
-            session_data = redis_session.get(redis_key)
-            session_object = (
-                json.loads(session_data) if session_data else {"client_id": client_id}
-            )
-
-            # Update chat history
-            chat_history = session_object.get("chat_history", [])
             unique_id = str(uuid4())
-            chat_history.append(
+            await SessionDataHandler._append_message(
+                session_id,
+                client_id,
                 {
                     "id": unique_id,
                     "role": role,
                     "message": "message",
                     "state": state,
                     "created_At": str(datetime.now()),
-                }
+                },
             )
-            session_object["chat_history"] = chat_history
-
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
             logger.debug(
-                f"Message stored in session: {redis_key} - {role} - id: {unique_id}: {state}"
+                f"Message stored in session: {session_id} - {role} - id: {unique_id}: {state}"
             )
             return unique_id
         except Exception as e:
             logger.error(f"Error storing message: {e}")
 
-    def update_message_state_and_data(
+    @staticmethod
+    async def update_message_state_and_data(
         session_id: str, message_id: str, state: str, message: str
     ):
+        """
+        Append a state to a chat message and replace its text.
+
+        The read-modify-write runs server side in a Lua script, so concurrent updates to
+        the same session are applied one after another and never overwrite each other.
+        """
         try:
-            redis_key = session_id
-            # Fetch the existing session or initialize a new one
-            session_data = redis_session.get(redis_key)
-            session_object = (
-                json.loads(session_data) if session_data else {session_id: {}}
+            updated = await _update_message_state_script(
+                keys=[
+                    SessionDataHandler._key(session_id, "chat"),
+                    SessionDataHandler._key(session_id, "chat_index"),
+                ],
+                args=[message_id, state, message, SessionDataHandler.SESSION_TIMEOUT],
+                client=redis_session,
             )
-
-            # Update chat history
-            chat_history = session_object.get("chat_history", [])
-            for m in chat_history:
-                if m.get("id") == message_id:
-                    m["state"].append(state)
-                    m["message"] = message
-                    break
-            session_object["chat_history"] = chat_history
-
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
-            logger.debug(f"Message state updated in session: {redis_key}")
+            if not updated:
+                logger.debug(f"Message {message_id} not found in session: {session_id}")
+                return
+            logger.debug(f"Message state updated in session: {session_id}")
         except Exception as e:
             logger.error(f"Error updating message state: {e}")
 
     @staticmethod
-    def store_current_plan(session_id: str, plan_data: dict):
+    async def store_current_plan(session_id: str, plan_data: dict):
         try:
-            redis_key = session_id
-            # Fetch the existing session or initialize a new one
-            session_data = redis_session.get(redis_key)
-            session_object = json.loads(session_data) if session_data else {}
+            plan_key = SessionDataHandler._key(session_id, "plan")
+            pipe = redis_session.pipeline()
+            pipe.delete(plan_key)
+            if plan_data:
+                pipe.hset(plan_key, mapping=plan_data)
+            SessionDataHandler._expire(pipe, session_id)
+            await pipe.execute()
+            await SessionDataHandler._index_session(session_id)
+            logger.debug(f"Current plan stored in session: {session_id}")
+        except Exception as e:
+            logger.error(f"Error storing current plan: {e}")
 
-            session_object["current_plan"] = plan_data
+    @staticmethod
+    async def store_plan_file(session_id: str, file_path: str, file_content: str):
+        try:
+            pipe = redis_session.pipeline()
+            pipe.hset(SessionDataHandler._key(session_id, "plan"), file_path, file_content)
+            SessionDataHandler._expire(pipe, session_id)
+            await pipe.execute()
+            await SessionDataHandler._index_session(session_id)
+            logger.debug(f"Plan file {file_path} stored in session: {session_id}")
+        except Exception as e:
+            logger.error(f"Error storing plan file: {e}")
 
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
-            logger.debug(f"Current plan stored in session: {redis_key}")
-            print(f"Current plan stored in session: {redis_key}")
+    @staticmethod
+    async def get_current_plan(session_id: str) -> dict:
+        try:
+            return await redis_session.hgetall(SessionDataHandler._key(session_id, "plan"))
         except Exception as e:
-            logger.error(f"Error storing current plan: {e}")
+            logger.error(f"Error retrieving current plan: {e}")
+            return {}
 
     @staticmethod
-    def get_session_data(session_id: str):
+    async def get_session_fields(session_id: str, *fields: str) -> dict:
+        """
+        Fetch only the given scalar fields of a session. Missing fields are omitted.
+        """
         try:
-            redis_key = session_id
-            logger.debug(f"Retrieving session data: {redis_key}")
-            session_data = redis_session.get(redis_key)
-            if session_data:
-                return json.loads(session_data)
+            values = await redis_session.hmget(SessionDataHandler._key(session_id), fields)
+            return {
+                field: json.loads(value)
+                for field, value in zip(fields, values)
+                if value is not None
+            }
+        except Exception as e:
+            logger.error(f"Error retrieving session fields: {e}")
             return {}
+
+    @staticmethod
+    async def get_session_data(session_id: str):
+        try:
+            logger.debug(f"Retrieving session data: {session_id}")
+            pipe = redis_session.pipeline()
+            pipe.hgetall(SessionDataHandler._key(session_id))
+            pipe.lrange(SessionDataHandler._key(session_id, "chat"), 0, -1)
+            pipe.hgetall(SessionDataHandler._key(session_id, "plan"))
+            pipe.hgetall(SessionDataHandler._key(session_id, "pipeline"))
+            fields, chat_history, current_plan, pipeline_data = await pipe.execute()
+
+            session_object = {
+                field: json.loads(value) for field, value in fields.items()
+            }
+            if chat_history:
+                session_object["chat_history"] = [json.loads(m) for m in chat_history]
+            if current_plan:
+                session_object["current_plan"] = current_plan
+            if pipeline_data:
+                session_object["pipeline_data"] = {
+                    build_id: json.loads(data) for build_id, data in pipeline_data.items()
+                }
+            return session_object
         except Exception as e:
             logger.error(f"Error retrieving session data: {e}")
             return {}
 
     @staticmethod
-    def get_chat_history(session_id: str):
+    async def get_chat_history(session_id: str):
         try:
-            session_data = SessionDataHandler.get_session_data(session_id)
+            session_data = await SessionDataHandler.get_session_data(session_id)
 
             return {
                 "chat_history": session_data.get("chat_history", []),
@@ -152,123 +280,566 @@ class SessionDataHandler:
             return {"chat_history": None, "current_plan": None}
 
     @staticmethod
-    def get_chat_list(client_id: str):
+    async def get_chat_list(client_id: str, cursor: str = None, limit: int = None):
+        """
+        List a client's sessions that have a plan, newest first.
+
+        Args:
+            client_id (str): The client whose sessions to list.
+            cursor (str): The `next_cursor` returned by the previous page, if any.
+            limit (int): Page size.
+
+        Returns:
+            tuple: The page of sessions and the cursor for the next page (None at the end).
+        """
         try:
-            all_sessions = redis_session.keys()
+            limit = limit or SessionDataHandler.CHAT_LIST_PAGE_SIZE
+            index_key = SessionDataHandler._client_index_key(client_id)
+
+            # The cursor is "score:session_id" of the last listed session. Sessions with
+            # the same score come in reverse member order, so the ones up to and including
+            # that session were listed already.
+            max_score, last_session = "+inf", None
+            if cursor:
+                cursor_score, _, last_session = cursor.partition(":")
+                max_score = cursor_score if last_session else f"({cursor_score}"
+                cursor_score = float(cursor_score)
+
+            entries = []
+            start = 0
+            while len(entries) < limit:
+                batch = await redis_session.zrevrangebyscore(
+                    index_key, max_score, "-inf", start=start, num=limit, withscores=True
+                )
+                start += len(batch)
+                entries.extend(
+                    (session_id, score)
+                    for session_id, score in batch
+                    if not (last_session and score == cursor_score and session_id >= last_session)
+                )
+                if len(batch) < limit:
+                    break
+            entries = entries[:limit]
+
+            pipe = redis_session.pipeline()
+            for session_id, _ in entries:
+                pipe.hmget(SessionDataHandler._key(session_id), "title", "client_id")
+            fields = await pipe.execute() if entries else []
+
             chat_list = []
-            for session_key in all_sessions:
-                session_data = redis_session.get(session_key)
-                if session_data:
-                    chats = json.loads(session_data).get("chat_history", [])
-                    current_plan = json.loads(session_data).get("current_plan", None)
-                    if len(chats) > 0 and current_plan:
-                        first_chat = chats[-1]
-                        chat_list.append(
-                            {
-                                "session_id": session_key,
-                                "title": (
-                                    first_chat.get("message", "No message")
-                                    if isinstance(
-                                        first_chat.get("message", "No message"), str
-                                    )
-                                    else "Missing Information"
-                                ),
-                                "created_At": first_chat.get("created_At", None),
-                            }
-                        )
-            # logger.info(f"get_chat_list Final chat list: {chat_list}")
-            return chat_list[::-1]
+            expired = []
+            for (session_id, created_at), (title, owner) in zip(entries, fields):
+                if owner is None:
+                    expired.append(session_id)
+                    continue
+                title = json.loads(title) if title else None
+                chat_list.append(
+                    {
+                        "session_id": session_id,
+                        "title": title if isinstance(title, str) else "Missing Information",
+                        "created_At": str(datetime.fromtimestamp(created_at)),
+                    }
+                )
+
+            if expired:
+                await redis_session.zrem(index_key, *expired)
+
+            next_cursor = (
+                f"{entries[-1][1]!r}:{entries[-1][0]}" if len(entries) == limit else None
+            )
+            return chat_list, next_cursor
 
         except Exception as e:
             logger.error(f"Error retrieving chat list: {e}")
-            return []
+            return [], None
 
     @staticmethod
-    def get_client_data(session_id: str, client_id: str):
+    async def get_client_data(session_id: str, client_id: str):
         try:
-            session_data = SessionDataHandler.get_session_data(session_id)
-            return session_data.get(client_id, {})
+            fields = await SessionDataHandler.get_session_fields(session_id, client_id)
+            return fields.get(client_id, {})
         except Exception as e:
             logger.error(f"Error retrieving client data: {e}")
             return {}
 
     @staticmethod
-    def update_session_data(session_id: str, data: dict):
+    async def update_session_data(session_id: str, data: dict):
         try:
-            redis_key = session_id
-            # Fetch the existing session or initialize a new one
-            session_data = redis_session.get(redis_key)
-            session_object = json.loads(session_data) if session_data else {}
-
-            # Update the session data with multiple key-value pairs
-            session_object.update(data)
-
-            # Store the updated session data back to Redis
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
+            if not data:
+                return
+            pipe = redis_session.pipeline()
+            pipe.hset(
+                SessionDataHandler._key(session_id),
+                mapping={field: json.dumps(value) for field, value in data.items()},
+            )
+            SessionDataHandler._expire(pipe, session_id)
+            await pipe.execute()
 
             logger.debug(f"Session data updated for session_id: {session_id}")
 
         except Exception as e:
             logger.error(f"Error updating session data: {e}")
 
-    def store_preconditions(session_id: str, data: dict, condition: Preconndition):
+    @staticmethod
+    async def store_preconditions(session_id: str, data: dict, condition: Preconndition):
         try:
-            redis_key = session_id
-
-            session_data = redis_session.get(redis_key)
-            session_object = json.loads(session_data) if session_data else {}
-
-            session_object[condition.value] = data
-
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
-            logger.debug(f"Preconditions stored for session: {redis_key}")
+            await SessionDataHandler.update_session_data(session_id, {condition.value: data})
+            logger.debug(f"Preconditions stored for session: {session_id}")
         except Exception as e:
             logger.error(f"Error storing preconditions: {e}")
 
-    def get_preconditions(session_id: str, condition: Preconndition):
+    @staticmethod
+    async def get_preconditions(session_id: str, condition: Preconndition):
         try:
-            session_data = SessionDataHandler.get_session_data(session_id)
-            return session_data.get(condition.value, None)
+            fields = await SessionDataHandler.get_session_fields(session_id, condition.value)
+            return fields.get(condition.value, None)
         except Exception as e:
             logger.error(f"Error retrieving preconditions: {e}")
             return None
 
     @staticmethod
-    def store_pipeline_data(session_id: str, build_id: str, data: dict):
+    async def store_pipeline_data(session_id: str, build_id: str, data: dict):
         try:
-            redis_key = session_id
-            # Fetch the existing session or initialize a new one
-            session_data = redis_session.get(redis_key)
-            session_object = json.loads(session_data) if session_data else {}
-
-            # Update the session data with multiple key-value pairs
-            if "pipeline_data" not in session_object:
-                session_object["pipeline_data"] = {}
-            session_object["pipeline_data"][build_id] = data
-
-            # Store the updated session data back to Redis
-            redis_session.set(redis_key, json.dumps(session_object))
-            redis_session.expire(redis_key, SessionDataHandler.SESSION_TIMEOUT)
+            pipe = redis_session.pipeline()
+            pipe.hset(
+                SessionDataHandler._key(session_id, "pipeline"),
+                str(build_id),
+                json.dumps(data),
+            )
+            SessionDataHandler._expire(pipe, session_id)
+            await pipe.execute()
 
             logger.debug(f"Pipeline data stored for session_id: {session_id}")
 
         except Exception as e:
             logger.error(f"Error storing pipeline data: {e}")
 
+    @staticmethod
+    async def run_migrations(force: bool = False):
+        """
+        Run the one-off data migrations that have not completed yet. A migration that
+        completes sets its marker key (migrations:{name}) and is skipped from then on; one
+        that fails is logged and retried on the next run. Never raises, so an unreachable
+        Redis does not prevent startup.
+
+        Args:
+            force (bool): Run the migrations even if their markers are set.
+        """
+        migrations = [
+            ("session_hash_v1", SessionDataHandler.migrate_legacy_sessions),
+            ("chat_index_v1", SessionDataHandler.index_existing_sessions),
+        ]
+        for name, migration in migrations:
+            marker = SessionDataHandler.MIGRATION_MARKER_PREFIX + name
+            try:
+                if not force and await redis_session.exists(marker):
+                    continue
+                logger.info(f"Running migration {name}.")
+                await migration()
+                await redis_session.set(marker, datetime.now().isoformat())
+            except Exception as e:
+                logger.error(f"Migration {name} failed, it will be retried on the next run: {e}")
+
+    @staticmethod
+    async def migrate_legacy_sessions() -> int:
+        """
+        Convert sessions stored as a single JSON string under the bare session id into
+        the per-session key layout. Safe to run concurrently from several workers.
+
+        Returns:
+            int: The number of sessions migrated.
+
+        Raises:
+            Exception: If some sessions could not be migrated.
+        """
+        migrated = 0
+        failed = 0
+        async for legacy_key in redis_session.scan_iter(_type="string"):
+            # Migration markers are strings too
+            if legacy_key.startswith(SessionDataHandler.MIGRATION_MARKER_PREFIX):
+                continue
+            try:
+                if await SessionDataHandler._migrate_legacy_session(legacy_key):
+                    migrated += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error migrating legacy session {legacy_key}: {e}")
+
+        if migrated:
+            logger.info(f"Migrated {migrated} legacy sessions to the hash layout.")
+        if failed:
+            raise Exception(f"{failed} legacy sessions could not be migrated")
+        return migrated
+
+    @staticmethod
+    async def index_existing_sessions() -> int:
+        """
+        Backfill the per-client chat list index for sessions that have a plan but were
+        stored before the index existed.
+
+        Returns:
+            int: The number of sessions indexed.
+
+        Raises:
+            Exception: If some sessions could not be indexed.
+        """
+        indexed = 0
+        failed = 0
+        async for session_key in redis_session.scan_iter(match="session:*", _type="hash"):
+            session_id = session_key.split(":", 1)[1]
+            if ":" in session_id or not await redis_session.exists(
+                SessionDataHandler._key(session_id, "plan")
+            ):
+                continue
+
+            try:
+                created_at = None
+                for stored in await redis_session.lrange(
+                    SessionDataHandler._key(session_id, "chat"), 0, -1
+                ):
+                    chat_message = json.loads(stored)
+                    if chat_message.get("role") != "user":
+                        continue
+                    await redis_session.hsetnx(
+                        session_key, "title", json.dumps(chat_message.get("message"))
+                    )
+                    if chat_message.get("created_At"):
+                        created_at = datetime.fromisoformat(
+                            chat_message["created_At"]
+                        ).timestamp()
+                    break
+
+                await SessionDataHandler._index_session(session_id, created_at)
+                indexed += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error indexing session {session_id}: {e}")
+
+        if failed:
+            raise Exception(f"{failed} sessions could not be indexed")
+        return indexed
+
+    @staticmethod
+    async def _migrate_legacy_session(session_id: str) -> bool:
+        async with redis_session.pipeline() as pipe:
+            await pipe.watch(session_id)
+            session_data = await pipe.get(session_id)
+            if session_data is None:
+                return False
+
+            # Other string keys share the database; only JSON objects are legacy sessions
+            try:
+                session_object = json.loads(session_data)
+            except json.JSONDecodeError:
+                return False
+            if not isinstance(session_object, dict):
+                return False
+
+            chat_history = session_object.pop("chat_history", [])
+            current_plan = session_object.pop("current_plan", None) or {}
+            pipeline_data = session_object.pop("pipeline_data", None) or {}
+
+            pipe.multi()
+            if session_object:
+                pipe.hset(
+                    SessionDataHandler._key(session_id),
+                    mapping={k: json.dumps(v) for k, v in session_object.items()},
+                )
+            if chat_history:
+                pipe.rpush(
+                    SessionDataHandler._key(session_id, "chat"),
+                    *[json.dumps(m) for m in chat_history],
+                )
+                chat_index = {
+                    m["id"]: i for i, m in enumerate(chat_history) if m.get("id")
+                }
+                if chat_index:
+                    pipe.hset(
+                        SessionDataHandler._key(session_id, "chat_index"),
+                        mapping=chat_index,
+                    )
+            if current_plan:
+                pipe.hset(SessionDataHandler._key(session_id, "plan"), mapping=current_plan)
+            if pipeline_data:
+                pipe.hset(
+                    SessionDataHandler._key(session_id, "pipeline"),
+                    mapping={str(b): json.dumps(d) for b, d in pipeline_data.items()},
+                )
+            pipe.delete(session_id)
+            SessionDataHandler._expire(pipe, session_id)
+            try:
+                await pipe.execute()
+            except WatchError:
+                # Another worker migrated (or changed) this key first
+                return False
+            return True
+
 
 class TFDocsCache:
-    def store_docs(resource: str, doc: str):
+    async def store_docs(resource: str, doc: str):
         try:
             if doc:
-                redis_tfcache.set(resource, doc, ex=3600 * 24 * 365)
+                await redis_tfcache.set(resource, doc, ex=3600 * 24 * 365)
         except Exception as e:
             logger.debug(f"Error storing docs: {e}")
 
-    def get_docs(resource: str):
+    async def get_docs(resource: str):
         try:
-            return redis_tfcache.get(resource)
+            return await redis_tfcache.get(resource)
         except Exception as e:
             logger.debug(f"Error retrieving docs: {e}")
             return None
+
+    async def store_condensed_docs(resource: str, version: str, doc: str):
+        try:
+            if doc:
+                await redis_tfcache.set(
+                    f"condensed:{version}:{resource}", doc, ex=3600 * 24 * 365
+                )
+        except Exception as e:
+            logger.debug(f"Error storing condensed docs: {e}")
+
+    async def get_condensed_docs(resource: str, version: str):
+        try:
+            return await redis_tfcache.get(f"condensed:{version}:{resource}")
+        except Exception as e:
+            logger.debug(f"Error retrieving condensed docs: {e}")
+            return None
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache for LLM responses.
+
+    Entries are keyed by a hash of (platform, model, temperature, prompt) and live in an
+    in-process LRU backed by Redis, so repeated prompts skip the provider round-trip.
+    """
+
+    MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512))
+    _entries: "OrderedDict[str, tuple]" = OrderedDict()
+    stats: dict = {}
+
+    @staticmethod
+    def make_key(platform: str, model: str, temperature, prompt: str) -> str:
+        payload = json.dumps([platform, model, temperature, prompt])
+        return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _record(name: str, outcome: str):
+        counters = LLMResponseCache.stats.setdefault(
+            name, {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+        )
+        counters[outcome] += 1
+
+    @staticmethod
+    async def get(key: str, name: str = "default"):
+        entry = LLMResponseCache._entries.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                LLMResponseCache._entries.move_to_end(key)
+                LLMResponseCache._record(name, "memory_hits")
+                return value
+            del LLMResponseCache._entries[key]
+
+        try:
+            value = await redis_llmcache.get(key)
+            if value is not None:
+                ttl = await redis_llmcache.ttl(key)
+                LLMResponseCache._remember(key, value, ttl if ttl and ttl > 0 else 60)
+                LLMResponseCache._record(name, "redis_hits")
+                return value
+        except Exception as e:
+            logger.debug(f"Error retrieving cached LLM response: {e}")
+
+        LLMResponseCache._record(name, "misses")
+        return None
+
+    @staticmethod
+    async def store(key: str, value: str, ttl: int):
+        LLMResponseCache._remember(key, value, ttl)
+        try:
+            await redis_llmcache.set(key, value, ex=ttl)
+        except Exception as e:
+            logger.debug(f"Error storing LLM response: {e}")
+
+    @staticmethod
+    def _remember(key: str, value: str, ttl: int):
+        LLMResponseCache._entries[key] = (time.monotonic() + ttl, value)
+        LLMResponseCache._entries.move_to_end(key)
+        while len(LLMResponseCache._entries) > LLMResponseCache.MAX_ENTRIES:
+            LLMResponseCache._entries.popitem(last=False)
+
+
+class AnalysisCache:
+    """
+    Repository analysis results, kept in the LLM cache database:
+
+    - analysis:{version}:repo:{repo}:{sha}      final template of a repository at a commit
+    - analysis:{version}:file:{path}:{blob}     template contribution of one file version
+
+    `version` identifies the templates the results were produced with, so editing a
+    template invalidates them. Blob hashes are git's, so an unchanged file keeps its
+    contribution across commits (and forks).
+    """
+
+    TTL = int(os.getenv("ANALYSIS_CACHE_TTL", 3600 * 24 * 30))
+
+    @staticmethod
+    def _repo_key(version: str, repo_url: str, commit_sha: str) -> str:
+        repo = repo_url.rstrip("/").removesuffix(".git").lower()
+        return f"analysis:{version}:repo:{hashlib.sha1(repo.encode('utf-8')).hexdigest()}:{commit_sha}"
+
+    @staticmethod
+    def _file_key(version: str, path: str, blob_sha: str) -> str:
+        return f"analysis:{version}:file:{path}:{blob_sha}"
+
+    @staticmethod
+    async def get_result(version: str, repo_url: str, commit_sha: str):
+        try:
+            value = await redis_llmcache.get(
+                AnalysisCache._repo_key(version, repo_url, commit_sha)
+            )
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.debug(f"Error retrieving cached analysis: {e}")
+            return None
+
+    @staticmethod
+    async def store_result(version: str, repo_url: str, commit_sha: str, template: dict):
+        try:
+            await redis_llmcache.set(
+                AnalysisCache._repo_key(version, repo_url, commit_sha),
+                json.dumps(template),
+                ex=AnalysisCache.TTL,
+            )
+        except Exception as e:
+            logger.debug(f"Error storing analysis: {e}")
+
+    @staticmethod
+    async def get_contributions(version: str, files: dict) -> dict:
+        """
+        Get the cached contributions of several files at once.
+
+        Args:
+            files (dict): File path -> blob hash.
+
+        Returns:
+            dict: File path -> contribution, for the files that are cached.
+        """
+        if not files:
+            return {}
+        paths = list(files)
+        try:
+            values = await redis_llmcache.mget(
+                [AnalysisCache._file_key(version, path, files[path]) for path in paths]
+            )
+        except Exception as e:
+            logger.debug(f"Error retrieving cached file contributions: {e}")
+            return {}
+        return {path: json.loads(value) for path, value in zip(paths, values) if value}
+
+    @staticmethod
+    async def store_contribution(version: str, path: str, blob_sha: str, contribution: dict):
+        try:
+            await redis_llmcache.set(
+                AnalysisCache._file_key(version, path, blob_sha),
+                json.dumps(contribution),
+                ex=AnalysisCache.TTL,
+            )
+        except Exception as e:
+            logger.debug(f"Error storing file contribution: {e}")
+
+
+class PipelineLogStore:
+    """
+    Stage logs of pipeline builds, appended as they are tailed from Jenkins:
+
+    - pipeline_logs:{build}:stage:{name}   list of a stage's log lines, capped to the last
+                                            MAX_LINES
+    - pipeline_logs:{build}:state          hash with the tail position (JSON values)
+
+    `build` is the build's job path and number. Keys expire TTL after the last append.
+    """
+
+    MAX_LINES = int(os.getenv("PIPELINE_LOG_MAX_LINES", 5000))
+    TTL = int(os.getenv("PIPELINE_LOG_TTL", 3600 * 24 * 30))
+
+    @staticmethod
+    def _stage_key(build: str, stage: str) -> str:
+        return f"pipeline_logs:{build}:stage:{stage}"
+
+    @staticmethod
+    def _state_key(build: str) -> str:
+        return f"pipeline_logs:{build}:state"
+
+    @staticmethod
+    async def append(build: str, lines: dict, state: dict):
+        """
+        Append new log lines and save the tail position in one round trip.
+
+        Args:
+            build (str): Build key.
+            lines (dict): Stage name -> new lines.
+            state (dict): Tail position to resume from.
+        """
+        pipe = redis_session.pipeline()
+        for stage, stage_lines in lines.items():
+            if not stage_lines:
+                continue
+            key = PipelineLogStore._stage_key(build, stage)
+            pipe.rpush(key, *stage_lines)
+            pipe.ltrim(key, -PipelineLogStore.MAX_LINES, -1)
+            pipe.expire(key, PipelineLogStore.TTL)
+        state_key = PipelineLogStore._state_key(build)
+        pipe.hset(state_key, mapping={k: json.dumps(v) for k, v in state.items()})
+        pipe.expire(state_key, PipelineLogStore.TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def replace(build: str, lines: dict, state: dict):
+        """
+        Replace the stored lines of some stages and save the tail position.
+
+        Args:
+            build (str): Build key.
+            lines (dict): Stage name -> all of its lines.
+            state (dict): Tail position to resume from.
+        """
+        pipe = redis_session.pipeline()
+        for stage, stage_lines in lines.items():
+            key = PipelineLogStore._stage_key(build, stage)
+            pipe.delete(key)
+            if stage_lines:
+                pipe.rpush(key, *stage_lines[-PipelineLogStore.MAX_LINES :])
+                pipe.expire(key, PipelineLogStore.TTL)
+        state_key = PipelineLogStore._state_key(build)
+        pipe.hset(state_key, mapping={k: json.dumps(v) for k, v in state.items()})
+        pipe.expire(state_key, PipelineLogStore.TTL)
+        await pipe.execute()
+
+    @staticmethod
+    async def get_state(build: str) -> dict:
+        try:
+            state = await redis_session.hgetall(PipelineLogStore._state_key(build))
+            return {k: json.loads(v) for k, v in state.items()}
+        except Exception as e:
+            logger.error(f"Error retrieving pipeline log state: {e}")
+            return {}
+
+    @staticmethod
+    async def get_logs(build: str, stages: list) -> dict:
+        """
+        Returns:
+            dict: Stage name -> stored log lines, for each of the given stages.
+        """
+        if not stages:
+            return {}
+        try:
+            pipe = redis_session.pipeline()
+            for stage in stages:
+                pipe.lrange(PipelineLogStore._stage_key(build, stage), 0, -1)
+            return dict(zip(stages, await pipe.execute()))
+        except Exception as e:
+            logger.error(f"Error retrieving pipeline logs: {e}")
+            return {stage: [] for stage in stages}
@@ -1,10 +1,16 @@
 from fastapi import HTTPException
-from groq import Groq
-import anthropic, os
+from groq import AsyncGroq
+import anthropic, os, time
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from google import genai
 from core.logger import logger
+from core.tracing import llm_span, observe_llm_call
+from services.main.utils.caching.redis_service import LLMResponseCache
+from typing import AsyncIterator
+
+SYSTEM_PROMPT = "You are Deplora, an intelligent deployment assistant designed to generate, analyze, and optimize deployment plans. Your primary goal is to assist users in creating accurate, efficient, and personalized deployment strategies for software applications. Respond with clear and actionable insights, leveraging your expertise in deployment technologies such as Terraform, Docker, Kubernetes, CI/CD pipelines, and cloud platforms. Ensure responses are structured, professional, and align with industry best practices."
+
 
 class LLMService:
     
@@ -18,22 +24,37 @@ class LLMService:
             "gemini": "gemini-2.0-flash",
             "openai": "gpt-4o",
         }
+        self.DEFAULT_TEMPERATURES = {
+            "groq": 0.5,
+        }
         
-        # Initialize the Groq client
+        # Initialize the async provider clients so requests never block the event loop
         load_dotenv()
-        self.client = Groq(
+        self.client = AsyncGroq(
             api_key=os.environ.get("GROQ_API_KEY"),
         )
-        self.claude = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-        self.deepseek = OpenAI(
+        self.claude = anthropic.AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        self.deepseek = AsyncOpenAI(
             api_key=os.environ.get("DEEPSEEK_API_KEY"),
-            base_url="https://api.deepseek.com",
+            base_url=os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
         )
-        self.openai = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        self.openai = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
         self.gemini = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
     
-    async def llm_request(self, prompt: str, platform: str = None, model: str = None):
-        
+    async def llm_request(
+        self,
+        prompt: str,
+        platform: str = None,
+        model: str = None,
+        cache_ttl: int = None,
+        cache_name: str = "default",
+    ):
+        """
+        Send a prompt to the given platform and return the completion text.
+
+        Caching is opt-in: pass `cache_ttl` (seconds) to serve identical requests from
+        LLMResponseCache. `cache_name` labels the call site in the hit/miss stats.
+        """
         # Set default platform if not provided
         if not platform:
             # if modeel provided
@@ -47,7 +68,28 @@ class LLMService:
         if not model:
             model = self.DEFAULT_MODELS.get(platform)
 
+        if not cache_ttl:
+            return await self._dispatch(prompt, platform, model)
 
+        cache_key = LLMResponseCache.make_key(
+            platform, model, self.DEFAULT_TEMPERATURES.get(platform), prompt
+        )
+        cached = await LLMResponseCache.get(cache_key, cache_name)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for {cache_name} ({platform}/{model}).")
+            return cached
+
+        content = await self._dispatch(prompt, platform, model)
+        await LLMResponseCache.store(cache_key, content, cache_ttl)
+        return content
+
+    async def _dispatch(self, prompt: str, platform: str, model: str):
+        with llm_span(platform, model, prompt) as attributes:
+            content = await self._call_platform(prompt, platform, model)
+            attributes["completion_chars"] = len(content or "")
+            return content
+
+    async def _call_platform(self, prompt: str, platform: str, model: str):
         if platform == "groq":
             return await self.llm_request_groq(prompt, model)
         elif platform == "deepseek":
@@ -64,19 +106,140 @@ class LLMService:
             )
 
 
+    async def llm_stream(
+        self,
+        prompt: str,
+        platform: str = None,
+        model: str = None,
+        cache_ttl: int = None,
+        cache_name: str = "default",
+    ) -> AsyncIterator[str]:
+        """
+        Stream the completion for a prompt, yielding text chunks as the provider produces them.
+
+        With `cache_ttl`, a cached completion is yielded as a single chunk, and a streamed
+        one is cached once it has been fully received (the same cache as `llm_request`).
+        """
+        if not platform:
+            if model:
+                raise HTTPException(
+                    status_code=500, detail="Model provided without platform."
+                )
+            platform = self.DEFAULT_PLATFORM
+
+        if not model:
+            model = self.DEFAULT_MODELS.get(platform)
+
+        if not cache_ttl:
+            async for chunk in self._measured_stream(prompt, platform, model):
+                yield chunk
+            return
+
+        cache_key = LLMResponseCache.make_key(
+            platform, model, self.DEFAULT_TEMPERATURES.get(platform), prompt
+        )
+        cached = await LLMResponseCache.get(cache_key, cache_name)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for {cache_name} ({platform}/{model}).")
+            yield cached
+            return
+
+        chunks = []
+        async for chunk in self._measured_stream(prompt, platform, model):
+            chunks.append(chunk)
+            yield chunk
+        await LLMResponseCache.store(cache_key, "".join(chunks), cache_ttl)
+
+    async def _measured_stream(
+        self, prompt: str, platform: str, model: str
+    ) -> AsyncIterator[str]:
+        # Generators may be finalized outside the caller's context, so streams record
+        # their metrics directly instead of opening a span
+        start = time.perf_counter()
+        completion_chars = 0
+        status = "error"
+        try:
+            async for chunk in self._dispatch_stream(prompt, platform, model):
+                completion_chars += len(chunk)
+                yield chunk
+            status = "ok"
+        finally:
+            observe_llm_call(
+                platform,
+                model,
+                time.perf_counter() - start,
+                status,
+                len(prompt),
+                completion_chars,
+            )
+
+    async def _dispatch_stream(
+        self, prompt: str, platform: str, model: str
+    ) -> AsyncIterator[str]:
+        try:
+            if platform in ("groq", "deepseek", "openai"):
+                client = {
+                    "groq": self.client,
+                    "deepseek": self.deepseek,
+                    "openai": self.openai,
+                }[platform]
+                options = {}
+                if platform in self.DEFAULT_TEMPERATURES:
+                    options["temperature"] = self.DEFAULT_TEMPERATURES[platform]
+                stream = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt},
+                    ],
+                    stream=True,
+                    **options,
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+            elif platform == "claude":
+                async with self.claude.messages.stream(
+                    model=model,
+                    max_tokens=8192,
+                    system=SYSTEM_PROMPT,
+                    messages=[{"role": "user", "content": prompt}],
+                ) as stream:
+                    async for text in stream.text_stream:
+                        yield text
+
+            elif platform == "gemini":
+                stream = await self.gemini.aio.models.generate_content_stream(
+                    model=model, contents=prompt
+                )
+                async for chunk in stream:
+                    if chunk.text:
+                        yield chunk.text
+
+            else:
+                raise HTTPException(
+                    status_code=500, detail="Invalid platform specified."
+                )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
     async def llm_request_groq(self, prompt: str, model: str):
         try:
             # Generate the chat completion using the Groq client
-            chat_completion = self.client.chat.completions.create(
+            chat_completion = await self.client.chat.completions.create(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are Deplora, an intelligent deployment assistant designed to generate, analyze, and optimize deployment plans. Your primary goal is to assist users in creating accurate, efficient, and personalized deployment strategies for software applications. Respond with clear and actionable insights, leveraging your expertise in deployment technologies such as Terraform, Docker, Kubernetes, CI/CD pipelines, and cloud platforms. Ensure responses are structured, professional, and align with industry best practices.",
+                        "content": SYSTEM_PROMPT,
                     },
                     {"role": "user", "content": prompt},
                 ],
                 model=model,  # Adjust the model as needed
-                temperature=0.5,  # Adjust optional parameters as needed
+                temperature=self.DEFAULT_TEMPERATURES["groq"],
                 max_tokens=8192,
                 top_p=1,
                 stop=None,
@@ -97,12 +260,12 @@ class LLMService:
     async def llm_request_openai(self, prompt: str, model: str):
         try:
             # Generate the chat completion using the OpenAI client
-            message = self.openai.chat.completions.create(
+            message = await self.openai.chat.completions.create(
                 model=model,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are Deplora, an intelligent deployment assistant designed to generate, analyze, and optimize deployment plans. Your primary goal is to assist users in creating accurate, efficient, and personalized deployment strategies for software applications. Respond with clear and actionable insights, leveraging your expertise in deployment technologies such as Terraform, Docker, Kubernetes, CI/CD pipelines, and cloud platforms. Ensure responses are structured, professional, and align with industry best practices.",
+                        "content": SYSTEM_PROMPT,
                     },
                     {"role": "user", "content": prompt},
                 ],
@@ -126,13 +289,13 @@ class LLMService:
     async def llm_request_deepseek(self, prompt: str, model: str):
         try:
             logger.info(f"Requesting completion from Deepseek with prompt: {prompt[:50]}...")
-            # Generate the chat completion using the Groq client
-            message = self.deepseek.chat.completions.create(
+            # Generate the chat completion using the Deepseek client
+            message = await self.deepseek.chat.completions.create(
                 model=model,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are Deplora, an intelligent deployment assistant designed to generate, analyze, and optimize deployment plans. Your primary goal is to assist users in creating accurate, efficient, and personalized deployment strategies for software applications. Respond with clear and actionable insights, leveraging your expertise in deployment technologies such as Terraform, Docker, Kubernetes, CI/CD pipelines, and cloud platforms. Ensure responses are structured, professional, and align with industry best practices.",
+                        "content": SYSTEM_PROMPT,
                     },
                     {"role": "user", "content": prompt},
                 ],
@@ -155,13 +318,13 @@ class LLMService:
     async def llm_request_claude(self, prompt: str, model: str):
         try:
             # Generate the chat completion using the Groq client
-            message = self.claude.messages.create(
+            message = await self.claude.messages.create(
                 model=model,
                 max_tokens=1024,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are Deplora, an intelligent deployment assistant designed to generate, analyze, and optimize deployment plans. Your primary goal is to assist users in creating accurate, efficient, and personalized deployment strategies for software applications. Respond with clear and actionable insights, leveraging your expertise in deployment technologies such as Terraform, Docker, Kubernetes, CI/CD pipelines, and cloud platforms. Ensure responses are structured, professional, and align with industry best practices.",
+                        "content": SYSTEM_PROMPT,
                     },
                     {"role": "user", "content": prompt},
                 ],
@@ -184,7 +347,7 @@ class LLMService:
         try:
             print(model)
             # Generate the chat completion using the Groq client
-            message = self.gemini.models.generate_content(
+            message = await self.gemini.aio.models.generate_content(
                             model=model, contents=prompt
                         )
             # print(message)
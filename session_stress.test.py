@@ -0,0 +1,89 @@
+"""
+Stress test for concurrent session updates.
+
+Fires hundreds of concurrent state updates at the same chat messages, interleaved
+with session field and plan writes, and checks that no update was lost.
+
+Runs against fakeredis by default; set REDIS_URL to use a local Redis instead
+(the database is flushed, so point it at a scratch db).
+
+Usage:
+    python session_stress.test.py
+"""
+
+import asyncio
+import os
+
+import redis.asyncio as redis
+
+import services.main.utils.caching.redis_service as redis_service
+from services.main.utils.caching.redis import REDIS_MAX_CONNECTIONS, create_pool
+from services.main.utils.caching.redis_service import SessionDataHandler
+
+SESSION_ID = "stress-session"
+MESSAGES = 4
+UPDATES_PER_MESSAGE = 200
+CONCURRENCY = 64
+
+
+def make_client():
+    if os.getenv("REDIS_URL"):
+        return redis.Redis(connection_pool=create_pool(0))
+
+    from fakeredis import aioredis
+
+    return aioredis.FakeRedis(
+        decode_responses=True,
+        connection_pool_class=redis.BlockingConnectionPool,
+        max_connections=REDIS_MAX_CONNECTIONS,
+    )
+
+
+async def main():
+    client = make_client()
+    await client.flushdb()
+    redis_service.redis_session = client
+
+    message_ids = [
+        await SessionDataHandler.initialize_message_state_and_return(
+            SESSION_ID, "stress-client", "You", ["INIT"]
+        )
+        for _ in range(MESSAGES)
+    ]
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def update(i):
+        async with semaphore:
+            message_id = message_ids[i % MESSAGES]
+            await asyncio.gather(
+                SessionDataHandler.update_message_state_and_data(
+                    SESSION_ID, message_id, f"STATE_{i}", f"update {i}"
+                ),
+                SessionDataHandler.update_session_data(SESSION_ID, {f"field_{i}": i}),
+                SessionDataHandler.store_plan_file(SESSION_ID, f"file_{i}.tf", str(i)),
+            )
+
+    total = MESSAGES * UPDATES_PER_MESSAGE
+    await asyncio.gather(*[update(i) for i in range(total)])
+
+    session = await SessionDataHandler.get_session_data(SESSION_ID)
+    messages = {m["id"]: m for m in session["chat_history"]}
+
+    lost_states = 0
+    for n, message_id in enumerate(message_ids):
+        expected = {f"STATE_{i}" for i in range(n, total, MESSAGES)}
+        lost_states += len(expected - set(messages[message_id]["state"]))
+
+    lost_fields = [i for i in range(total) if session.get(f"field_{i}") != i]
+    lost_files = [i for i in range(total) if f"file_{i}.tf" not in session["current_plan"]]
+
+    print(f"updates: {total}, concurrency: {CONCURRENCY}")
+    print(f"lost states: {lost_states}, lost fields: {len(lost_fields)}, lost files: {len(lost_files)}")
+    assert lost_states == 0 and not lost_fields and not lost_files
+    print("no updates lost")
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())